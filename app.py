@@ -7,13 +7,20 @@ from flask_socketio import SocketIO, emit, join_room, leave_room
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from datetime import timedelta
 import os
 from config import Config
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Async mode (threading/eventlet/gevent); green modes are monkey-patched by wsgi.py
+from services.async_mode import resolve_async_mode, is_monkey_patched, engine_options
+async_mode = resolve_async_mode(app.config.get('SOCKETIO_ASYNC_MODE'))
+if not is_monkey_patched(async_mode):
+    print(f"Warning: SOCKETIO_ASYNC_MODE={async_mode} but the standard library is not monkey-patched; start with `python wsgi.py`")
+app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+    async_mode, app.config['SQLALCHEMY_DATABASE_URI'], app.config.get('DB_POOL_SIZE', 10)))
+
 # Initialize extensions
 from models import db
 db.init_app(app)
@@ -22,53 +29,83 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 mail = Mail(app)
-socketio = SocketIO(app, cors_allowed_origins="*", manage_session=True, logger=True, engineio_logger=True, async_mode="threading")
+# Optional message queue so several workers share rooms (see services/socket_bus.py)
+from services.socket_bus import socketio_queue_options
+# Optional msgpack serializer and long-polling compression (see services/socket_codec.py)
+from services.socket_codec import socketio_codec_options
+socketio = SocketIO(app, cors_allowed_origins="*", manage_session=True, logger=app.config['SOCKET_VERBOSE_LOGGING'], engineio_logger=app.config['SOCKET_VERBOSE_LOGGING'], async_mode=async_mode, **socketio_queue_options(app), **socketio_codec_options(app))
+# Event latency/throughput instrumentation; verbose packet logging is off unless enabled
+from services.socket_metrics import socket_metrics, socket_log
+socket_metrics.init_app(app, socketio)
+from services.presence import presence
+presence.init_app(app, socketio)
+from services.typing_indicators import typing_indicators
+typing_indicators.init_app(app, socketio)
+from services.ice_relay import ice_relay
+ice_relay.init_app(app, socketio)
+from services.call_expiry import call_expiry
+call_expiry.init_app(app, socketio)
+from services.call_participants import call_participants
+call_participants.init_app(app, socketio)
+from services.jaas_tokens import jaas_tokens
+jaas_tokens.init_app(app)
+from services.call_channels import announce_call_started, call_channel, WATCH_LIMIT
+from services.active_calls import active_calls
+active_calls.init_app(app, socketio)
+# Notifications are written and pushed by a background pipeline, not in the request
+from services.notifications import notifications
+notifications.init_app(app, socketio)
+from services import notification_counts
+from services import scheduler_lease
+from services.chat_writer import chat_writer
+from services.read_cursors import read_marks
+read_marks.init_app(app)
+chat_writer.init_app(app)
+from services.room_cache import room_cache
+room_cache.init_app(app)
+from services.room_directory import room_directory
+room_directory.init_app(app)
+from services.chat_archive import chat_archive
+chat_archive.init_app(app)
+# Per-user/per-socket token buckets, checked before any DB or disk work
+from services.rate_limit import rate_limiter
+rate_limiter.init_app(app)
 
 # Import models after db initialization
-from models import User, Resource, CommunityPost, ChatMessage, FileSubmission, Notification, Campaign, VideoCall, ChatRoom
-# --- Background cleanup for stale/ended video calls ---
-def cleanup_stale_video_calls():
-    with app.app_context():
-        try:
-            threshold_minutes = int(os.environ.get('VIDEO_CALL_MAX_IDLE_MINUTES', '15'))
-            cutoff = datetime.utcnow() - timedelta(minutes=threshold_minutes)
-            stale_calls = VideoCall.query.filter(
-                VideoCall.is_active == True,
-                VideoCall.created_at < cutoff
-            ).all()
-            count = 0
-            for call in stale_calls:
-                call.is_active = False
-                call.ended_at = datetime.utcnow()
-                count += 1
-            if count:
-                db.session.commit()
-                # Notify rooms for visibility
-                for call in stale_calls:
-                    if call.chat_room:
-                        socketio.emit('video_call_ended', {
-                            'message': f'Video call "{call.title}" has ended (inactive)',
-                            'video_room_id': call.room_id,
-                            'chat_room': call.chat_room
-                        }, room=call.chat_room)
-        except Exception as e:
-            print(f"Video call cleanup error: {e}")
-
-
+from models import User, Resource, CommunityPost, FileSubmission, Notification, Campaign, VideoCall
+# --- Background schedulers: video call expiry and chat retention ---
 def start_cleanup_scheduler():
-    import threading, time
-    interval_seconds = int(os.environ.get('VIDEO_CALL_CLEANUP_INTERVAL_SEC', '120'))
+    # Idle calls end on their own deadline; only the worker holding the lease runs this
+    call_expiry.start()
 
-    def loop():
+    # Unread notification counters: fix any drift from the rows (one worker at a time)
+    def notification_count_loop():
+        interval = app.config.get('NOTIFY_RECONCILE_MIN', 60) * 60
         while True:
+            socketio.sleep(interval)
             try:
-                cleanup_stale_video_calls()
+                with app.app_context():
+                    if scheduler_lease.acquire('notification_reconcile', interval * 2):
+                        notification_counts.reconcile()
             except Exception as e:
-                print(f"Cleanup loop error: {e}")
-            time.sleep(interval_seconds)
+                print(f"Notification counter reconcile error: {e}")
+
+    socketio.start_background_task(notification_count_loop)
+
+    # Chat retention: archive, compact and incrementally vacuum (only when a policy is set).
+    # One worker at a time, so two never archive the same room/month into duplicate segments
+    if chat_archive.enabled:
+        def retention_loop():
+            while True:
+                socketio.sleep(chat_archive.interval)
+                try:
+                    with app.app_context():
+                        if scheduler_lease.acquire('chat_retention', chat_archive.interval * 2):
+                            chat_archive.run_once()
+                except Exception as e:
+                    print(f"Chat retention loop error: {e}")
 
-    thread = threading.Thread(target=loop, daemon=True)
-    thread.start()
+        socketio.start_background_task(retention_loop)
 
 
 # Import blueprints
@@ -91,6 +128,48 @@ with app.app_context():
         db.create_all()
     except Exception as e:
         print(f"Warning: could not ensure all tables exist: {e}")
+    # create_all() skips columns added to existing tables (SQLite-safe migration)...
+    if db.engine.dialect.name == 'sqlite':
+        try:
+            from sqlalchemy import text
+            added_columns = {
+                'user': [('unread_notifications', 'INTEGER NOT NULL DEFAULT 0')],
+                'video_call': [('last_activity_at', 'DATETIME'), ('peak_participants', 'INTEGER DEFAULT 0'),
+                               ('participant_seconds', 'INTEGER DEFAULT 0')],
+                'notification': [('actor_count', 'INTEGER DEFAULT 1'), ('actors', 'TEXT'),
+                                 ('actor_id', 'INTEGER REFERENCES user(id)'), ('target_type', 'VARCHAR(30)'),
+                                 ('target_id', 'INTEGER'), ('updated_at', 'DATETIME')],
+            }
+            added = set()
+            for table, columns in added_columns.items():
+                cols = {row[1] for row in db.session.execute(text(f"PRAGMA table_info({table})"))}
+                for name, ddl in columns:
+                    if name not in cols:
+                        db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                        added.add((table, name))
+            db.session.commit()
+            if ('notification', 'actor_id') in added:
+                from services.notifications import backfill_structured_columns
+                print(f"Backfilled actor/target on {backfill_structured_columns()} notifications")
+            if ('notification', 'updated_at') in added:
+                db.session.execute(text("UPDATE notification SET updated_at = created_at"))
+                db.session.commit()
+            if ('user', 'unread_notifications') in added:
+                print(f"Initialized unread notification counters for {notification_counts.reconcile()} users")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Warning: could not ensure added columns exist: {e}")
+    # ...and indexes on tables that already exist
+    try:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+    except Exception as e:
+        print(f"Warning: could not ensure indexes exist: {e}")
+
+# Full-text index over chat history (SQLite FTS5, kept in sync by triggers)
+from services.chat_search import chat_search
+chat_search.init_app(app)
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -98,125 +177,201 @@ def load_user(user_id):
 
 # Socket.IO session handler
 @socketio.on('connect')
-def handle_connect():
-    print(f"Socket.IO connection attempt from user: {current_user}")
-    print(f"User authenticated: {current_user.is_authenticated}")
+@socket_metrics.track('connect')
+def handle_connect(auth=None):
+    # Takes auth (and disconnect takes reason) so Flask-SocketIO's first call matches;
+    # a TypeError would make it call the tracked handler a second time
+    socket_log.debug("Socket.IO connection attempt from user: %s (authenticated: %s)",
+                     current_user, current_user.is_authenticated)
     if current_user.is_authenticated:
         join_room(f"user_{current_user.id}")
         emit('status', {'msg': f'{current_user.username} has connected'})
-        print(f"User {current_user.username} connected successfully")
     else:
-        print("Unauthenticated connection attempt - allowing connection anyway for testing")
+        socket_log.debug("Unauthenticated connection attempt - allowing connection anyway for testing")
         # For now, allow unauthenticated connections to test
         # return False
 
 # Socket.IO events for real-time chat and WebRTC signaling
 
 @socketio.on('disconnect')
-def on_disconnect():
+@socket_metrics.track('disconnect')
+def on_disconnect(reason=None):
+    for room, info in presence.leave_all(request.sid):
+        presence.announce(room, left=info)
+    typing_indicators.forget(request.sid)
+    ice_relay.forget(request.sid)
+    call_participants.leave_all(request.sid)
     if current_user.is_authenticated:
         leave_room(f"user_{current_user.id}")
         emit('status', {'msg': f'{current_user.username} has disconnected'})
 
 @socketio.on('join_chat')
+@socket_metrics.track('join_chat')
+@rate_limiter.limit('join_chat')
 def on_join_chat(data):
-    print(f"Join chat request from user: {current_user}")
-    print(f"User authenticated: {current_user.is_authenticated}")
+    socket_log.debug("Join chat request from user: %s (authenticated: %s)", current_user, current_user.is_authenticated)
     room = data['room']
     # Enforce private room access: only creator or admin may join private rooms
-    chat_room = ChatRoom.query.filter_by(room_id=room).first()
-    if chat_room and chat_room.is_private:
-        is_allowed = current_user.is_authenticated and (current_user.is_admin() or chat_room.created_by == current_user.id)
-        if not is_allowed:
-            emit('receive_message', {'message': 'Access denied to private room', 'username': 'System', 'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')})
-            return
-    print(f"Joining room: {room}")
+    if not room_cache.can_access(current_user, room):
+        emit('receive_message', {'message': 'Access denied to private room', 'username': 'System', 'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')})
+        return
     join_room(room)
     username = current_user.username if current_user.is_authenticated else "Anonymous"
     emit('user_joined', {'username': username}, room=room)
-    print(f"User {username} joined room {room}")
+    socket_metrics.record_fanout(room)
+    joined = presence.join(room, request.sid, current_user)
+    if joined is not None:
+        presence.announce(room, joined=joined)
+    # Current call state for this room, so the page does not have to poll for it
+    emit('video_call_state', active_calls.state(room))
+    socket_log.debug("User %s joined room %s", username, room)
 
 @socketio.on('leave_chat')
+@socket_metrics.track('leave_chat')
 def on_leave_chat(data):
-    print(f"Leave chat request from user: {current_user}")
     room = data['room']
-    print(f"Leaving room: {room}")
     leave_room(room)
     username = current_user.username if current_user.is_authenticated else "Anonymous"
     emit('user_left', {'username': username}, room=room)
-    print(f"User {username} left room {room}")
+    socket_metrics.record_fanout(room)
+    left = presence.leave(room, request.sid)
+    if left is not None:
+        presence.announce(room, left=left)
+    typing_indicators.update(room, request.sid, current_user, is_typing=False)
+    socket_log.debug("User %s left room %s", username, room)
+
+@socketio.on('typing')
+@socket_metrics.track('typing')
+@rate_limiter.limit('typing')
+def on_typing(data):
+    """Record typing state only; the coalescer broadcasts aggregated updates"""
+    room = (data or {}).get('room')
+    if not room or not room_cache.can_access(current_user, room):
+        return
+    typing_indicators.update(room, request.sid, current_user, is_typing=bool(data.get('typing', True)))
+
+@socketio.on('mark_read')
+@socket_metrics.track('mark_read')
+@rate_limiter.limit('mark_read')
+def on_mark_read(data):
+    """Move the user's read cursor to the end of the room (coalesced, written on the next flush)"""
+    room = (data or {}).get('room')
+    if not room or not current_user.is_authenticated or not room_cache.can_access(current_user, room):
+        return
+    read_marks.mark(current_user.id, room)
+
+@socketio.on('presence_heartbeat')
+def on_presence_heartbeat(data=None):
+    presence.heartbeat(request.sid)
+    presence.sweep()
+
+@socketio.on('get_presence')
+@socket_metrics.track('get_presence')
+def on_get_presence(data):
+    """Ack with the room's member list and count (served from memory)"""
+    room = (data or {}).get('room')
+    if not room or not room_cache.can_access(current_user, room):
+        return {'room': room, 'count': 0, 'members': []}
+    presence.sweep()
+    members = presence.members(room)
+    return {'room': room, 'count': len(members), 'members': members}
 
 @socketio.on('send_message')
+@socket_metrics.track('send_message')
+@rate_limiter.limit('send_message')
 def handle_message(data):
-    print(f"Message received from user: {current_user}")
-    print(f"User authenticated: {current_user.is_authenticated}")
+    socket_log.debug("Message received from user: %s (authenticated: %s)", current_user, current_user.is_authenticated)
     room = data['room']
-    # Guard: enforce private room access on send
-    chat_room = ChatRoom.query.filter_by(room_id=room).first()
-    if chat_room and chat_room.is_private:
-        if not (current_user.is_authenticated and (current_user.is_admin() or chat_room.created_by == current_user.id)):
-            emit('receive_message', {'message': 'Access denied to private room', 'username': 'System', 'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')})
-            return
+    # Guard: enforce private room access on send (cached room metadata, no DB round trip when hot)
+    if not room_cache.can_access(current_user, room):
+        emit('receive_message', {'message': 'Access denied to private room', 'username': 'System', 'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')})
+        return
     message = data['message']
-    print(f"Saving message: {message} in room: {room}")
-    
-    # For testing, allow messages even from unauthenticated users
-    if current_user.is_authenticated:
-        # Save message to database
-        chat_message = ChatMessage(
-            content=message,
-            sender_id=current_user.id,
-            room=room,
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(chat_message)
-        db.session.commit()
-        print(f"Message saved with ID: {chat_message.id}")
-        username = current_user.username
-        timestamp = chat_message.timestamp.strftime('%Y-%m-%d %H:%M:%S')
-    else:
-        # For unauthenticated users, just broadcast without saving
-        username = "Anonymous"
-        timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        print("Message not saved (unauthenticated user)")
+    sent_at = datetime.utcnow()
+    timestamp = sent_at.strftime('%Y-%m-%d %H:%M:%S')
+    username = current_user.username if current_user.is_authenticated else "Anonymous"
     
-    # Emit message to room
+    typing_indicators.update(room, request.sid, current_user, is_typing=False)
+    # Emit first so delivery never waits on the database commit
     emit('receive_message', {
         'message': message,
         'username': username,
         'timestamp': timestamp
     }, room=room)
-    print(f"Message emitted to room: {room}")
-    print(f"Message data: {{'message': '{message}', 'username': '{username}', 'timestamp': '{timestamp}'}}")
+    socket_metrics.record_fanout(room)
+    
+    # For testing, allow messages even from unauthenticated users (broadcast only, not saved)
+    if current_user.is_authenticated:
+        # Persist through the write-behind queue (batched by a background writer)
+        chat_writer.enqueue(
+            content=message,
+            sender_id=current_user.id,
+            room=room,
+            timestamp=sent_at
+        )
 
 # --- WebRTC signaling for video calls ---
 @socketio.on('join_call')
+@socket_metrics.track('join_call')
 def on_join_call(data):
     room_id = data.get('room_id')
     if not room_id:
         return
+    if not call_participants.join(room_id, request.sid, current_user.get_id() or f"sid:{request.sid}"):
+        error = {'error': 'call_full', 'room_id': room_id, 'max_participants': call_participants.capacity(room_id)}
+        emit('call_full', error)
+        return error
     join_room(room_id)
+    ice_relay.register(request.sid, bool(data.get('ice_bundle')))
+    call_expiry.touch(room_id)
     emit('call_event', {
         'type': 'user-joined',
-        'user': current_user.get_id()
+        'user': current_user.get_id(),
+        'participants': call_participants.count(room_id)
     }, room=room_id, include_self=False)
+    socket_metrics.record_fanout(room_id)
 
 @socketio.on('leave_call')
+@socket_metrics.track('leave_call')
 def on_leave_call(data):
     room_id = data.get('room_id')
     if not room_id:
         return
     leave_room(room_id)
+    call_participants.leave(room_id, request.sid)
+    call_expiry.touch(room_id)
     emit('call_event', {
         'type': 'user-left',
-        'user': current_user.get_id()
+        'user': current_user.get_id(),
+        'participants': call_participants.count(room_id)
     }, room=room_id, include_self=False)
+    socket_metrics.record_fanout(room_id)
+
+@socketio.on('watch_calls')
+@socket_metrics.track('watch_calls')
+def on_watch_calls(data):
+    # Call listings subscribe to the calls they show, so they hear when those calls end
+    room_ids = (data or {}).get('room_ids') or []
+    if not isinstance(room_ids, list):
+        return
+    for room_id in room_ids[:WATCH_LIMIT]:
+        if isinstance(room_id, str) and room_id:
+            join_room(call_channel(room_id))
+
+@socketio.on('call_heartbeat')
+@socket_metrics.track('call_heartbeat')
+def on_call_heartbeat(data):
+    # Sent by open call pages so calls stay alive while people are in them
+    call_expiry.touch((data or {}).get('room_id'))
 
 @socketio.on('webrtc_offer')
+@socket_metrics.track('webrtc_offer')
+@rate_limiter.limit('webrtc_offer')
 def on_webrtc_offer(data):
     room_id = data.get('room_id')
     offer = data.get('offer')
     to = data.get('to')
+    call_expiry.touch(room_id)
     payload = {
         'type': 'offer',
         'from': current_user.get_id(),
@@ -226,6 +381,7 @@ def on_webrtc_offer(data):
         emit('call_event', payload, to=to)
     else:
         emit('call_event', payload, room=room_id, include_self=False)
+        socket_metrics.record_fanout(room_id)
 
 """Serve uploaded files with appropriate access control.
 
@@ -265,10 +421,13 @@ def serve_uploaded_file(subdir, filename):
         abort(404)
 
 @socketio.on('webrtc_answer')
+@socket_metrics.track('webrtc_answer')
+@rate_limiter.limit('webrtc_answer')
 def on_webrtc_answer(data):
     room_id = data.get('room_id')
     answer = data.get('answer')
     to = data.get('to')
+    call_expiry.touch(room_id)
     payload = {
         'type': 'answer',
         'from': current_user.get_id(),
@@ -278,23 +437,29 @@ def on_webrtc_answer(data):
         emit('call_event', payload, to=to)
     else:
         emit('call_event', payload, room=room_id, include_self=False)
+        socket_metrics.record_fanout(room_id)
 
 @socketio.on('webrtc_ice_candidate')
+@socket_metrics.track('webrtc_ice_candidate')
+@rate_limiter.limit('webrtc_ice_candidate')
 def on_webrtc_ice_candidate(data):
     room_id = data.get('room_id')
-    candidate = data.get('candidate')
     to = data.get('to')
-    payload = {
-        'type': 'ice-candidate',
-        'from': current_user.get_id(),
-        'candidate': candidate
-    }
-    if to:
-        emit('call_event', payload, to=to)
-    else:
-        emit('call_event', payload, room=room_id, include_self=False)
+    if not room_id and not to:
+        return
+    # New clients may trickle several candidates per event
+    candidates = data['candidates'] if isinstance(data.get('candidates'), list) else [data.get('candidate')]
+    # One rate-limit token per event, so cap what one event may fan out into
+    if len(candidates) > ice_relay.max_batch:
+        return {'error': 'too_many_candidates', 'max': ice_relay.max_batch}
+    call_expiry.touch(room_id)
+    # Bundled per (from, to) for clients that joined with ice_bundle; old clients get single events
+    ice_relay.relay(room_id, request.sid, current_user.get_id(), candidates, to=to)
+    if not to:
+        socket_metrics.record_fanout(room_id)
 
 @socketio.on('video_call_started')
+@socket_metrics.track('video_call_started')
 def on_video_call_started(data):
     room = data.get('room')
     video_room_id = data.get('video_room_id')
@@ -308,17 +473,15 @@ def on_video_call_started(data):
         'started_by': started_by,
         'message': f'{started_by} started a video call'
     }, room=room)
+    socket_metrics.record_fanout(room)
 
 @app.route('/community/video_call/announce/<room_id>')
 def announce_call_http(room_id):
     # Minimal endpoint to trigger an announcement (used only if needed)
     call = VideoCall.query.filter_by(room_id=room_id, is_active=True).first()
     if call and call.chat_room:
-        socketio.emit('video_call_available', {
-            'video_room_id': call.room_id,
-            'video_room_url': url_for('community.video_call_room', room_id=call.room_id),
-            'started_by': (current_user.username if current_user.is_authenticated else 'Someone')
-        }, room=call.chat_room)
+        announce_call_started(socketio, call, url_for('community.video_call_room', room_id=call.room_id),
+                              current_user.username if current_user.is_authenticated else 'Someone')
         return jsonify({'ok': True})
     return jsonify({'ok': False})
 
@@ -335,6 +498,7 @@ if __name__ == '__main__':
                 db.session.commit()
         except Exception as e:
             print(f"Warning: could not ensure notification.url column: {e}")
-    # Start background cleanup thread
-    start_cleanup_scheduler()
+    # Start background schedulers in the reloader child, the process that serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_cleanup_scheduler()
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Chat Archive Script for TDRMCD
+Moves chat messages past their room's retention window into compressed
+archive segments, merges segments and reclaims database space. The server
+runs the same job in the background when a retention policy is configured.
+
+    python archive_chat.py                  # archive + compact + incremental vacuum
+    python archive_chat.py --room general   # one room only
+    python archive_chat.py --full-vacuum    # switch SQLite to incremental auto-vacuum (one-off, locks the DB)
+"""
+
+import argparse
+
+from app import app
+from services.chat_archive import chat_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--room', help='archive a single room')
+    parser.add_argument('--no-vacuum', action='store_true', help='skip the incremental vacuum')
+    parser.add_argument('--full-vacuum', action='store_true', help='enable incremental auto-vacuum and run a full VACUUM')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if not chat_archive.enabled:
+            print("No retention policy configured (CHAT_RETENTION_DAYS / CHAT_RETENTION_MAX_MESSAGES / CHAT_RETENTION_ROOMS)")
+        if args.room:
+            moved = chat_archive.archive_room(args.room)
+            compacted = chat_archive.compact()
+            print(f"Archived {moved} messages from {args.room}; merged {compacted} segments")
+            if not args.no_vacuum:
+                chat_archive.vacuum()
+        else:
+            result = chat_archive.run_once(vacuum=not args.no_vacuum)
+            for room, moved in sorted(result['archived'].items()):
+                print(f"Archived {moved} messages from {room}")
+            print(f"Archived {sum(result['archived'].values())} messages; merged {result['segments_compacted']} segments")
+        if args.full_vacuum:
+            print("Running full VACUUM ...")
+            chat_archive.vacuum(full=True)
+            print("Done")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Async Mode Benchmark for TDRMCD
+
+Starts the app once per SOCKETIO_ASYNC_MODE (threading via the development
+server, eventlet/gevent via wsgi.py) against a throwaway SQLite database, then
+measures:
+
+- concurrent WebSocket connections: how many of N clients connect and how long it takes
+- message throughput: one client sends M chat messages to a room that every
+  client has joined; deliveries/sec counts every copy received
+
+Requires the client extras: pip install websocket-client (and gevent gevent-websocket
+for the gevent mode).
+
+    python benchmarks/bench_async_modes.py --clients 200 --messages 200
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOM = 'bench'
+
+THREADING_RUNNER = (
+    "import os; from app import app, socketio; "
+    "socketio.run(app, host='127.0.0.1', port=int(os.environ['PORT']), allow_unsafe_werkzeug=True)"
+)
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_server(mode, port, db_path):
+    env = dict(os.environ,
+               SOCKETIO_ASYNC_MODE=mode,
+               RATE_LIMIT_ENABLED='false',  # one sender floods on purpose
+               DATABASE_URL=f'sqlite:///{db_path}',
+               HOST='127.0.0.1',
+               PORT=str(port))
+    if mode == 'threading':
+        cmd = [sys.executable, '-c', THREADING_RUNNER]
+    else:
+        cmd = [sys.executable, os.path.join(ROOT, 'wsgi.py')]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_for_port(port):
+        proc.kill()
+        raise RuntimeError(f'{mode} server did not start on port {port}')
+    return proc
+
+
+class BenchClient:
+    def __init__(self, url):
+        self.url = url
+        self.sio = socketio.Client(reconnection=False)
+        self.received = 0
+        self.lock = threading.Lock()
+        self.sio.on('receive_message', self._on_message)
+
+    def _on_message(self, data):
+        with self.lock:
+            self.received += 1
+
+    def connect(self):
+        self.sio.connect(self.url, transports=['websocket'], wait_timeout=10)
+        self.sio.emit('join_chat', {'room': ROOM})
+
+
+def run_mode(mode, port, clients, messages, concurrency):
+    db_path = os.path.join(tempfile.mkdtemp(prefix=f'bench-{mode}-'), 'bench.db')
+    proc = start_server(mode, port, db_path)
+    url = f'http://127.0.0.1:{port}'
+    pool = [BenchClient(url) for _ in range(clients)]
+    result = {'mode': mode, 'clients': clients}
+    try:
+        # Phase 1: concurrent WebSocket connections
+        started = time.perf_counter()
+        failures = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(c.connect) for c in pool]:
+                try:
+                    future.result()
+                except Exception:
+                    failures += 1
+        result['connected'] = clients - failures
+        result['connect_sec'] = time.perf_counter() - started
+        connected = [c for c in pool if c.sio.connected]
+        time.sleep(1.0)  # let join_chat settle
+
+        # Phase 2: message throughput (fan-out to every connected client)
+        sender = connected[0]
+        expected = len(connected) * messages
+        started = time.perf_counter()
+        for i in range(messages):
+            sender.sio.emit('send_message', {'room': ROOM, 'message': f'bench {i}'})
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline and sum(c.received for c in connected) < expected:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        delivered = sum(c.received for c in connected)
+        result['delivered'] = delivered
+        result['expected'] = expected
+        result['throughput_sec'] = elapsed
+        result['deliveries_per_sec'] = delivered / elapsed if elapsed else 0.0
+        result['messages_per_sec'] = messages * (delivered / expected if expected else 0) / elapsed if elapsed else 0.0
+    finally:
+        for c in pool:
+            try:
+                c.sio.disconnect()
+            except Exception:
+                pass
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='threading,eventlet,gevent')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=50, help='parallel connection attempts')
+    parser.add_argument('--port', type=int, default=5101, help='first port; each mode uses the next one')
+    args = parser.parse_args()
+
+    results = []
+    for offset, mode in enumerate(m.strip() for m in args.modes.split(',') if m.strip()):
+        print(f'Running {mode} ...', flush=True)
+        try:
+            results.append(run_mode(mode, args.port + offset, args.clients, args.messages, args.concurrency))
+        except Exception as e:
+            print(f'  {mode} failed: {e}')
+
+    print()
+    print(f"{'mode':<10} {'connected':>10} {'connect s':>10} {'delivered':>12} {'msg/s':>10} {'deliveries/s':>14}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['connected']:>6}/{r['clients']:<3} {r['connect_sec']:>10.2f} "
+              f"{r['delivered']:>6}/{r['expected']:<5} {r['messages_per_sec']:>10.1f} {r['deliveries_per_sec']:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
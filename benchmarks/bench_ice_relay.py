@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Trickle-ICE Relay Benchmark for TDRMCD
+
+Simulates call set-up in one room: N participants (VideoCall.max_participants
+defaults to 10) each trickle C candidates to every other participant (full
+mesh), then end-of-candidates. The same traffic runs through the in-process
+Socket.IO server three times:
+
+- legacy:   no client asked for bundles, one call_event per candidate
+- bundled:  every client joined with ice_bundle, candidates coalesced per (from, to)
+- batched:  bundled, and clients also send several candidates per event
+
+and reports server emits and packets delivered per call set-up.
+
+    python benchmarks/bench_ice_relay.py --participants 10 --candidates 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-ice-'), 'bench.db')}")
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+
+from app import app, socketio  # noqa: E402
+from services.ice_relay import ice_relay  # noqa: E402
+
+ROOM = 'bench-call'
+
+
+def candidate(i, peer):
+    return {
+        'candidate': f'candidate:{i}{peer} 1 udp 2122260223 192.168.1.{i % 250 + 1} {50000 + i} typ host generation 0',
+        'sdpMid': '0',
+        'sdpMLineIndex': 0,
+    }
+
+
+def run(mode, participants, per_peer, per_event):
+    clients = [socketio.test_client(app) for _ in range(participants)]
+    try:
+        for client in clients:
+            client.emit('join_call', {'room_id': ROOM, 'ice_bundle': mode != 'legacy'})
+        sids = [socketio.server.manager.sid_from_eio_sid(client.eio_sid, '/') for client in clients]
+        for client in clients:
+            client.get_received()
+
+        emits = 0
+        original_emit = socketio.server.emit
+
+        def counting_emit(*args, **kwargs):
+            nonlocal emits
+            emits += 1
+            return original_emit(*args, **kwargs)
+
+        socketio.server.emit = counting_emit
+        started = time.perf_counter()
+        try:
+            for i, client in enumerate(clients):
+                for j, to in enumerate(sids):
+                    if j == i:
+                        continue
+                    trickle = [candidate(n, j) for n in range(per_peer)] + [None]
+                    step = per_event if mode == 'batched' else 1
+                    for k in range(0, len(trickle), step):
+                        chunk = trickle[k:k + step]
+                        if step == 1:
+                            client.emit('webrtc_ice_candidate', {'room_id': ROOM, 'to': to, 'candidate': chunk[0]})
+                        else:
+                            client.emit('webrtc_ice_candidate', {'room_id': ROOM, 'to': to, 'candidates': chunk})
+            ice_relay.flush(force=True)
+        finally:
+            socketio.server.emit = original_emit
+        elapsed = time.perf_counter() - started
+
+        delivered = 0
+        candidates_received = 0
+        for client in clients:
+            for packet in client.get_received():
+                if packet['name'] != 'call_event':
+                    continue
+                event = packet['args'][0]
+                if event['type'] == 'ice-candidates':
+                    delivered += 1
+                    candidates_received += len(event['candidates'])
+                elif event['type'] == 'ice-candidate':
+                    delivered += 1
+                    candidates_received += 1
+        return {'mode': mode, 'emits': emits, 'delivered': delivered,
+                'candidates': candidates_received, 'elapsed_ms': elapsed * 1000.0}
+    finally:
+        for client in clients:
+            client.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--participants', type=int, default=10)
+    parser.add_argument('--candidates', type=int, default=8, help='candidates each peer trickles to each other peer')
+    parser.add_argument('--per-event', type=int, default=4, help='candidates per client event in batched mode')
+    args = parser.parse_args()
+
+    expected = args.participants * (args.participants - 1) * (args.candidates + 1)
+    print(f"{args.participants} participants, {args.candidates} candidates + end-of-candidates per peer "
+          f"({expected} candidates per call set-up)")
+    print()
+    print(f"{'mode':<8} {'server emits':>13} {'packets delivered':>18} {'candidates':>11} {'ms':>8}")
+    for mode in ('legacy', 'bundled', 'batched'):
+        r = run(mode, args.participants, args.candidates, args.per_event)
+        print(f"{r['mode']:<8} {r['emits']:>13} {r['delivered']:>18} {r['candidates']:>11} {r['elapsed_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Socket.IO Serialization Benchmark for TDRMCD
+
+Encodes the payloads the server actually emits (receive_message, notification,
+call_event offer/answer/ICE) with the JSON and msgpack Socket.IO packet
+classes, optionally followed by permessage-deflate, and reports:
+
+- bytes on the wire per message (raw, and deflated with a per-connection
+  compression context as browsers negotiate it)
+- encode CPU per message (packet encode, and encode + deflate)
+
+The traffic mix is one chat conversation plus one call set-up, repeated.
+Requires: pip install msgpack
+
+    python benchmarks/bench_serialization.py --rounds 2000
+"""
+
+import argparse
+import random
+import string
+import time
+import zlib
+
+from socketio.packet import Packet
+from socketio.msgpack_packet import MsgPackPacket
+
+
+def _rand(n):
+    return ''.join(random.choices(string.ascii_letters + string.digits, k=n))
+
+
+def sdp_offer():
+    """A Chrome-shaped SDP offer (audio + video, bundled) of realistic size"""
+    fingerprint = ':'.join(f'{random.randrange(256):02X}' for _ in range(32))
+    ufrag, pwd = _rand(4), _rand(24)
+    lines = ['v=0', f'o=- {random.randrange(10**18)} 2 IN IP4 127.0.0.1', 's=-', 't=0 0',
+             'a=group:BUNDLE 0 1', 'a=extmap-allow-mixed', 'a=msid-semantic: WMS ' + _rand(36)]
+    media = [
+        ('audio', '9 UDP/TLS/RTP/SAVPF 111 63 9 0 8 13 110 126',
+         ['rtpmap:111 opus/48000/2', 'rtcp-fb:111 transport-cc', 'fmtp:111 minptime=10;useinbandfec=1',
+          'rtpmap:63 red/48000/2', 'fmtp:63 111/111', 'rtpmap:9 G722/8000', 'rtpmap:0 PCMU/8000',
+          'rtpmap:8 PCMA/8000', 'rtpmap:13 CN/8000', 'rtpmap:110 telephone-event/48000',
+          'rtpmap:126 telephone-event/8000']),
+        ('video', '9 UDP/TLS/RTP/SAVPF 96 97 102 103 104 105 106 107 108 109 127 125 39 40 45 46 98 99 100 101',
+         [f'rtpmap:{pt} {codec}/90000' for pt, codec in
+          [(96, 'VP8'), (97, 'rtx'), (102, 'H264'), (103, 'rtx'), (104, 'H264'), (105, 'rtx'),
+           (106, 'H264'), (107, 'rtx'), (108, 'H264'), (109, 'rtx'), (127, 'H264'), (125, 'rtx'),
+           (39, 'H264'), (40, 'rtx'), (45, 'AV1'), (46, 'rtx'), (98, 'VP9'), (99, 'rtx'),
+           (100, 'VP9'), (101, 'rtx')]]
+         + [f'rtcp-fb:{pt} {fb}' for pt in (96, 102, 104, 106, 108, 127, 39, 45, 98, 100)
+            for fb in ('goog-remb', 'transport-cc', 'ccm fir', 'nack', 'nack pli')]
+         + [f'fmtp:{pt} apt={pt - 1}' for pt in (97, 103, 105, 107, 109, 99, 101)]),
+    ]
+    for mid, (kind, fmt, attrs) in enumerate(media):
+        lines += [f'm={kind} {fmt}', 'c=IN IP4 0.0.0.0', 'a=rtcp:9 IN IP4 0.0.0.0',
+                  f'a=ice-ufrag:{ufrag}', f'a=ice-pwd:{pwd}', 'a=ice-options:trickle',
+                  f'a=fingerprint:sha-256 {fingerprint}', 'a=setup:actpass', f'a=mid:{mid}',
+                  'a=extmap:1 urn:ietf:params:rtp-hdrext:ssrc-audio-level',
+                  'a=extmap:2 http://www.webrtc.org/experiments/rtp-hdrext/abs-send-time',
+                  'a=extmap:3 http://www.ietf.org/id/draft-holmer-rmcat-transport-wide-cc-extensions-01',
+                  'a=sendrecv', f'a=msid:{_rand(36)} {_rand(36)}', 'a=rtcp-mux']
+        lines += ['a=' + a for a in attrs]
+        lines += [f'a=ssrc:{random.randrange(2**32)} cname:{_rand(16)}']
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def ice_candidate():
+    ip = '.'.join(str(random.randrange(1, 255)) for _ in range(4))
+    return {
+        'candidate': f'candidate:{random.randrange(2**32)} 1 udp {random.randrange(2**31)} {ip} '
+                     f'{random.randrange(1024, 65535)} typ srflx raddr 0.0.0.0 rport 0 generation 0 '
+                     f'ufrag {_rand(4)} network-id 1 network-cost 10',
+        'sdpMid': str(random.randrange(2)),
+        'sdpMLineIndex': random.randrange(2),
+        'usernameFragment': _rand(4),
+    }
+
+
+def traffic():
+    """One round of typical traffic: (event, payload) pairs"""
+    chat = [('receive_message', {
+        'message': random.choice(['ok', 'Thanks, see you tomorrow!',
+                                  'Has anyone uploaded the irrigation survey for the northern district yet?']),
+        'username': random.choice(['alice', 'bob', 'community_admin']),
+        'timestamp': '2026-01-15 10:%02d:%02d' % (random.randrange(60), random.randrange(60)),
+    }) for _ in range(10)]
+    notification = [('notification', {
+        'id': random.randrange(10**6), 'title': 'New message in #general',
+        'message': 'bob mentioned you in General', 'type': 'chat', 'link': '/community/chat',
+        'created_at': '2026-01-15T10:21:33',
+    })]
+    call = [('call_event', {'type': 'offer', 'from': '12', 'offer': {'type': 'offer', 'sdp': sdp_offer()}}),
+            ('call_event', {'type': 'answer', 'from': '7', 'answer': {'type': 'answer', 'sdp': sdp_offer()}})]
+    call += [('call_event', {'type': 'ice', 'from': '12', 'candidate': ice_candidate()}) for _ in range(8)]
+    return chat + notification + call
+
+
+def encode(packet_class, event, payload):
+    """Encoded Socket.IO packet as it goes into one WebSocket frame"""
+    encoded = packet_class(packet_type=2, data=[event, payload]).encode()
+    if isinstance(encoded, str):
+        encoded = ('4' + encoded).encode('utf-8')  # Engine.IO message prefix
+    return encoded
+
+
+def deflate(compressor, frame):
+    """permessage-deflate with context takeover: sync flush, trailing 4 bytes dropped"""
+    return (compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+
+
+def run(codec, packet_class, messages):
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    by_kind = {}
+    encode_sec = 0.0
+    deflate_sec = 0.0
+    for event, payload in messages:
+        kind = payload.get('type', event) if event == 'call_event' else event
+        started = time.perf_counter()
+        frame = encode(packet_class, event, payload)
+        encoded_at = time.perf_counter()
+        compressed = deflate(compressor, frame)
+        deflate_sec += time.perf_counter() - encoded_at
+        encode_sec += encoded_at - started
+        stats = by_kind.setdefault(kind, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += len(frame)
+        stats[2] += len(compressed)
+    return {'codec': codec, 'by_kind': by_kind, 'encode_sec': encode_sec,
+            'deflate_sec': deflate_sec, 'messages': len(messages)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=1000, help='conversation + call set-up rounds')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    messages = [m for _ in range(args.rounds) for m in traffic()]
+    results = [run('json', Packet, messages), run('msgpack', MsgPackPacket, messages)]
+
+    print(f"{'codec':<8} {'kind':<16} {'msgs':>7} {'raw B/msg':>10} {'deflate B/msg':>14}")
+    for r in results:
+        for kind, (n, raw, compressed) in sorted(r['by_kind'].items()):
+            print(f"{r['codec']:<8} {kind:<16} {n:>7} {raw / n:>10.1f} {compressed / n:>14.1f}")
+    print()
+    print(f"{'codec':<8} {'total raw KB':>13} {'total deflate KB':>17} {'encode us/msg':>14} {'+deflate us/msg':>16}")
+    for r in results:
+        raw = sum(v[1] for v in r['by_kind'].values())
+        compressed = sum(v[2] for v in r['by_kind'].values())
+        n = r['messages']
+        print(f"{r['codec']:<8} {raw / 1024:>13.1f} {compressed / 1024:>17.1f} "
+              f"{r['encode_sec'] / n * 1e6:>14.2f} {(r['encode_sec'] + r['deflate_sec']) / n * 1e6:>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -45,4 +45,77 @@ class Config:
     if JITSI_APP_SECRET:
         # Replace \n with actual newlines for multi-line private key
         JITSI_APP_SECRET = JITSI_APP_SECRET.replace('\\n', '\n')
-    JITSI_KEY_ID = os.environ.get('JITSI_KEY_ID')  # Key ID from JaaS console
\ No newline at end of file
+    JITSI_KEY_ID = os.environ.get('JITSI_KEY_ID')  # Key ID from JaaS console
+    # Signed JaaS tokens are reused until JAAS_TOKEN_REFRESH_SEC before they expire
+    JAAS_TOKEN_TTL_SEC = int(os.environ.get('JAAS_TOKEN_TTL_SEC') or 7200)
+    JAAS_TOKEN_REFRESH_SEC = int(os.environ.get('JAAS_TOKEN_REFRESH_SEC') or 600)
+    JAAS_TOKEN_CACHE_SIZE = int(os.environ.get('JAAS_TOKEN_CACHE_SIZE') or 1000)
+    
+    # Chat write-behind persistence (socket messages are emitted first, then batched to the DB)
+    CHAT_WRITE_BEHIND = os.environ.get('CHAT_WRITE_BEHIND', 'true').lower() in ['true', 'on', '1']
+    CHAT_WRITER_BATCH_SIZE = int(os.environ.get('CHAT_WRITER_BATCH_SIZE') or 100)
+    CHAT_WRITER_FLUSH_INTERVAL_MS = int(os.environ.get('CHAT_WRITER_FLUSH_INTERVAL_MS') or 200)
+    CHAT_WRITER_MAX_QUEUE = int(os.environ.get('CHAT_WRITER_MAX_QUEUE') or 10000)
+    # Socket mark_read events are coalesced and written to read cursors every N ms
+    READ_CURSOR_FLUSH_MS = int(os.environ.get('READ_CURSOR_FLUSH_MS') or 2000)
+    
+    # Notifications: queued by request handlers, bulk-inserted and pushed by a background thread
+    NOTIFY_ASYNC = os.environ.get('NOTIFY_ASYNC', 'true').lower() in ['true', 'on', '1']
+    NOTIFY_BATCH_SIZE = int(os.environ.get('NOTIFY_BATCH_SIZE') or 100)
+    NOTIFY_FLUSH_INTERVAL_MS = int(os.environ.get('NOTIFY_FLUSH_INTERVAL_MS') or 200)
+    NOTIFY_MAX_QUEUE = int(os.environ.get('NOTIFY_MAX_QUEUE') or 10000)
+    # Unread counters are kept incrementally; this recomputes any that drifted
+    NOTIFY_RECONCILE_MIN = max(1, int(os.environ.get('NOTIFY_RECONCILE_MIN') or 60))
+    
+    # Chat room metadata cache (private-room access checks)
+    ROOM_CACHE_TTL_SEC = int(os.environ.get('ROOM_CACHE_TTL_SEC') or 60)
+    ROOM_CACHE_MAX_ENTRIES = int(os.environ.get('ROOM_CACHE_MAX_ENTRIES') or 10000)
+    ROOM_DIRECTORY_TTL_SEC = int(os.environ.get('ROOM_DIRECTORY_TTL_SEC') or 300)
+    ROOM_DIRECTORY_PAGE_SIZE = int(os.environ.get('ROOM_DIRECTORY_PAGE_SIZE') or 50)
+    
+    # Socket.IO message queue for multi-worker deployments (redis://host:6379/0, local:// for tests)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE', '')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL') or 'tdrmcd-socketio'
+    
+    # Socket.IO async mode: threading (dev server), eventlet or gevent (production, via wsgi.py)
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE') or 'threading'
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    
+    # Socket.IO wire format: json (default) or msgpack (binary frames; pages load the matching client)
+    SOCKETIO_SERIALIZER = os.environ.get('SOCKETIO_SERIALIZER') or 'json'
+    SOCKETIO_HTTP_COMPRESSION = os.environ.get('SOCKETIO_HTTP_COMPRESSION', 'true').lower() in ['true', 'on', '1']
+    SOCKETIO_COMPRESSION_THRESHOLD = int(os.environ.get('SOCKETIO_COMPRESSION_THRESHOLD') or 1024)
+    
+    # Socket.IO instrumentation (per-packet logging is expensive; toggle at runtime from the admin API)
+    SOCKET_VERBOSE_LOGGING = os.environ.get('SOCKET_VERBOSE_LOGGING', 'false').lower() in ['true', 'on', '1']
+    SOCKET_METRICS_SAMPLE_RATE = float(os.environ.get('SOCKET_METRICS_SAMPLE_RATE') or 0.1)
+    
+    # Chat room presence (clients heartbeat while a room is open)
+    PRESENCE_TTL_SEC = int(os.environ.get('PRESENCE_TTL_SEC') or 90)
+    
+    # Typing indicators: aggregated per room at most once per flush interval
+    TYPING_FLUSH_INTERVAL_MS = int(os.environ.get('TYPING_FLUSH_INTERVAL_MS') or 300)
+    TYPING_TTL_MS = int(os.environ.get('TYPING_TTL_MS') or 3000)
+    
+    # Chat retention: messages past the window move to compressed archive segments (0 = keep forever)
+    CHAT_RETENTION_DAYS = int(os.environ.get('CHAT_RETENTION_DAYS') or 0)
+    CHAT_RETENTION_MAX_MESSAGES = int(os.environ.get('CHAT_RETENTION_MAX_MESSAGES') or 0)
+    CHAT_RETENTION_ROOMS = os.environ.get('CHAT_RETENTION_ROOMS') or ''
+    CHAT_RETENTION_INTERVAL_MIN = int(os.environ.get('CHAT_RETENTION_INTERVAL_MIN') or 60)
+    CHAT_ARCHIVE_BATCH_SIZE = int(os.environ.get('CHAT_ARCHIVE_BATCH_SIZE') or 1000)
+    CHAT_VACUUM_PAGES = int(os.environ.get('CHAT_VACUUM_PAGES') or 1000)
+    
+    # Token-bucket rate limits per event (tokens per second / burst), e.g. send_message=5/10,chat_upload=0.2/3
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ['true', 'on', '1']
+    RATE_LIMITS = os.environ.get('RATE_LIMITS') or ''
+    
+    # Trickle-ICE bundling: candidates per (from, to) are coalesced for this long (0 = off)
+    ICE_BATCH_WINDOW_MS = int(os.environ.get('ICE_BATCH_WINDOW_MS') or 50)
+    ICE_BATCH_MAX = int(os.environ.get('ICE_BATCH_MAX') or 20)
+    
+    # Video call expiry: calls end after this long without join/leave/signaling/heartbeat activity
+    VIDEO_CALL_MAX_IDLE_MINUTES = int(os.environ.get('VIDEO_CALL_MAX_IDLE_MINUTES') or 15)
+    VIDEO_CALL_ACTIVITY_WRITE_SEC = int(os.environ.get('VIDEO_CALL_ACTIVITY_WRITE_SEC') or 30)
+    SCHEDULER_LEASE_SEC = int(os.environ.get('SCHEDULER_LEASE_SEC') or 30)
+    CALL_STATS_FLUSH_SEC = int(os.environ.get('CALL_STATS_FLUSH_SEC') or 60)
+    ACTIVE_CALLS_REFRESH_SEC = int(os.environ.get('ACTIVE_CALLS_REFRESH_SEC') or 5)
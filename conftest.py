@@ -0,0 +1,57 @@
+"""
+Shared pytest setup for TDRMCD.
+
+Tests that import ``app`` run against a throwaway SQLite file, never the
+database that .env points at. DATABASE_URL is set here, before any test
+module imports the app; load_dotenv() does not override it.
+"""
+
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+
+_db_dir = tempfile.mkdtemp(prefix='tdrmcd-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+
+@pytest.fixture(scope='session')
+def flask_app():
+    """The application, bound to the temporary test database"""
+    from app import app
+    app.config['WTF_CSRF_ENABLED'] = False
+    assert app.config['SQLALCHEMY_DATABASE_URI'].startswith(f"sqlite:///{_db_dir}")
+    yield app
+
+
+@pytest.fixture
+def make_user(flask_app):
+    """Factory for committed users with unique usernames; make_user('bob') is named 'Bob Test' (needs an app context)"""
+    from models import db, User
+
+    def make(name='user'):
+        user = User(username=f"{name}_{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@tdrmcd.test",
+                    first_name=name.capitalize(), last_name='Test')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def logged_in(flask_app):
+    """Factory for test clients logged in as a user (a User or a user id)"""
+    def login(user):
+        client = flask_app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(getattr(user, 'id', user))
+            session['_fresh'] = True
+        return client
+    return login
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_db_dir, ignore_errors=True)
@@ -19,6 +19,8 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    # Denormalized unread notification count (services/notification_counts.py)
+    unread_notifications = db.Column(db.Integer, default=0, nullable=False)
     
     # Relationships
     resources = db.relationship('Resource', backref='author', lazy='dynamic')
@@ -38,7 +40,7 @@ class User(UserMixin, db.Model):
         backref='reviewer_user',
         lazy='dynamic'
     )
-    notifications = db.relationship('Notification', backref='user', lazy='dynamic')
+    notifications = db.relationship('Notification', backref='user', lazy='dynamic', foreign_keys='Notification.user_id')
     
     # Following relationships
     following = db.relationship('Follow', foreign_keys='Follow.follower_id', backref='follower', lazy='dynamic')
@@ -180,9 +182,51 @@ class ChatMessage(db.Model):
     file_name = db.Column(db.String(200))  # Original filename
     file_ext = db.Column(db.String(10))  # File extension
     
+    # Keyset pagination for room history walks (room, timestamp, id)
+    __table_args__ = (
+        db.Index('ix_chat_message_room_timestamp_id', 'room', 'timestamp', 'id'),
+    )
+    
     def __repr__(self):
         return f'<ChatMessage {self.id}>'
 
+class ChatArchiveSegment(db.Model):
+    """Compressed block of archived chat messages for one room and month"""
+    id = db.Column(db.Integer, primary_key=True)
+    room = db.Column(db.String(100), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    first_id = db.Column(db.Integer, nullable=False)
+    last_id = db.Column(db.Integer, nullable=False)
+    first_ts = db.Column(db.DateTime, nullable=False)
+    last_ts = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON list of messages
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_chat_archive_segment_room_last_ts', 'room', 'last_ts'),
+    )
+    
+    def __repr__(self):
+        return f'<ChatArchiveSegment {self.room} {self.month}>'
+
+class ChatReadCursor(db.Model):
+    """Per-user read position in a chat room with an incrementally maintained unread counter"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    room = db.Column(db.String(100), nullable=False)
+    last_read_message_id = db.Column(db.Integer)
+    last_read_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    unread_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'room', name='unique_chat_read_cursor'),
+        db.Index('ix_chat_read_cursor_room', 'room'),
+    )
+    
+    def __repr__(self):
+        return f'<ChatReadCursor {self.user_id}:{self.room}>'
+
 class FileSubmission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -215,6 +259,24 @@ class Notification(db.Model):
     url = db.Column(db.String(255))
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped by every change (new actor folded in, marked read); the REST sync cursor
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Who caused it and what it is about (e.g. 'post', 'comment', 'user')
+    actor_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    target_type = db.Column(db.String(30))
+    target_id = db.Column(db.Integer)
+    # Aggregated notifications ("Bob, Carol and 3 others liked your post")
+    actor_count = db.Column(db.Integer, default=1)
+    actors = db.Column(db.Text)  # JSON list of the most recent actors
+    
+    __table_args__ = (
+        # Follow de-duplication and retraction
+        db.Index('ix_notification_user_unread_type_actor', 'user_id', 'is_read', 'notification_type', 'actor_id'),
+        # Aggregation into the unread row for a target
+        db.Index('ix_notification_user_unread_target', 'user_id', 'is_read', 'target_type', 'target_id'),
+        # Changed-since sync and the ETag version
+        db.Index('ix_notification_user_updated', 'user_id', 'updated_at'),
+    )
     
     def __repr__(self):
         return f'<Notification {self.title}>'
@@ -252,6 +314,9 @@ class VideoCall(db.Model):
     max_participants = db.Column(db.Integer, default=10)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     ended_at = db.Column(db.DateTime)
+    last_activity_at = db.Column(db.DateTime)  # refreshed by join/leave/signaling; drives idle expiry
+    peak_participants = db.Column(db.Integer, default=0)
+    participant_seconds = db.Column(db.Integer, default=0)  # summed time each participant spent in the call
     
     # Relationships
     host = db.relationship('User', backref='hosted_calls')
@@ -259,6 +324,15 @@ class VideoCall(db.Model):
     def __repr__(self):
         return f'<VideoCall {self.title}>'
 
+class SchedulerLease(db.Model):
+    """Named lease so that only one worker runs a background scheduler"""
+    name = db.Column(db.String(64), primary_key=True)
+    owner = db.Column(db.String(128), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<SchedulerLease {self.name} {self.owner}>'
+
 class ChatRoom(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(db.String(100), unique=True, nullable=False)
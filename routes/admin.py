@@ -1,7 +1,22 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
-from models import db, User, Resource, CommunityPost, FileSubmission, Campaign, Notification
+from models import db, User, Resource, CommunityPost, FileSubmission, Campaign
 from forms import CampaignForm
+from services.chat_writer import chat_writer
+from services.read_cursors import read_marks
+from services.room_cache import room_cache
+from services.room_directory import room_directory
+from services.socket_metrics import socket_metrics
+from services.presence import presence
+from services.typing_indicators import typing_indicators
+from services.chat_archive import chat_archive
+from services.rate_limit import rate_limiter
+from services.ice_relay import ice_relay
+from services.call_expiry import call_expiry
+from services.call_participants import call_participants
+from services.jaas_tokens import jaas_tokens
+from services.active_calls import active_calls
+from services.notifications import notifications, notification_actor
 from functools import wraps
 from datetime import datetime
 import os
@@ -131,15 +146,16 @@ def change_resource_status(resource_id):
         resource.status = new_status
         db.session.commit()
         
-        # Create notification for resource author
-        notification = Notification(
-            title=f'Resource Status Update',
-            message=f'Your resource "{resource.title}" status has been changed to {new_status}.',
-            notification_type='info',
-            user_id=resource.author_id
+        # Notify the resource author
+        notifications.notify(
+            resource.author_id,
+            'Resource Status Update',
+            f'Your resource "{resource.title}" status has been changed to {new_status}.',
+            'info',
+            actor=notification_actor(current_user),
+            target_type='resource',
+            target_id=resource.id
         )
-        db.session.add(notification)
-        db.session.commit()
         
         flash(f'Resource status changed to {new_status}.', 'success')
     else:
@@ -177,16 +193,18 @@ def review_file_submission(submission_id):
         submission.reviewed_by = current_user.id
         submission.review_notes = review_notes
         submission.reviewed_at = datetime.utcnow()
+        db.session.commit()
         
-        # Create notification for submitter
-        notification = Notification(
-            title=f'File Submission {action.title()}d',
-            message=f'Your file submission "{submission.title}" has been {action}d. {review_notes}',
-            notification_type='success' if action == 'approve' else 'warning',
-            user_id=submission.submitter_id
+        # Notify the submitter
+        notifications.notify(
+            submission.submitter_id,
+            f'File Submission {action.title()}d',
+            f'Your file submission "{submission.title}" has been {action}d. {review_notes}',
+            'success' if action == 'approve' else 'warning',
+            actor=notification_actor(current_user),
+            target_type='file_submission',
+            target_id=submission.id
         )
-        db.session.add(notification)
-        db.session.commit()
         
         flash(f'File submission {action}d successfully.', 'success')
     else:
@@ -258,6 +276,40 @@ def toggle_campaign(campaign_id):
     flash(f'Campaign "{campaign.title}" has been {status}.', 'success')
     return redirect(url_for('admin.campaigns'))
 
+@admin_bp.route('/api/metrics')
+@login_required
+@admin_required
+def realtime_metrics():
+    """JSON snapshot of realtime pipeline metrics"""
+    return jsonify({
+        'chat_writer': chat_writer.stats(),
+        'read_marks': read_marks.stats(),
+        'room_cache': room_cache.stats(),
+        'room_directory': room_directory.stats(),
+        'socket_events': socket_metrics.snapshot(),
+        'presence': presence.stats(),
+        'typing': typing_indicators.stats(),
+        'chat_archive': chat_archive.stats(),
+        'rate_limits': rate_limiter.stats(),
+        'ice_relay': ice_relay.stats(),
+        'call_expiry': call_expiry.stats(),
+        'call_participants': call_participants.stats(),
+        'jaas_tokens': jaas_tokens.stats(),
+        'active_calls': active_calls.stats(),
+        'notifications': notifications.stats()
+    })
+
+@admin_bp.route('/api/socket_logging', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def socket_logging():
+    """Read or switch verbose Socket.IO logging at runtime"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        verbose = str(data.get('verbose', '')).lower() in ['true', 'on', '1']
+        socket_metrics.set_verbose(verbose)
+    return jsonify({'verbose': socket_metrics.verbose})
+
 @admin_bp.route('/analytics')
 @login_required
 @admin_required
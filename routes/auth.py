@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
-from models import db, User, CommunityPost, Notification
+from models import db, User, CommunityPost
+from services.notifications import notifications, notification_actor, pending_from
+from services import notification_counts
 from sqlalchemy import desc
 from forms import LoginForm, RegistrationForm, EditProfileForm
 from datetime import datetime
@@ -195,38 +197,25 @@ def follow_user(user_id):
     if current_user.follow(user_to_follow):
         # Create notification for the followed user
         # De-duplicate: if there is already an unread 'New Follower' notification from this follower, skip creating another
-        from sqlalchemy import and_
-        recent_same = Notification.query.filter(
-            Notification.user_id == user_to_follow.id,
-            Notification.notification_type == 'info',
-            Notification.title == 'New Follower',
-            Notification.is_read == False,
-            Notification.message.like(f"%{current_user.username}%")
-        ).first()
+        recent_same = pending_from(user_to_follow.id, current_user.id, 'New Follower').first()
 
         if not recent_same:
-            notification = Notification(
-                user_id=user_to_follow.id,
-                title='New Follower',
-                message=f'{current_user.get_full_name()} (@{current_user.username}) started following you.',
-                notification_type='info',
-                url=url_for('auth.user_followers', user_id=user_to_follow.id)
-            )
-            db.session.add(notification)
-            db.session.commit()
-            # Push realtime notification to the recipient's room
-            try:
-                from app import socketio
-                socketio.emit('notification', {
+            # Written and pushed to the recipient's room in the background
+            notifications.notify(
+                user_to_follow.id,
+                'New Follower',
+                f'{current_user.get_full_name()} (@{current_user.username}) started following you.',
+                'info',
+                url_for('auth.user_followers', user_id=user_to_follow.id),
+                actor=notification_actor(current_user),
+                target_type='user',
+                target_id=user_to_follow.id,
+                push={
                     'kind': 'follow',
-                    'notificationId': notification.id,
                     'followerUsername': current_user.username,
-                    'followerFullName': current_user.get_full_name(),
-                    'createdAt': notification.created_at.isoformat(),
-                    'url': notification.url
-                }, room=f"user_{user_to_follow.id}")
-            except Exception:
-                pass
+                    'followerFullName': current_user.get_full_name()
+                }
+            )
 
         # AJAX: return JSON
         is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.accept_mimetypes.best == 'application/json'
@@ -252,26 +241,17 @@ def unfollow_user(user_id):
     if current_user.unfollow(user_to_unfollow):
         # Retract any pending unread 'New Follower' notification from this follower (no noise on quick follow/unfollow)
         try:
-            pending = Notification.query.filter(
-                Notification.user_id == user_to_unfollow.id,
-                Notification.notification_type == 'info',
-                Notification.title == 'New Follower',
-                Notification.is_read == False,
-                Notification.message.like(f"%{current_user.username}%")
-            ).all()
+            # The follow notification may still be queued; write it first so it can be retracted
+            notifications.flush()
+            pending = pending_from(user_to_unfollow.id, current_user.id, 'New Follower').all()
+            removed = [n.id for n in pending]
             for n in pending:
                 db.session.delete(n)
             if pending:
+                notification_counts.subtract(user_to_unfollow.id, len(pending))
                 db.session.commit()
-                # Notify client to refresh notifications (badge may change)
-                try:
-                    from app import socketio
-                    # If we could identify exact IDs, we would emit each; here send a retract without ID to trigger reload
-                    socketio.emit('notification', {
-                        'kind': 'follow_retract'
-                    }, room=f"user_{user_to_unfollow.id}")
-                except Exception:
-                    pass
+                # Drop the retracted items from the user's open tabs (badge may change)
+                notifications.push_change(user_to_unfollow.id, 'follow_retract', removed=removed)
         except Exception:
             db.session.rollback()
         # AJAX: return JSON
@@ -1,13 +1,27 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, abort
 from flask_login import login_required, current_user
-from models import db, CommunityPost, Comment, ChatMessage, FileSubmission, VideoCall, PostLike, ChatRoom, CommentLike, Notification
+from models import db, CommunityPost, Comment, ChatMessage, FileSubmission, VideoCall, PostLike, ChatRoom, CommentLike
 from forms import CommunityPostForm, CommentForm, FileSubmissionForm
 from werkzeug.utils import secure_filename
 import os
 import uuid
 from datetime import datetime, timedelta
 import jwt
-from sqlalchemy import func
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import joinedload
+from services.room_cache import room_cache, RESERVED_ROOM_IDS
+from services.presence import presence
+from services.read_cursors import record_messages, mark_read, unread_counts
+from services.room_directory import room_directory
+from services.chat_search import chat_search
+from services.chat_archive import chat_archive, message_timestamp
+from services.rate_limit import rate_limiter, client_key, rate_limited_error
+from services.call_expiry import call_expiry
+from services.call_participants import call_participants
+from services.jaas_tokens import jaas_tokens
+from services.call_channels import announce_call_started, announce_call_ended
+from services.active_calls import active_calls
+from services.notifications import notifications, notification_actor
 
 community_bp = Blueprint('community', __name__)
 
@@ -260,34 +274,34 @@ def add_comment(id):
         db.session.add(comment)
         db.session.commit()
         
-        # Notifications
-        try:
-            # Reply to a comment
-            if parent_id:
-                parent_comment = Comment.query.get(parent_id)
-                if parent_comment and parent_comment.author_id != current_user.id:
-                    db.session.add(Notification(
-                        title='New reply to your comment',
-                        message=f"{current_user.get_full_name()} replied on '{post.title[:40] or 'your post'}': {comment.content[:80]}",
-                        notification_type='info',
-                        user_id=parent_comment.author_id,
-                        url=url_for('community.post_detail', id=post.id) + '#comments'
-                    ))
-            # Top-level comment on a post
-            else:
-                if post.author_id != current_user.id:
-                    db.session.add(Notification(
-                        title='New comment on your post',
-                        message=f"{current_user.get_full_name()} commented on '{post.title[:40] or 'your post'}'",
-                        notification_type='info',
-                        user_id=post.author_id,
-                        url=url_for('community.post_detail', id=post.id) + '#comments'
-                    ))
-            db.session.commit()
-        except Exception:
-            db.session.rollback()
-            # Fail silently for notifications
-            pass
+        # Notifications (written and pushed in the background)
+        # Reply to a comment
+        if parent_id:
+            parent_comment = Comment.query.get(parent_id)
+            if parent_comment and parent_comment.author_id != current_user.id:
+                notifications.notify(
+                    parent_comment.author_id,
+                    'New reply to your comment',
+                    f"{current_user.get_full_name()} replied on '{post.title[:40] or 'your post'}': {comment.content[:80]}",
+                    'info',
+                    url_for('community.post_detail', id=post.id) + f'#comment-{comment.id}',
+                    actor=notification_actor(current_user),
+                    target_type='comment',
+                    target_id=parent_comment.id
+                )
+        # Top-level comment on a post
+        elif post.author_id != current_user.id:
+            notifications.notify(
+                post.author_id,
+                'New comment on your post',
+                None,
+                'info',
+                url_for('community.post_detail', id=post.id) + '#comments',
+                actor=notification_actor(current_user),
+                target_type='post',
+                target_id=post.id,
+                aggregate=f"{{actors}} commented on '{post.title[:40] or 'your post'}'"
+            )
         
         flash('Comment added successfully!', 'success')
     else:
@@ -309,19 +323,18 @@ def like_comment(comment_id):
         db.session.commit()
         liked = True
         # Notify comment author on like
-        try:
-            if comment.author_id != current_user.id:
-                db.session.add(Notification(
-                    title='Your comment was liked',
-                    message=f"{current_user.get_full_name()} liked your comment",
-                    notification_type='success',
-                    user_id=comment.author_id,
-                    url=url_for('community.post_detail', id=comment.post_id) + '#comments'
-                ))
-                db.session.commit()
-        except Exception:
-            db.session.rollback()
-            pass
+        if comment.author_id != current_user.id:
+            notifications.notify(
+                comment.author_id,
+                'Your comment was liked',
+                None,
+                'success',
+                url_for('community.post_detail', id=comment.post_id) + f'#comment-{comment.id}',
+                actor=notification_actor(current_user),
+                target_type='comment',
+                target_id=comment.id,
+                aggregate="{actors} liked your comment"
+            )
     # Return new like count
     likes_count = CommentLike.query.filter_by(comment_id=comment.id).count()
     return jsonify({'likes': likes_count, 'liked': liked})
@@ -344,19 +357,18 @@ def like_post(id):
         post.likes = (post.likes or 0) + 1
         db.session.commit()
         # Notify post author on like
-        try:
-            if post.author_id != current_user.id:
-                db.session.add(Notification(
-                    title='Your post was liked',
-                    message=f"{current_user.get_full_name()} liked your post '{post.title[:40] or 'post'}'",
-                    notification_type='success',
-                    user_id=post.author_id,
-                    url=url_for('community.post_detail', id=post.id)
-                ))
-                db.session.commit()
-        except Exception:
-            db.session.rollback()
-            pass
+        if post.author_id != current_user.id:
+            notifications.notify(
+                post.author_id,
+                'Your post was liked',
+                None,
+                'success',
+                url_for('community.post_detail', id=post.id),
+                actor=notification_actor(current_user),
+                target_type='post',
+                target_id=post.id,
+                aggregate=f"{{actors}} liked your post '{post.title[:40] or 'post'}'"
+            )
         return jsonify({'likes': post.likes, 'liked': True})
 
 @community_bp.route('/chat')
@@ -371,21 +383,34 @@ def chat():
         slug = ''.join(c.lower() if c.isalnum() else '-' for c in room_name_param).strip('-') or f"room-{uuid.uuid4().hex[:6]}"
         return redirect(url_for('community.chat_room', room_id=slug))
 
-    # Get available chat rooms (default + persisted)
-    default_rooms = [
-        {'id': 'general', 'name': 'General Discussion'},
-        {'id': 'resources', 'name': 'Resource Discussion'},
-        {'id': 'help', 'name': 'Help & Support'},
-        {'id': 'announcements', 'name': 'Announcements'}
-    ]
-    # Only show rooms user can see
-    if current_user.is_authenticated and current_user.is_admin():
-        db_rooms = ChatRoom.query.order_by(ChatRoom.created_at.desc()).all()
-    else:
-        db_rooms = ChatRoom.query.filter(
-            (ChatRoom.is_private == False) | (ChatRoom.created_by == (current_user.id if current_user.is_authenticated else -1))
-        ).order_by(ChatRoom.created_at.desc()).all()
-    return render_template('community/chat.html', rooms=default_rooms, db_rooms=db_rooms)
+    # First page of the cached room directory; the sidebar lazy-loads the rest
+    return render_template('community/chat.html', directory=room_directory.page(current_user))
+
+@community_bp.route('/chat/rooms')
+@login_required
+def chat_room_directory():
+    """Paginated room directory for the sidebar (?offset=50&limit=50)"""
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', None, type=int)
+    return jsonify(room_directory.page(current_user, offset=offset, limit=limit))
+
+@community_bp.route('/chat/unread')
+@login_required
+def chat_unread_counts():
+    """Unread message counts for the rooms on the loaded sidebar page (?room=a&room=b, one cursor-table query)"""
+    requested = list(dict.fromkeys(request.args.getlist('room')))[:100]
+    if not requested:
+        requested = [room['room_id'] for room in room_directory.page(current_user)['rooms']]
+    rooms = [room for room in requested if room_cache.can_access(current_user, room)]
+    return jsonify({'counts': unread_counts(current_user.id, rooms)})
+
+@community_bp.route('/chat/<room_id>/read', methods=['POST'])
+@login_required
+def mark_chat_room_read(room_id):
+    if not room_cache.can_access(current_user, room_id):
+        return jsonify({'error': 'access denied'}), 403
+    cursor = mark_read(current_user.id, room_id)
+    return jsonify({'room': room_id, 'last_read_message_id': cursor.last_read_message_id, 'unread': 0})
 
 @community_bp.route('/chat/create', methods=['POST'])
 @login_required
@@ -398,6 +423,9 @@ def create_chat_room():
         flash('Room name is required', 'error')
         return redirect(url_for('community.chat'))
     slug = ''.join(c.lower() if c.isalnum() else '-' for c in name).strip('-') or f"room-{uuid.uuid4().hex[:6]}"
+    # Built-in rooms have no row; their ids must stay public (see services/room_cache.py)
+    if slug in RESERVED_ROOM_IDS:
+        slug = f"{slug}-{uuid.uuid4().hex[:6]}"
     # Ensure unique slug
     existing = ChatRoom.query.filter_by(room_id=slug).first()
     if existing:
@@ -419,6 +447,8 @@ def create_chat_room():
     )
     db.session.add(room)
     db.session.commit()
+    room_cache.invalidate(slug)
+    room_directory.invalidate()
     if is_ajax:
         return jsonify({
             'success': True,
@@ -432,57 +462,157 @@ def create_chat_room():
 @login_required
 def chat_room(room_id):
     # Serve the same two-column chat template so refreshes and invites hydrate in-place
-    default_rooms = [
-        {'id': 'general', 'name': 'General Discussion'},
-        {'id': 'resources', 'name': 'Resource Discussion'},
-        {'id': 'help', 'name': 'Help & Support'},
-        {'id': 'announcements', 'name': 'Announcements'}
-    ]
-    # Only show rooms user can see
-    if current_user.is_authenticated and current_user.is_admin():
-        db_rooms = ChatRoom.query.order_by(ChatRoom.created_at.desc()).all()
-    else:
-        db_rooms = ChatRoom.query.filter(
-            (ChatRoom.is_private == False) | (ChatRoom.created_by == (current_user.id if current_user.is_authenticated else -1))
-        ).order_by(ChatRoom.created_at.desc()).all()
     # The chat template will auto-join based on URL path
-    return render_template('community/chat.html', rooms=default_rooms, db_rooms=db_rooms)
+    return render_template('community/chat.html', directory=room_directory.page(current_user))
 
 @community_bp.route('/chat/<room_id>/messages')
 @login_required
 def get_room_messages(room_id):
-    """API endpoint to get messages for a specific room"""
+    """API endpoint to get messages for a specific room.
+
+    Keyset paging over (timestamp, id): with no cursor the newest page is
+    returned; ``?before=<id>`` walks back into history and ``?after=<id>``
+    fetches anything newer. Messages in each page are in chronological order.
+    """
     # Enforce private room access
-    room = ChatRoom.query.filter_by(room_id=room_id).first()
-    if room and room.is_private:
-        allowed = current_user.is_authenticated and (current_user.is_admin() or room.created_by == current_user.id)
-        if not allowed:
-            return jsonify({'error': 'access denied'}), 403
-    messages = ChatMessage.query.filter_by(room=room_id).order_by(ChatMessage.timestamp.asc()).limit(50).all()
-    
-    def format_message(msg):
-        message_data = {
-            'id': msg.id,
-            'message': msg.content,  # Use 'message' key to match client expectation
-            'timestamp': msg.timestamp.strftime('%Y-%m-%d %H:%M:%S'),  # Match client format
-            'username': msg.sender.username,
-            'message_type': getattr(msg, 'message_type', None) or 'text'
+    if not room_cache.can_access(current_user, room_id):
+        return jsonify({'error': 'access denied'}), 403
+    
+    before_id = request.args.get('before', type=int)
+    after_id = request.args.get('after', type=int)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 100))
+    
+    query = ChatMessage.query.options(joinedload(ChatMessage.sender)).filter(ChatMessage.room == room_id)
+    anchor_id = after_id if after_id is not None else before_id
+    anchor_archived = False
+    if anchor_id is not None:
+        anchor = db.session.get(ChatMessage, anchor_id)
+        if anchor and anchor.room == room_id:
+            anchor_ts, anchor_key = anchor.timestamp, anchor.id
+        else:
+            # Cursor may point into archived history
+            archived = chat_archive.find(room_id, anchor_id)
+            if archived is None:
+                return jsonify({'error': 'invalid cursor'}), 400
+            anchor_ts, anchor_key = message_timestamp(archived), archived['id']
+            anchor_archived = True
+    
+    if after_id is not None:
+        # Newer than an archived anchor: the rest of the archive comes before live rows
+        older_first = chat_archive.newer(room_id, anchor_ts, anchor_key, limit + 1) if anchor_archived else []
+        query = query.filter(or_(
+            ChatMessage.timestamp > anchor_ts,
+            and_(ChatMessage.timestamp == anchor_ts, ChatMessage.id > anchor_key)
+        )).order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc())
+        rows = [_format_archived_message(m) for m in older_first]
+        if len(rows) <= limit:
+            rows += [_format_message(msg) for msg in query.limit(limit + 1 - len(rows)).all()]
+        has_more = len(rows) > limit
+        messages = rows[:limit]
+    else:
+        if before_id is not None:
+            query = query.filter(or_(
+                ChatMessage.timestamp < anchor_ts,
+                and_(ChatMessage.timestamp == anchor_ts, ChatMessage.id < anchor_key)
+            ))
+        query = query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+        hot = [] if anchor_archived else query.limit(limit + 1).all()
+        rows = [_format_message(msg) for msg in hot]
+        if len(rows) <= limit:
+            # Live history exhausted: fall through to the archive
+            if hot:
+                archive_ts, archive_key = hot[-1].timestamp, hot[-1].id
+            elif before_id is not None:
+                archive_ts, archive_key = anchor_ts, anchor_key
+            else:
+                archive_ts, archive_key = None, None
+            rows += [_format_archived_message(m) for m in
+                     chat_archive.older(room_id, archive_ts, archive_key, limit + 1 - len(rows))]
+        has_more = len(rows) > limit
+        messages = list(reversed(rows[:limit]))
+    
+    return jsonify({
+        'messages': messages,
+        'has_more': has_more,
+        # Cursors for the next requests in either direction
+        'next_before': messages[0]['id'] if messages else before_id,
+        'next_after': messages[-1]['id'] if messages else after_id
+    })
+
+def _format_message(msg):
+    message_data = {
+        'id': msg.id,
+        'message': msg.content,  # Use 'message' key to match client expectation
+        'timestamp': msg.timestamp.strftime('%Y-%m-%d %H:%M:%S'),  # Match client format
+        'username': msg.sender.username,
+        'message_type': getattr(msg, 'message_type', None) or 'text'
+    }
+    
+    # For file messages, include file information
+    if getattr(msg, 'message_type', None) == 'file' and getattr(msg, 'file_url', None):
+        message_data['file'] = {
+            'name': getattr(msg, 'file_name', None) or msg.content,
+            'url': getattr(msg, 'file_url', None),
+            'ext': getattr(msg, 'file_ext', None) or ''
         }
-        
-        # For file messages, include file information
-        if getattr(msg, 'message_type', None) == 'file' and getattr(msg, 'file_url', None):
-            message_data['file'] = {
-                'name': getattr(msg, 'file_name', None) or msg.content,
-                'url': getattr(msg, 'file_url', None),
-                'ext': getattr(msg, 'file_ext', None) or ''
-            }
-        
-        return message_data
     
+    return message_data
+
+def _format_archived_message(message):
+    """Same shape as format_message for a message read from an archive segment"""
+    message_data = {
+        'id': message['id'],
+        'message': message['content'],
+        'timestamp': message['timestamp'][:19],
+        'username': message['username'],
+        'message_type': message['message_type'] or 'text'
+    }
+    if message['message_type'] == 'file' and message['file_url']:
+        message_data['file'] = {
+            'name': message['file_name'] or message['content'],
+            'url': message['file_url'],
+            'ext': message['file_ext'] or ''
+        }
+    return message_data
+
+@community_bp.route('/chat/<room_id>/search')
+@login_required
+def search_room_messages(room_id):
+    """Ranked full-text search within one room (?q=...&cursor=...&limit=20)"""
+    # Same private-room check as the history endpoint
+    if not room_cache.can_access(current_user, room_id):
+        return jsonify({'error': 'access denied'}), 403
+    if not chat_search.available:
+        return jsonify({'error': 'search unavailable'}), 501
+    query = (request.args.get('q') or '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    try:
+        page = chat_search.search(room_id, query, limit=limit, cursor=request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'error': 'invalid cursor'}), 400
+    page['query'] = query
+    return jsonify(page)
+
+@community_bp.route('/chat/presence')
+@login_required
+def chat_presence_counts():
+    """Online counts for several rooms at once (?rooms=general,help)"""
+    rooms = [r for r in (request.args.get('rooms') or '').split(',') if r][:100]
+    presence.sweep()
     return jsonify({
-        'messages': [format_message(msg) for msg in messages]
+        'counts': {room: presence.count(room) for room in rooms if room_cache.can_access(current_user, room)}
     })
 
+@community_bp.route('/chat/<room_id>/presence')
+@login_required
+def chat_room_presence(room_id):
+    """Members currently in a chat room, from the in-memory presence registry"""
+    if not room_cache.can_access(current_user, room_id):
+        return jsonify({'error': 'access denied'}), 403
+    presence.sweep()
+    members = presence.members(room_id)
+    return jsonify({'room': room_id, 'count': len(members), 'members': members})
+
 @community_bp.route('/chat/test')
 @login_required
 def test_chat():
@@ -512,7 +642,8 @@ def test_socket():
 @login_required
 def video_calls():
     active_calls = VideoCall.query.filter_by(is_active=True).order_by(VideoCall.created_at.desc()).all()
-    return render_template('community/video_calls.html', active_calls=active_calls)
+    participants = {call.room_id: call_participants.count(call.room_id) for call in active_calls}
+    return render_template('community/video_calls.html', active_calls=active_calls, participants=participants)
 
 @community_bp.route('/video_call/create', methods=['GET', 'POST'])
 @login_required
@@ -556,6 +687,8 @@ def create_video_call():
         
         db.session.add(video_call)
         db.session.commit()
+        call_expiry.touch(room_id)
+        active_calls.add(video_call)
         
         if request.is_json:
             return jsonify({
@@ -585,14 +718,14 @@ def create_video_call():
         )
         db.session.add(video_call)
         db.session.commit()
+        call_expiry.touch(room_id)
+        active_calls.add(video_call)
         # Announce availability to the chat room
         try:
             from app import socketio
-            socketio.emit('video_call_available', {
-                'video_room_id': room_id,
-                'video_room_url': url_for('community.video_call_room', room_id=room_id, _external=True),
-                'started_by': (current_user.get_full_name() if hasattr(current_user, 'get_full_name') else current_user.username)
-            }, room=prefill_room)
+            announce_call_started(socketio, video_call,
+                                  url_for('community.video_call_room', room_id=room_id, _external=True),
+                                  current_user.get_full_name() if hasattr(current_user, 'get_full_name') else current_user.username)
         except Exception:
             pass
         return redirect(url_for('community.video_call_room', room_id=room_id))
@@ -601,23 +734,13 @@ def create_video_call():
 @community_bp.route('/video_call/check/<chat_room>')
 @login_required
 def check_video_call(chat_room):
-    """Check if there's an active video call for a chat room"""
+    """Active call state for a chat room, read from the in-memory index (ETag/304 aware)"""
     # Enforce private room access for call discovery
-    room = ChatRoom.query.filter_by(room_id=chat_room).first()
-    if room and room.is_private:
-        allowed = current_user.is_authenticated and (current_user.is_admin() or room.created_by == current_user.id)
-        if not allowed:
-            return jsonify({'exists': False})
-    video_call = VideoCall.query.filter_by(chat_room=chat_room, is_active=True).first()
-    
-    if video_call:
-        return jsonify({
-            'exists': True,
-            'room_id': video_call.room_id,
-            'room_url': url_for('community.video_call_room', room_id=video_call.room_id, _external=True)
-        })
-    else:
-        return jsonify({'exists': False})
+    state = active_calls.state(chat_room) if room_cache.can_access(current_user, chat_room) else {'exists': False}
+    response = jsonify(state)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
 
 @community_bp.route('/video_call/<room_id>')
 @login_required
@@ -630,97 +753,27 @@ def video_call_room(room_id):
             return redirect(url_for('community.chat_room', room_id=video_call.chat_room))
         return redirect(url_for('community.video_calls'))
     
-    # JaaS (Jitsi as a Service) Configuration
-    jitsi_app_id = current_app.config.get('JITSI_APP_ID')
-    jitsi_app_secret = current_app.config.get('JITSI_APP_SECRET')
-    jwt_token = None
+    if call_participants.is_full(room_id, current_user.get_id()):
+        flash(f'This video call is full ({video_call.max_participants} participants).', 'warning')
+        if video_call.chat_room:
+            return redirect(url_for('community.chat_room', room_id=video_call.chat_room))
+        return redirect(url_for('community.video_calls'))
     
-    # Generate JWT token for JaaS authentication using official JaaS format
-    jitsi_key_id = current_app.config.get('JITSI_KEY_ID')  # New: Key ID from JaaS console
+    # Opening the call page counts as activity (the page heartbeats while it stays open)
+    call_expiry.touch(room_id)
     
-    if jitsi_app_id and jitsi_app_secret and jitsi_key_id and jitsi_app_id != 'your-jaas-app-id-here':
-        try:
-            import time
-            
-            # Get user display name safely
-            user_name = current_user.username
-            if hasattr(current_user, 'first_name') and hasattr(current_user, 'last_name'):
-                if current_user.first_name and current_user.last_name:
-                    user_name = f"{current_user.first_name} {current_user.last_name}"
-            
-            # Get avatar URL safely
-            avatar_url = ""
-            if hasattr(current_user, 'avatar_url') and current_user.avatar_url:
-                avatar_url = url_for('static', filename=f'uploads/avatars/{current_user.avatar_url}', _external=True)
-            
-            # JaaS JWT payload structure matching official documentation
-            is_moderator = (video_call.host_id == current_user.id)
-            current_time = int(time.time())
-            
-            # JWT Header (required by JaaS)
-            headers = {
-                'alg': 'RS256',
-                'kid': jitsi_key_id,  # CRITICAL: Key ID from JaaS console
-                'typ': 'JWT'
-            }
-            
-            # JWT Payload (as per official JaaS documentation)
-            payload = {
-                'aud': 'jitsi',
-                'iss': 'chat',  # Hardcoded value as per docs
-                'sub': jitsi_app_id,
-                'room': '*',  # Wildcard for all rooms
-                'iat': current_time,
-                'exp': current_time + 7200,  # 2 hours
-                'nbf': current_time - 10,    # Not before
-                
-                'context': {
-                    'user': {
-                        'id': str(current_user.id),
-                        'name': user_name,
-                        'email': current_user.email,
-                        'avatar': avatar_url,
-                        'moderator': is_moderator  # Boolean, not string
-                    },
-                    'features': {
-                        'livestreaming': False,
-                        'recording': False,
-                        'transcription': False,
-                        'outbound-call': False,
-                        'sip-inbound-call': False,
-                        'sip-outbound-call': False,
-                        'whiteboard': True,
-                        'jaas-subscription': True,
-                        'outbound-call-v2': True,
-                        'room-lock': True,
-                        'lobby': False,
-                        'moderation': True,
-                        'virtual-background': True,
-                        'video-sharing': True,
-                        'tile-view': True
-                    }
-                }
-            }
-            
-            # Generate JWT token with headers (CRITICAL for JaaS)
-            jwt_token = jwt.encode(payload, jitsi_app_secret, algorithm='RS256', headers=headers)
-            
-            current_app.logger.info(f"Generated JaaS JWT token for room: {room_id}")
-            current_app.logger.info(f"User: {user_name} (ID: {current_user.id})")
-            current_app.logger.info(f"Moderator: {is_moderator}")
-            current_app.logger.info(f"App ID: {jitsi_app_id}")
-            current_app.logger.info(f"Key ID: {jitsi_key_id}")
-            
-        except Exception as e:
-            current_app.logger.error(f"Error generating JaaS JWT token: {e}")
-            current_app.logger.error(f"App ID: {jitsi_app_id}")
-            current_app.logger.error(f"Key ID: {jitsi_key_id}")
-            current_app.logger.error(f"Private key format check: {jitsi_app_secret.startswith('-----BEGIN') if jitsi_app_secret else False}")
-            jwt_token = None
-    else:
-        current_app.logger.info("JaaS not configured, using public Jitsi rooms")
-        current_app.logger.info(f"App ID: {jitsi_app_id}")
-        current_app.logger.info(f"App Secret configured: {bool(jitsi_app_secret)}")
+    # JaaS (Jitsi as a Service): key parsed once, tokens cached until close to expiry
+    jwt_token = None
+    if jaas_tokens.configured:
+        user_name = current_user.username
+        if current_user.first_name and current_user.last_name:
+            user_name = f"{current_user.first_name} {current_user.last_name}"
+        avatar_url = ""
+        if getattr(current_user, 'avatar_url', None):
+            avatar_url = url_for('static', filename=f'uploads/avatars/{current_user.avatar_url}', _external=True)
+        jwt_token = jaas_tokens.token(current_user, room_id, video_call.host_id == current_user.id,
+                                      user_name, avatar_url)
+    jitsi_app_id = current_app.config.get('JITSI_APP_ID')
     
     return render_template('community/video_call_room.html', 
                          video_call=video_call, 
@@ -809,24 +862,13 @@ def end_video_call(room_id):
     video_call.is_active = False
     video_call.ended_at = datetime.utcnow()
     db.session.commit()
+    call_expiry.cancel(room_id)
+    call_participants.forget(room_id)
+    active_calls.remove(video_call)
     
-    # Notify chat room that call ended
+    # Notify the chat room, participants and pages watching this call (not every client)
     from app import socketio
-    if video_call.chat_room:
-        socketio.emit('video_call_ended', {
-            'message': f'Video call "{video_call.title}" has ended',
-            'video_room_id': room_id,
-            'chat_room': video_call.chat_room
-        }, room=video_call.chat_room)
-        
-        # Also emit to all connected users to ensure they get the update
-        socketio.emit('video_call_ended', {
-            'message': f'Video call "{video_call.title}" has ended',
-            'video_room_id': room_id,
-            'chat_room': video_call.chat_room
-        })
-        
-        current_app.logger.info(f"Video call ended notification sent for room: {video_call.chat_room}")
+    announce_call_ended(socketio, video_call, f'Video call "{video_call.title}" has ended')
     
     return jsonify({'success': True, 'message': 'Video call ended', 'room': video_call.chat_room})
 
@@ -919,6 +961,9 @@ def submit_file():
 @login_required
 def chat_upload():
     """Upload a file to a chat room and emit a message with attachment details."""
+    retry_after = rate_limiter.check('chat_upload', client_key())
+    if retry_after:
+        return jsonify(rate_limited_error('chat_upload', retry_after)), 429
     room = (request.form.get('room') or 'general').strip()
     caption = (request.form.get('caption') or '').strip()
     file = request.files.get('file')
@@ -926,10 +971,8 @@ def chat_upload():
         return jsonify({'error': 'no_file'}), 400
 
     # Private room access check
-    chat_room = ChatRoom.query.filter_by(room_id=room).first()
-    if chat_room and chat_room.is_private:
-        if not (current_user.is_authenticated and (current_user.is_admin() or chat_room.created_by == current_user.id)):
-            return jsonify({'error': 'access_denied'}), 403
+    if not room_cache.can_access(current_user, room):
+        return jsonify({'error': 'access_denied'}), 403
 
     filename = secure_filename(file.filename)
     ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
@@ -954,6 +997,7 @@ def chat_upload():
         file_ext=ext
     )
     db.session.add(chat_message)
+    record_messages([{'room': room, 'sender_id': current_user.id, 'timestamp': chat_message.timestamp}])
     db.session.commit()
 
     payload = {
@@ -1,7 +1,11 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
 from models import db, Resource, CommunityPost, Campaign, Notification, User
-from sqlalchemy import or_, desc
+from sqlalchemy import or_, desc, func
+import hashlib
+from datetime import datetime
+from services.notifications import notifications, notification_json
+from services import notification_counts
 
 main_bp = Blueprint('main', __name__)
 
@@ -43,15 +47,16 @@ def dashboard():
     user_resources = current_user.resources.limit(5).all()
     user_posts = current_user.posts.limit(5).all()
     
-    # Get notifications
-    notifications = current_user.notifications.filter_by(is_read=False).limit(10).all()
+    # Get notifications (the unread counter spares the query when there are none)
+    unread = current_user.unread_notifications or 0
+    notifications = current_user.notifications.filter_by(is_read=False).limit(10).all() if unread else []
     
     # Get statistics
     stats = {
         'total_resources': Resource.query.filter_by(status='active').count(),
         'user_resources': current_user.resources.count(),
         'user_posts': current_user.posts.count(),
-        'unread_notifications': current_user.notifications.filter_by(is_read=False).count()
+        'unread_notifications': unread
     }
     
     # Check if this is a new user (created within last 24 hours)
@@ -229,36 +234,65 @@ def mark_notification_read(notification_id):
         user_id=current_user.id
     ).first_or_404()
     
-    notification.is_read = True
+    # Conditional update so two tabs marking the same item only count it once
+    changed = Notification.query.filter_by(id=notification.id, is_read=False).update({'is_read': True})
+    notification_counts.subtract(current_user.id, changed)
     db.session.commit()
+    notifications.push_change(current_user.id, 'read', ids=[notification.id])
     
     return jsonify({'status': 'success'})
 
 @main_bp.route('/api/notifications/mark_all_read', methods=['POST'])
 @login_required
 def mark_all_notifications_read():
-    Notification.query.filter_by(
+    changed = Notification.query.filter_by(
         user_id=current_user.id,
         is_read=False
     ).update({'is_read': True})
-    
+    # Subtract what was marked rather than zeroing, so rows inserted meanwhile still count
+    notification_counts.subtract(current_user.id, changed)
     db.session.commit()
+    notifications.push_change(current_user.id, 'read', all=True)
     return jsonify({'status': 'success'})
 
 @main_bp.route('/api/notifications')
 @login_required
 def get_notifications():
-    """Return recent notifications for the current user"""
+    """Recent notifications for the current user (ETag/304 aware).
+
+    ``since`` (the ``cursor`` of an earlier response) returns only rows
+    created or changed after it, including aggregated rows that were updated
+    in place and rows marked read; ``since_id`` still returns only newer rows.
+    """
     limit = request.args.get('limit', 10, type=int)
-    items = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.created_at.desc()).limit(limit).all()
-    return jsonify({
-        'notifications': [{
-            'id': n.id,
-            'title': n.title,
-            'message': n.message,
-            'type': n.notification_type,
-            'is_read': n.is_read,
-            'created_at': n.created_at.isoformat(),
-            'url': n.url or ''
-        } for n in items]
-    })
+    since = request.args.get('since', type=datetime.fromisoformat)
+    since_id = request.args.get('since_id', type=int)
+    # Every write bumps updated_at (or the unread counter for deletes), so this indexed
+    # MAX versions the list and a 304 is answered without loading any rows
+    version = db.session.query(func.max(Notification.updated_at)).filter(
+        Notification.user_id == current_user.id
+    ).scalar()
+    unread = current_user.unread_notifications or 0
+    etag = hashlib.sha1(
+        f"{current_user.id}|{version}|{unread}|{request.query_string.decode()}".encode()
+    ).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        query = Notification.query.filter_by(user_id=current_user.id)
+        if since:
+            # >= so rows written in the same instant as the cursor are not missed; clients dedupe by id
+            query = query.filter(Notification.updated_at >= since).order_by(Notification.updated_at.desc())
+        else:
+            if since_id:
+                query = query.filter(Notification.id > since_id)
+            query = query.order_by(Notification.created_at.desc())
+        items = query.limit(limit).all()
+        response = jsonify({
+            'notifications': [notification_json(n) for n in items],
+            'unread': unread,
+            'cursor': version.isoformat() if version else None
+        })
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(etag)
+    return response
@@ -7,7 +7,7 @@ This script initializes and runs the Flask application.
 """
 
 import os
-from app import app, db, socketio
+from app import app, db, socketio, start_cleanup_scheduler
 
 def create_directories():
     """Create necessary directories for file uploads"""
@@ -79,11 +79,16 @@ def main():
     print("   ⚠️  Please change the admin password after first login!")
     print("=" * 50)
     
-    # Run the application
+    # Run the development server (use wsgi.py with eventlet/gevent in production)
+    debug = os.getenv('FLASK_DEBUG', 'True').lower() in ['true', 'on', '1']
+    # Call expiry, notification counter reconcile and chat retention. With the
+    # reloader, only the child process serves requests, so only it runs them.
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_cleanup_scheduler()
     try:
         socketio.run(
             app, 
-            debug=True, 
+            debug=debug, 
             host='0.0.0.0', 
             port=5000,
             allow_unsafe_werkzeug=True
@@ -0,0 +1,120 @@
+"""
+In-memory index of active video calls by chat room.
+
+Chat pages used to poll ``/community/video_call/check/<room>``, which queried
+the database each time. This index is loaded once and kept current by call
+creation, the host ending a call and idle expiry. Each change is pushed to
+the chat room as a ``video_call_state`` event, and joining a chat room pushes
+the current state to the joining socket. The HTTP check endpoint reads only
+this index and answers ``If-None-Match`` with 304.
+
+With a message queue, changes made on other workers are not seen directly,
+so the index reloads at most every ACTIVE_CALLS_REFRESH_SEC when read.
+"""
+
+import threading
+import time
+
+from flask import has_request_context, url_for
+
+from models import VideoCall
+from services.call_participants import call_participants
+
+
+class ActiveCallIndex:
+    def __init__(self, app=None, socketio=None):
+        self.socketio = None
+        self.refresh_interval = 0
+        self._by_room = {}      # chat room -> {'room_id', 'title', 'max_participants'}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._stats = {'reads': 0, 'loads': 0, 'pushes': 0}
+        if app is not None:
+            self.init_app(app, socketio)
+
+    def init_app(self, app, socketio):
+        self.socketio = socketio
+        # Only other workers can make the index stale
+        if app.config.get('SOCKETIO_MESSAGE_QUEUE'):
+            self.refresh_interval = max(1, int(app.config.get('ACTIVE_CALLS_REFRESH_SEC', 5)))
+
+    def get(self, chat_room):
+        """The active call linked to a chat room, or None"""
+        self._ensure_loaded()
+        with self._lock:
+            self._stats['reads'] += 1
+            return self._by_room.get(chat_room)
+
+    def state(self, chat_room):
+        """JSON-ready call state for a chat room"""
+        call = self.get(chat_room)
+        if call is None:
+            return {'room': chat_room, 'exists': False}
+        return {
+            'room': chat_room,
+            'exists': True,
+            'room_id': call['room_id'],
+            'title': call['title'],
+            'room_url': _call_url(call['room_id']),
+            'participants': call_participants.count(call['room_id']),
+            'max_participants': call['max_participants']
+        }
+
+    def add(self, call):
+        """Index a newly created call and push the new state to its chat room"""
+        if not call.chat_room:
+            return
+        self._ensure_loaded()
+        with self._lock:
+            self._by_room[call.chat_room] = _entry(call)
+        self._push(call.chat_room)
+
+    def remove(self, call):
+        """Drop an ended call and push the new state to its chat room"""
+        if not call.chat_room:
+            return
+        with self._lock:
+            current = self._by_room.get(call.chat_room)
+            if current is None or current['room_id'] != call.room_id:
+                return
+            del self._by_room[call.chat_room]
+        self._push(call.chat_room)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['active_calls'] = len(self._by_room)
+        data['refresh_interval_sec'] = self.refresh_interval
+        return data
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and (not self.refresh_interval or time.monotonic() - loaded_at < self.refresh_interval):
+            return
+        calls = VideoCall.query.filter(VideoCall.is_active == True, VideoCall.chat_room.isnot(None)).order_by(VideoCall.created_at.asc()).all()
+        with self._lock:
+            # Newest call wins when a room somehow has several
+            self._by_room = {call.chat_room: _entry(call) for call in calls if call.chat_room}
+            self._loaded_at = time.monotonic()
+            self._stats['loads'] += 1
+
+    def _push(self, chat_room):
+        if self.socketio is None:
+            return
+        self.socketio.emit('video_call_state', self.state(chat_room), to=chat_room)
+        with self._lock:
+            self._stats['pushes'] += 1
+
+
+def _call_url(room_id):
+    # Background tasks (idle expiry) have no request to build an absolute URL from
+    if has_request_context():
+        return url_for('community.video_call_room', room_id=room_id, _external=True)
+    return f"/community/video_call/{room_id}"
+
+
+def _entry(call):
+    return {'room_id': call.room_id, 'title': call.title, 'max_participants': call.max_participants}
+
+
+active_calls = ActiveCallIndex()
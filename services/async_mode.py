@@ -0,0 +1,76 @@
+"""
+Async-mode selection for the Socket.IO server.
+
+SOCKETIO_ASYNC_MODE picks ``threading`` (default, Werkzeug development server),
+``eventlet`` or ``gevent``. The green modes must monkey-patch the standard
+library before Flask, SQLAlchemy or the database driver are imported, which is
+why wsgi.py calls monkey_patch() before importing the app. This module only
+imports the standard library at load time for the same reason.
+"""
+
+ASYNC_MODES = ('threading', 'eventlet', 'gevent')
+
+
+def resolve_async_mode(value):
+    mode = (value or 'threading').strip().lower()
+    if mode not in ASYNC_MODES:
+        raise ValueError(f"Unsupported SOCKETIO_ASYNC_MODE '{value}' (expected one of: {', '.join(ASYNC_MODES)})")
+    return mode
+
+
+def monkey_patch(mode):
+    """Patch the standard library for a green async mode (no-op for threading)"""
+    if mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+    else:
+        return
+    # psycopg2 talks to Postgres in C; psycogreen makes it yield to the hub (optional)
+    try:
+        if mode == 'eventlet':
+            from psycogreen.eventlet import patch_psycopg
+        else:
+            from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+
+def is_monkey_patched(mode):
+    if mode == 'eventlet':
+        import eventlet.patcher
+        return eventlet.patcher.is_monkey_patched('socket')
+    if mode == 'gevent':
+        try:
+            from gevent import monkey
+        except ImportError:
+            return False
+        return monkey.is_module_patched('socket')
+    return True
+
+
+def engine_options(mode, database_uri, pool_size=10):
+    """SQLAlchemy engine options that keep the connection pool cooperative.
+
+    Once threading is monkey-patched the pool's locks are green, so a greenlet
+    waiting for a connection parks on the hub instead of blocking the process.
+    The pool is sized to the expected DB concurrency and checkouts time out
+    quickly rather than piling up thousands of waiting greenlets. SQLite calls
+    still block the hub while they run; use Postgres with psycogreen for heavy
+    write loads.
+    """
+    if mode == 'threading':
+        return {}
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': pool_size,
+        'pool_timeout': 10,
+        'pool_pre_ping': True,
+    }
+    if database_uri.startswith('sqlite'):
+        # Short busy timeout: a locked database should not freeze the hub for seconds
+        options['connect_args'] = {'timeout': 2}
+    return options
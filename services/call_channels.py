@@ -0,0 +1,46 @@
+"""
+Targeted fan-out for video call lifecycle events.
+
+Call start and end events only go to the sockets that care about that call,
+never to every connected client:
+
+- members of the linked chat room (they joined it with ``join_chat``)
+- call participants (the call's room id, joined with ``join_call``)
+- watchers: pages listing calls send ``watch_calls`` with the ids they show
+  and are put in the call's ``call:<room id>`` channel
+
+One emit to the list of rooms delivers each event once per socket, even when
+a socket is in several of them. With a message queue that is one published
+message per event.
+"""
+
+
+WATCH_LIMIT = 100
+
+
+def call_channel(room_id):
+    return f"call:{room_id}"
+
+
+def call_rooms(room_id, chat_room=None):
+    """Every room whose sockets should hear about this call"""
+    rooms = [call_channel(room_id), room_id]
+    if chat_room:
+        rooms.append(chat_room)
+    return rooms
+
+
+def announce_call_ended(socketio, call, message):
+    socketio.emit('video_call_ended', {
+        'message': message,
+        'video_room_id': call.room_id,
+        'chat_room': call.chat_room
+    }, to=call_rooms(call.room_id, call.chat_room))
+
+
+def announce_call_started(socketio, call, video_room_url, started_by):
+    socketio.emit('video_call_available', {
+        'video_room_id': call.room_id,
+        'video_room_url': video_room_url,
+        'started_by': started_by
+    }, to=call_rooms(call.room_id, call.chat_room))
@@ -0,0 +1,240 @@
+"""
+Activity-driven expiry for video calls.
+
+A call ends once nothing has happened in it for VIDEO_CALL_MAX_IDLE_MINUTES.
+Creating it, opening the call page, join/leave, signaling and the call
+page's heartbeat all count as activity. Deadlines sit in a min-heap with at
+most one entry per call: activity only moves the call's deadline in a dict,
+and a popped entry whose deadline has moved is pushed back. Refreshing a call
+is O(1), expiring one O(log n), and the loop sleeps until the next deadline
+instead of scanning the active calls on an interval.
+
+Only one process runs the scheduler. Workers compete for a ``scheduler_lease``
+row that the holder renews every SCHEDULER_LEASE_SEC/3 seconds. Every worker
+writes activity to ``video_call.last_activity_at`` (at most once per
+VIDEO_CALL_ACTIVITY_WRITE_SEC per call), so the leader ends a due call with
+one conditional UPDATE and pushes it back when another worker saw it more
+recently. A new leader seeds the heap from the active calls once. With a
+message queue, it also picks up calls created on other workers when it
+renews the lease (a primary-key range lookup).
+"""
+
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from models import db, VideoCall
+from services import scheduler_lease
+from services.active_calls import active_calls
+from services.call_channels import announce_call_ended
+
+LEASE_NAME = 'video_call_expiry'
+
+
+class CallExpiryScheduler:
+    def __init__(self, app=None, socketio=None):
+        self.app = None
+        self.socketio = None
+        self.idle = timedelta(minutes=15)
+        self.write_interval = 30
+        self.lease_sec = 30
+        self.shared = False
+        self.owner = scheduler_lease.OWNER
+        self.is_leader = False
+        self._heap = []         # (deadline, room id), at most one entry per call
+        self._queued = set()    # room ids with an entry in the heap
+        self._deadlines = {}    # room id -> current deadline (utc)
+        self._written = {}      # room id -> monotonic time of the last last_activity_at write
+        self._last_call_id = 0
+        self._lock = threading.Lock()
+        self._task = None
+        self._stats = {'expired': 0, 'rescheduled': 0, 'activity_writes': 0, 'lease_changes': 0}
+        if app is not None:
+            self.init_app(app, socketio)
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.idle = timedelta(minutes=max(1, int(app.config.get('VIDEO_CALL_MAX_IDLE_MINUTES', 15))))
+        self.write_interval = max(0, int(app.config.get('VIDEO_CALL_ACTIVITY_WRITE_SEC', 30)))
+        self.lease_sec = max(3, int(app.config.get('SCHEDULER_LEASE_SEC', 30)))
+        self.shared = bool(app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+
+    def start(self):
+        """Start the scheduler loop (it only expires calls while holding the lease)"""
+        with self._lock:
+            if self._task is None:
+                self._task = self.socketio.start_background_task(self._run)
+
+    def touch(self, room_id, now=None):
+        """Record activity on a call: push its deadline back and, now and then, persist it"""
+        if not room_id:
+            return
+        now = now or datetime.utcnow()
+        if self.is_leader:
+            self._schedule(room_id, now + self.idle)
+        mono = time.monotonic()
+        last = self._written.get(room_id)
+        if last is not None and mono - last < self.write_interval:
+            return
+        if len(self._written) > 10000:
+            self._written.clear()
+        self._written[room_id] = mono
+        try:
+            VideoCall.query.filter_by(room_id=room_id, is_active=True).update(
+                {'last_activity_at': now}, synchronize_session=False)
+            db.session.commit()
+            self._stats['activity_writes'] += 1
+        except Exception as e:
+            db.session.rollback()
+            print(f"Video call activity write failed for {room_id}: {e}")
+
+    def cancel(self, room_id):
+        """Forget a call that was ended explicitly"""
+        with self._lock:
+            self._deadlines.pop(room_id, None)
+        self._written.pop(room_id, None)
+
+    def run_due(self, now=None):
+        """End every call whose deadline has passed; returns how many were ended"""
+        now = now or datetime.utcnow()
+        ended = 0
+        while True:
+            with self._lock:
+                if not self._heap or self._heap[0][0] > now:
+                    return ended
+                _, room_id = heapq.heappop(self._heap)
+                self._queued.discard(room_id)
+                deadline = self._deadlines.get(room_id)
+                if deadline is None:
+                    continue
+                if deadline > now:
+                    # Touched since it was queued
+                    heapq.heappush(self._heap, (deadline, room_id))
+                    self._queued.add(room_id)
+                    continue
+                del self._deadlines[room_id]
+            if self._expire(room_id, now):
+                ended += 1
+
+    def stats(self):
+        with self._lock:
+            scheduled = len(self._deadlines)
+            heap_size = len(self._heap)
+            next_deadline = self._heap[0][0] if self._heap else None
+        data = dict(self._stats)
+        data.update({
+            'leader': self.is_leader,
+            'owner': self.owner,
+            'scheduled_calls': scheduled,
+            'heap_size': heap_size,
+            'next_expiry_in_sec': round((next_deadline - datetime.utcnow()).total_seconds(), 1) if next_deadline else None,
+            'idle_minutes': int(self.idle.total_seconds() // 60),
+        })
+        return data
+
+    def _schedule(self, room_id, deadline):
+        with self._lock:
+            current = self._deadlines.get(room_id)
+            if current is None or deadline > current:
+                self._deadlines[room_id] = deadline
+            if room_id not in self._queued:
+                heapq.heappush(self._heap, (deadline, room_id))
+                self._queued.add(room_id)
+
+    def _expire(self, room_id, now):
+        cutoff = now - self.idle
+        try:
+            # Conditional update: activity recorded by another worker keeps the call alive
+            claimed = VideoCall.query.filter(
+                VideoCall.room_id == room_id,
+                VideoCall.is_active == True,
+                func.coalesce(VideoCall.last_activity_at, VideoCall.created_at) <= cutoff,
+            ).update({'is_active': False, 'ended_at': now}, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Video call expiry error for {room_id}: {e}")
+            self._schedule(room_id, now + timedelta(seconds=self.lease_sec))
+            return False
+        call = VideoCall.query.filter_by(room_id=room_id).first()
+        if not claimed:
+            if call is not None and call.is_active:
+                self._schedule(room_id, _last_activity(call) + self.idle)
+                self._stats['rescheduled'] += 1
+            else:
+                self._written.pop(room_id, None)
+            return False
+        self._written.pop(room_id, None)
+        self._stats['expired'] += 1
+        # Delivered on every worker via the message queue
+        if call is not None:
+            active_calls.remove(call)
+            announce_call_ended(self.socketio, call, f'Video call "{call.title}" has ended (inactive)')
+        return True
+
+    def _acquire_lease(self, now):
+        """Take or renew the scheduler lease; True while this process holds it"""
+        return scheduler_lease.acquire(LEASE_NAME, self.lease_sec, self.owner, now)
+
+    def _seed(self):
+        """Queue every active call once, when this process becomes the leader"""
+        calls = VideoCall.query.filter(VideoCall.is_active == True).all()
+        with self._lock:
+            self._heap, self._queued, self._deadlines = [], set(), {}
+        for call in calls:
+            self._schedule(call.room_id, _last_activity(call) + self.idle)
+        self._last_call_id = db.session.query(func.max(VideoCall.id)).scalar() or 0
+
+    def _pick_up_new_calls(self):
+        """Calls created on other workers since the last look"""
+        calls = VideoCall.query.filter(VideoCall.id > self._last_call_id, VideoCall.is_active == True).all()
+        for call in calls:
+            self._schedule(call.room_id, _last_activity(call) + self.idle)
+            self._last_call_id = max(self._last_call_id, call.id)
+
+    def _seconds_to_next(self):
+        with self._lock:
+            if not self._heap:
+                return None
+            return (self._heap[0][0] - datetime.utcnow()).total_seconds()
+
+    def _run(self):
+        renew_every = self.lease_sec / 3.0
+        next_renew = 0.0
+        while True:
+            wait = renew_every
+            try:
+                with self.app.app_context():
+                    if time.monotonic() >= next_renew:
+                        leader = self._acquire_lease(datetime.utcnow())
+                        next_renew = time.monotonic() + renew_every
+                        if leader != self.is_leader:
+                            self._stats['lease_changes'] += 1
+                        if leader and not self.is_leader:
+                            self._seed()
+                        elif leader and self.shared:
+                            self._pick_up_new_calls()
+                        elif not leader and self.is_leader:
+                            with self._lock:
+                                self._heap, self._queued, self._deadlines = [], set(), {}
+                        self.is_leader = leader
+                    if self.is_leader:
+                        self.run_due()
+                        until_due = self._seconds_to_next()
+                        wait = next_renew - time.monotonic()
+                        if until_due is not None:
+                            wait = min(wait, until_due)
+            except Exception as e:
+                print(f"Video call expiry loop error: {e}")
+            self.socketio.sleep(max(0.05, wait))
+
+
+def _last_activity(call):
+    return call.last_activity_at or call.created_at or datetime.utcnow()
+
+
+call_expiry = CallExpiryScheduler()
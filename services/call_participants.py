@@ -0,0 +1,190 @@
+"""
+Live participant registry for video calls.
+
+``join_call``/``leave_call`` and socket disconnects keep an in-memory map of
+who is in each call (a user with several tabs counts once), so participant
+counts are O(1) reads for the call listing and ``check_video_call``. Joins
+past ``VideoCall.max_participants`` are refused; the capacity is looked up
+once per call and cached.
+
+Peak participants and participant-seconds are accumulated in memory and
+written to ``video_call`` in one batched UPDATE every
+CALL_STATS_FLUSH_SEC, not per event. Counts are per worker: with a message
+queue each worker only knows its own sockets.
+"""
+
+import threading
+import time
+
+from sqlalchemy import bindparam, case, func, update
+
+from models import db, VideoCall
+
+
+_calls = VideoCall.__table__
+
+_write_stats = (
+    update(_calls)
+    .where(_calls.c.room_id == bindparam('b_room_id'))
+    .values(
+        peak_participants=case(
+            (func.coalesce(_calls.c.peak_participants, 0) > bindparam('b_peak'), _calls.c.peak_participants),
+            else_=bindparam('b_peak'),
+        ),
+        participant_seconds=func.coalesce(_calls.c.participant_seconds, 0) + bindparam('b_seconds'),
+    )
+)
+
+
+class CallParticipants:
+    def __init__(self, app=None, socketio=None):
+        self.app = None
+        self.socketio = None
+        self.flush_interval = 60
+        self._calls = {}       # room id -> {user id: {sid: joined at (monotonic)}}
+        self._sids = {}        # sid -> {room id: user id}
+        self._capacity = {}    # room id -> max participants (None when the room is not a VideoCall)
+        self._peaks = {}       # room id -> peak participants since the last flush
+        self._seconds = {}     # room id -> participant-seconds not yet written
+        self._since = {}       # (room id, user id) -> start of the unflushed interval
+        self._lock = threading.Lock()
+        self._task = None
+        self._stats = {'joins': 0, 'rejected_full': 0, 'flushes': 0, 'rows_written': 0}
+        if app is not None:
+            self.init_app(app, socketio)
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.flush_interval = max(5, int(app.config.get('CALL_STATS_FLUSH_SEC', 60)))
+
+    def join(self, room_id, sid, user_id):
+        """Add a socket to a call; returns False (and changes nothing) when the call is full"""
+        capacity = self.capacity(room_id)
+        now = time.monotonic()
+        with self._lock:
+            members = self._calls.setdefault(room_id, {})
+            if user_id not in members and capacity and len(members) >= capacity:
+                self._stats['rejected_full'] += 1
+                if not members:
+                    del self._calls[room_id]
+                return False
+            if user_id not in members:
+                self._since[(room_id, user_id)] = now
+            members.setdefault(user_id, {})[sid] = now
+            self._sids.setdefault(sid, {})[room_id] = user_id
+            self._peaks[room_id] = max(self._peaks.get(room_id, 0), len(members))
+            self._stats['joins'] += 1
+        self._ensure_started()
+        return True
+
+    def leave(self, room_id, sid):
+        """Remove a socket from a call"""
+        with self._lock:
+            user_id = self._sids.get(sid, {}).pop(room_id, None)
+            if user_id is not None:
+                self._remove(room_id, sid, user_id, time.monotonic())
+
+    def leave_all(self, sid):
+        """Remove a disconnecting socket from every call; returns the call rooms it was in"""
+        now = time.monotonic()
+        with self._lock:
+            rooms = self._sids.pop(sid, {})
+            for room_id, user_id in rooms.items():
+                self._remove(room_id, sid, user_id, now)
+        return list(rooms)
+
+    def count(self, room_id):
+        return len(self._calls.get(room_id, ()))
+
+    def is_full(self, room_id, user_id):
+        """True when the call is at capacity and the user is not already in it"""
+        capacity = self.capacity(room_id)
+        members = self._calls.get(room_id, {})
+        return bool(capacity) and user_id not in members and len(members) >= capacity
+
+    def capacity(self, room_id):
+        """max_participants of the call behind a room id (cached; None for other rooms)"""
+        if room_id in self._capacity:
+            return self._capacity[room_id]
+        call = VideoCall.query.filter_by(room_id=room_id).first()
+        capacity = (call.max_participants or None) if call is not None else None
+        with self._lock:
+            if len(self._capacity) > 10000:
+                self._capacity.clear()
+            self._capacity[room_id] = capacity
+        return capacity
+
+    def forget(self, room_id):
+        """Drop the cached capacity of a call that has ended (pending stats are still written)"""
+        with self._lock:
+            self._capacity.pop(room_id, None)
+
+    def flush(self):
+        """Write accumulated peaks and participant-seconds for every touched call in one batch"""
+        now = time.monotonic()
+        with self._lock:
+            for (room_id, user_id), since in self._since.items():
+                self._seconds[room_id] = self._seconds.get(room_id, 0.0) + (now - since)
+                self._since[(room_id, user_id)] = now
+            rooms = set(self._peaks) | set(self._seconds)
+            rows = [{
+                'b_room_id': room_id,
+                'b_peak': self._peaks.get(room_id, 0),
+                'b_seconds': int(round(self._seconds.get(room_id, 0.0))),
+            } for room_id in rooms]
+            self._peaks = {room_id: len(members) for room_id, members in self._calls.items() if members}
+            self._seconds = {}
+        if not rows:
+            return 0
+        try:
+            db.session.execute(_write_stats, rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Call participant stats flush failed: {e}")
+            return 0
+        self._stats['flushes'] += 1
+        self._stats['rows_written'] += len(rows)
+        return len(rows)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['calls'] = sum(1 for members in self._calls.values() if members)
+            data['participants'] = sum(len(members) for members in self._calls.values())
+            data['sockets'] = len(self._sids)
+        data['flush_interval_sec'] = self.flush_interval
+        return data
+
+    def _remove(self, room_id, sid, user_id, now):
+        members = self._calls.get(room_id, {})
+        sids = members.get(user_id, {})
+        sids.pop(sid, None)
+        if sids:
+            return
+        members.pop(user_id, None)
+        since = self._since.pop((room_id, user_id), None)
+        if since is not None:
+            self._seconds[room_id] = self._seconds.get(room_id, 0.0) + (now - since)
+        if not members:
+            self._calls.pop(room_id, None)
+
+    def _ensure_started(self):
+        if self._task is not None:
+            return
+        with self._lock:
+            if self._task is None:
+                self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.flush_interval)
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                print(f"Call participant flush loop error: {e}")
+
+
+call_participants = CallParticipants()
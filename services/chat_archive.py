@@ -0,0 +1,323 @@
+"""
+Chat message retention, archival and compaction.
+
+Each room keeps its recent history in ``chat_message``; anything past the
+room's retention window (older than N days and/or beyond the newest N
+messages) is moved into ChatArchiveSegment rows. Each segment is a
+zlib-compressed JSON block for one room and month. Archiving works in small
+batches with a commit per batch, so writers are never blocked for long.
+Compaction merges the segments of a room/month into one. SQLite space is
+given back with incremental VACUUM.
+
+History reads fall through to the archive: ``older``/``newer`` page over
+segments with the same (timestamp, id) ordering as the live table, a few
+segments per query and loading a payload only when the read reaches it, and
+``find`` resolves cursors that point at archived messages. Archived messages
+are no longer in the full-text index.
+
+The retention loop runs on whichever worker holds the ``chat_retention``
+scheduler lease.
+
+Policies come from CHAT_RETENTION_DAYS / CHAT_RETENTION_MAX_MESSAGES, with
+per-room overrides in CHAT_RETENTION_ROOMS, e.g.
+``announcements=365d,general=20000,help=90d/5000`` (0 means unlimited).
+"""
+
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.orm import defer
+
+from models import db, ChatArchiveSegment, ChatMessage, User
+
+
+# Segments fetched per query when paging through a room's archive
+SEGMENT_PAGE = 8
+
+
+class ChatArchive:
+    def __init__(self, app=None):
+        self.default_policy = (0, 0)
+        self.room_policies = {}
+        self.batch_size = 1000
+        self.vacuum_pages = 1000
+        self.interval = 3600
+        self._segment_cache = OrderedDict()  # segment id -> rows (ascending)
+        self._cache_size = 32
+        self._lock = threading.Lock()
+        self._stats = {'runs': 0, 'archived': 0, 'segments_written': 0, 'segments_compacted': 0,
+                       'last_run_ms': 0.0, 'last_run_at': None}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.default_policy = (int(app.config.get('CHAT_RETENTION_DAYS', 0)),
+                               int(app.config.get('CHAT_RETENTION_MAX_MESSAGES', 0)))
+        self.room_policies = parse_room_policies(app.config.get('CHAT_RETENTION_ROOMS', ''))
+        self.batch_size = max(1, int(app.config.get('CHAT_ARCHIVE_BATCH_SIZE', 1000)))
+        self.vacuum_pages = max(0, int(app.config.get('CHAT_VACUUM_PAGES', 1000)))
+        self.interval = max(60, int(app.config.get('CHAT_RETENTION_INTERVAL_MIN', 60)) * 60)
+
+    @property
+    def enabled(self):
+        return any(self.default_policy) or any(any(p) for p in self.room_policies.values())
+
+    def policy(self, room):
+        """(max age in days, max messages) for a room; 0 means unlimited"""
+        return self.room_policies.get(room, self.default_policy)
+
+    # Archival
+
+    def run_once(self, vacuum=True):
+        """Archive every room past its window, compact segments and reclaim some space"""
+        started = time.perf_counter()
+        archived = {}
+        for room in [r for (r,) in db.session.query(ChatMessage.room).distinct().all()]:
+            moved = self.archive_room(room)
+            if moved:
+                archived[room] = moved
+        compacted = self.compact()
+        if vacuum:
+            self.vacuum()
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self._stats['runs'] += 1
+        self._stats['last_run_ms'] = round(elapsed_ms, 3)
+        self._stats['last_run_at'] = datetime.utcnow().isoformat(timespec='seconds')
+        return {'archived': archived, 'segments_compacted': compacted}
+
+    def archive_room(self, room, now=None):
+        """Move messages past the room's retention window into segments; returns how many"""
+        max_days, max_messages = self.policy(room)
+        if not max_days and not max_messages:
+            return 0
+        conditions = []
+        if max_days:
+            conditions.append(ChatMessage.timestamp < (now or datetime.utcnow()) - timedelta(days=max_days))
+        if max_messages:
+            boundary = (ChatMessage.query.with_entities(ChatMessage.timestamp, ChatMessage.id)
+                        .filter(ChatMessage.room == room)
+                        .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+                        .offset(max_messages).first())
+            if boundary is not None:
+                conditions.append(or_(
+                    ChatMessage.timestamp < boundary.timestamp,
+                    and_(ChatMessage.timestamp == boundary.timestamp, ChatMessage.id <= boundary.id)
+                ))
+        if not conditions:
+            return 0
+        # Never move the table's highest id: SQLite would hand it out again to the next insert
+        max_id = db.session.query(func.max(ChatMessage.id)).scalar()
+        moved = 0
+        while True:
+            rows = (ChatMessage.query
+                    .filter(ChatMessage.room == room, ChatMessage.id != max_id, or_(*conditions))
+                    .order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc())
+                    .limit(self.batch_size).all())
+            if not rows:
+                return moved
+            usernames = dict(db.session.query(User.id, User.username)
+                             .filter(User.id.in_({row.sender_id for row in rows})).all())
+            by_month = OrderedDict()
+            for row in rows:
+                by_month.setdefault(row.timestamp.strftime('%Y-%m'), []).append(_to_dict(row, usernames))
+            try:
+                for month, messages in by_month.items():
+                    db.session.add(_segment(room, month, messages))
+                    self._stats['segments_written'] += 1
+                ChatMessage.query.filter(ChatMessage.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Chat archive error in room {room}: {e}")
+                return moved
+            moved += len(rows)
+            self._stats['archived'] += len(rows)
+
+    def compact(self):
+        """Merge rooms' per-month segments into one segment each; returns segments removed"""
+        groups = (db.session.query(ChatArchiveSegment.room, ChatArchiveSegment.month)
+                  .group_by(ChatArchiveSegment.room, ChatArchiveSegment.month)
+                  .having(func.count(ChatArchiveSegment.id) > 1).all())
+        removed = 0
+        for room, month in groups:
+            segments = ChatArchiveSegment.query.filter_by(room=room, month=month).all()
+            messages = sorted((m for seg in segments for m in _decode(seg.payload)),
+                              key=lambda m: (m['timestamp'], m['id']))
+            try:
+                db.session.add(_segment(room, month, messages))
+                for seg in segments:
+                    db.session.delete(seg)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Chat archive compaction error in {room} {month}: {e}")
+                continue
+            removed += len(segments) - 1
+            with self._lock:
+                for seg in segments:
+                    self._segment_cache.pop(seg.id, None)
+        self._stats['segments_compacted'] += removed
+        return removed
+
+    def vacuum(self, full=False):
+        """Give freed pages back to the filesystem (SQLite only).
+
+        Incremental vacuum needs auto_vacuum=INCREMENTAL, which only takes
+        effect after one full VACUUM; ``full=True`` switches the mode and runs it.
+        """
+        if db.engine.dialect.name != 'sqlite':
+            return
+        with db.engine.connect() as conn:
+            conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+            if full:
+                conn.execute(text('PRAGMA auto_vacuum = INCREMENTAL'))
+                conn.execute(text('VACUUM'))
+            elif self.vacuum_pages and conn.execute(text('PRAGMA auto_vacuum')).scalar() == 2:
+                conn.execute(text(f'PRAGMA incremental_vacuum({int(self.vacuum_pages)})'))
+
+    # Reads
+
+    def older(self, room, timestamp, message_id, limit):
+        """Archived messages before (timestamp, id), newest first"""
+        query = ChatArchiveSegment.query.filter(ChatArchiveSegment.room == room)
+        if timestamp is not None:
+            query = query.filter(ChatArchiveSegment.first_ts <= timestamp)
+        key = (_iso(timestamp), message_id) if timestamp is not None else None
+        found = []
+        for seg in _paged(query.order_by(ChatArchiveSegment.last_ts.desc(), ChatArchiveSegment.last_id.desc())):
+            for message in reversed(self._rows(seg)):
+                if key is None or (message['timestamp'], message['id']) < key:
+                    found.append(message)
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def newer(self, room, timestamp, message_id, limit):
+        """Archived messages after (timestamp, id), oldest first"""
+        key = (_iso(timestamp), message_id)
+        found = []
+        query = (ChatArchiveSegment.query
+                 .filter(ChatArchiveSegment.room == room, ChatArchiveSegment.last_ts >= timestamp)
+                 .order_by(ChatArchiveSegment.first_ts.asc(), ChatArchiveSegment.first_id.asc()))
+        for seg in _paged(query):
+            for message in self._rows(seg):
+                if (message['timestamp'], message['id']) > key:
+                    found.append(message)
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def find(self, room, message_id):
+        """An archived message by id, or None"""
+        query = ChatArchiveSegment.query.filter(
+            ChatArchiveSegment.room == room,
+            ChatArchiveSegment.first_id <= message_id,
+            ChatArchiveSegment.last_id >= message_id,
+        ).order_by(ChatArchiveSegment.id)
+        for seg in _paged(query):
+            for message in self._rows(seg):
+                if message['id'] == message_id:
+                    return message
+        return None
+
+    def stats(self):
+        data = dict(self._stats)
+        data['enabled'] = self.enabled
+        data['default_policy'] = {'days': self.default_policy[0], 'max_messages': self.default_policy[1]}
+        data['room_policies'] = len(self.room_policies)
+        return data
+
+    def _rows(self, seg):
+        with self._lock:
+            rows = self._segment_cache.get(seg.id)
+            if rows is not None:
+                self._segment_cache.move_to_end(seg.id)
+                return rows
+        rows = _decode(seg.payload)
+        with self._lock:
+            self._segment_cache[seg.id] = rows
+            while len(self._segment_cache) > self._cache_size:
+                self._segment_cache.popitem(last=False)
+        return rows
+
+
+def _paged(query, page=SEGMENT_PAGE):
+    """Segments of an ordered query, ``page`` at a time, without their payload.
+
+    A read usually stops within the first segment or two, so neither the full
+    segment list nor the payloads of segments it never reaches are loaded.
+    ``_rows`` loads a payload on first access (or serves it from the cache).
+    """
+    query = query.options(defer(ChatArchiveSegment.payload))
+    offset = 0
+    while True:
+        segments = query.offset(offset).limit(page).all()
+        yield from segments
+        if len(segments) < page:
+            return
+        offset += page
+
+
+def parse_room_policies(value):
+    """'general=30d,help=90d/5000,news=2000' -> {room: (days, max_messages)}"""
+    policies = {}
+    for item in (value or '').split(','):
+        room, _, spec = item.strip().partition('=')
+        if not room or not spec:
+            continue
+        days = count = 0
+        for part in spec.split('/'):
+            part = part.strip().lower()
+            if part.endswith('d'):
+                days = int(part[:-1] or 0)
+            elif part:
+                count = int(part)
+        policies[room.strip()] = (days, count)
+    return policies
+
+
+def message_timestamp(message):
+    return datetime.fromisoformat(message['timestamp'])
+
+
+def _iso(value):
+    return value.isoformat(sep=' ', timespec='microseconds')
+
+
+def _to_dict(row, usernames):
+    return {
+        'id': row.id,
+        'content': row.content,
+        'sender_id': row.sender_id,
+        'username': usernames.get(row.sender_id, 'Unknown'),
+        'timestamp': _iso(row.timestamp),
+        'message_type': row.message_type or 'text',
+        'file_url': row.file_url,
+        'file_name': row.file_name,
+        'file_ext': row.file_ext,
+    }
+
+
+def _segment(room, month, messages):
+    return ChatArchiveSegment(
+        room=room,
+        month=month,
+        first_id=min(m['id'] for m in messages),
+        last_id=max(m['id'] for m in messages),
+        first_ts=message_timestamp(messages[0]),
+        last_ts=message_timestamp(messages[-1]),
+        message_count=len(messages),
+        payload=zlib.compress(json.dumps(messages, separators=(',', ':')).encode('utf-8'), 6),
+    )
+
+
+def _decode(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+chat_archive = ChatArchive()
@@ -0,0 +1,162 @@
+"""
+Full-text search over chat history with SQLite FTS5.
+
+``chat_message_fts`` is an external-content FTS5 index over
+``chat_message.content``. Triggers keep it in step with every insert, update
+and delete, whatever the write path: the batched chat writer, chat uploads,
+or bulk cleanup. It is created and backfilled at startup. Each row also
+carries its room as a single token, so a search matches the room inside FTS5
+and only that room's messages are ranked. Results are ranked by bm25 and
+paged with an opaque (rank, id) cursor.
+
+Other databases have no FTS5; ``available`` stays False and the search
+endpoint reports that search is unavailable.
+"""
+
+from markupsafe import escape
+from sqlalchemy import text
+
+from models import db
+
+
+_SNIPPET_OPEN = '\x02'
+_SNIPPET_CLOSE = '\x03'
+
+# Each row is indexed with a room_key column holding its room as one token
+# ('r' + hex of the room id), so a search can put the room into the MATCH.
+# The view supplies room_key when the index is rebuilt
+_ROOM_KEY = "'r' || hex({}.room)"
+
+_DDL = (
+    "CREATE VIEW IF NOT EXISTS chat_message_fts_source AS "
+    f"SELECT id, content, {_ROOM_KEY.format('chat_message')} AS room_key FROM chat_message",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chat_message_fts USING fts5("
+    "content, room_key, content='chat_message_fts_source', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS chat_message_fts_ai AFTER INSERT ON chat_message BEGIN "
+    "INSERT INTO chat_message_fts(rowid, content, room_key) "
+    f"VALUES (new.id, new.content, {_ROOM_KEY.format('new')}); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_message_fts_ad AFTER DELETE ON chat_message BEGIN "
+    "INSERT INTO chat_message_fts(chat_message_fts, rowid, content, room_key) "
+    f"VALUES ('delete', old.id, old.content, {_ROOM_KEY.format('old')}); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_message_fts_au AFTER UPDATE OF content, room ON chat_message BEGIN "
+    "INSERT INTO chat_message_fts(chat_message_fts, rowid, content, room_key) "
+    f"VALUES ('delete', old.id, old.content, {_ROOM_KEY.format('old')}); "
+    "INSERT INTO chat_message_fts(rowid, content, room_key) "
+    f"VALUES (new.id, new.content, {_ROOM_KEY.format('new')}); END",
+)
+
+# An index from before room_key existed is dropped and rebuilt
+_DROP_OLD = (
+    "DROP TRIGGER IF EXISTS chat_message_fts_ai",
+    "DROP TRIGGER IF EXISTS chat_message_fts_ad",
+    "DROP TRIGGER IF EXISTS chat_message_fts_au",
+    "DROP TABLE IF EXISTS chat_message_fts",
+)
+
+# bm25 is only allowed next to the MATCH, so the cursor filter wraps the ranked query.
+# room_key is weighted 0 so it does not change the ranking
+_SEARCH = text(f"""
+    SELECT id, content, timestamp, username, snippet, rank FROM (
+        SELECT m.id AS id, m.content AS content, m.timestamp AS timestamp, u.username AS username,
+               snippet(chat_message_fts, 0, '{_SNIPPET_OPEN}', '{_SNIPPET_CLOSE}', '…', 16) AS snippet,
+               bm25(chat_message_fts, 1.0, 0.0) AS rank
+        FROM chat_message_fts
+        JOIN chat_message m ON m.id = chat_message_fts.rowid
+        LEFT JOIN user u ON u.id = m.sender_id
+        WHERE chat_message_fts MATCH :query AND m.room = :room
+    )
+    WHERE :after_rank IS NULL OR rank > :after_rank OR (rank = :after_rank AND id > :after_id)
+    ORDER BY rank, id
+    LIMIT :limit
+""")
+
+
+class ChatSearch:
+    def __init__(self, app=None):
+        self.available = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create the FTS5 index and its triggers (SQLite only), backfilling on first run"""
+        with app.app_context():
+            if db.engine.dialect.name != 'sqlite':
+                return
+            try:
+                with db.engine.begin() as conn:
+                    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(chat_message_fts)"))}
+                    exists = 'room_key' in columns
+                    if columns and not exists:
+                        for statement in _DROP_OLD:
+                            conn.execute(text(statement))
+                    for statement in _DDL:
+                        conn.execute(text(statement))
+                    if not exists:
+                        conn.execute(text("INSERT INTO chat_message_fts(chat_message_fts) VALUES ('rebuild')"))
+                self.available = True
+            except Exception as e:
+                print(f"Warning: chat search index unavailable: {e}")
+
+    def search(self, room, query, limit=20, cursor=None):
+        """One page of ranked matches in a room; ``cursor`` is the previous page's next_cursor"""
+        match = fts_query(query)
+        if not match:
+            return {'results': [], 'has_more': False, 'next_cursor': None}
+        # The room is part of the MATCH, so FTS5 only ranks this room's rows
+        match = f'room_key : "{room_key(room)}" AND content : ({match})'
+        after_rank, after_id = parse_cursor(cursor)
+        rows = db.session.execute(_SEARCH, {
+            'query': match,
+            'room': room,
+            'after_rank': after_rank,
+            'after_id': after_id,
+            'limit': limit + 1,
+        }).mappings().all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        results = [{
+            'id': row['id'],
+            'message': row['content'],
+            'username': row['username'] or 'Unknown',
+            'timestamp': str(row['timestamp'])[:19] if row['timestamp'] else None,
+            'snippet_html': _snippet_html(row['snippet']),
+            'rank': row['rank'],
+        } for row in rows]
+        last = rows[-1] if rows else None
+        return {
+            'results': results,
+            'has_more': has_more,
+            'next_cursor': f"{last['rank']!r}:{last['id']}" if has_more else None,
+        }
+
+
+def fts_query(raw):
+    """Turn free text into a safe FTS5 query: every word must match, the last one as a prefix"""
+    terms = [term.replace('"', '""') for term in (raw or '').split()][:10]
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def room_key(room):
+    """The token a room's messages are indexed under (same as _ROOM_KEY in SQL)"""
+    return 'r' + (room or '').encode('utf-8').hex().upper()
+
+
+def parse_cursor(cursor):
+    """Split a 'rank:id' cursor; raises ValueError when it is malformed"""
+    if not cursor:
+        return None, None
+    rank, _, message_id = cursor.rpartition(':')
+    return float(rank), int(message_id)
+
+
+def _snippet_html(snippet):
+    html = str(escape(snippet or ''))
+    return html.replace(_SNIPPET_OPEN, '<mark>').replace(_SNIPPET_CLOSE, '</mark>')
+
+
+chat_search = ChatSearch()
@@ -0,0 +1,169 @@
+"""
+Write-behind persistence for Socket.IO chat messages.
+
+Socket handlers emit to the room first and hand the row to this writer, which
+flushes ChatMessage rows in batches from a background thread. The queue is
+bounded; when it is full the message is written inline so memory never grows
+without limit. If a batch insert fails, the rows are retried one at a time so
+one bad row does not lose the rest of the batch.
+"""
+
+import atexit
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from models import db, ChatMessage
+from services.read_cursors import record_messages
+
+
+class ChatMessageWriter:
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.batch_size = 100
+        self.flush_interval = 0.2
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats = {
+            'enqueued': 0,
+            'rows_written': 0,
+            'rows_failed': 0,
+            'batches': 0,
+            'overflow_writes': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('CHAT_WRITE_BEHIND', True)
+        self.batch_size = max(1, int(app.config.get('CHAT_WRITER_BATCH_SIZE', 100)))
+        self.flush_interval = max(1, int(app.config.get('CHAT_WRITER_FLUSH_INTERVAL_MS', 200))) / 1000.0
+        self._queue = queue.Queue(maxsize=max(1, int(app.config.get('CHAT_WRITER_MAX_QUEUE', 10000))))
+        atexit.register(self.stop)
+
+    def enqueue(self, **fields):
+        """Queue a ChatMessage row (column name -> value) for persistence"""
+        fields.setdefault('message_type', 'text')
+        self._count('enqueued')
+        if not self.enabled:
+            self._flush([fields])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            # Backpressure: never buffer past the bound, persist inline instead
+            self._count('overflow_writes')
+            self._flush([fields])
+
+    def flush(self):
+        """Synchronously write everything currently queued"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def stop(self, timeout=5.0):
+        """Stop the background thread and flush whatever is left"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        batches = data['batches']
+        data['avg_flush_ms'] = round(data['total_flush_ms'] / batches, 3) if batches else 0.0
+        data['total_flush_ms'] = round(data['total_flush_ms'], 3)
+        data['queue_depth'] = self._queue.qsize()
+        data['queue_capacity'] = self._queue.maxsize
+        data['enabled'] = self.enabled
+        return data
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='chat-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        with self.app.app_context():
+            error = self._write(batch)
+            written = len(batch) if error is None else 0
+            if error is not None and len(batch) > 1:
+                # One bad row fails the whole insert; write the rows one by one to keep the rest
+                for row in batch:
+                    row_error = self._write([row])
+                    if row_error is None:
+                        written += 1
+                    else:
+                        print(f"Chat writer dropped a message in room {row.get('room')}: {row_error}")
+            elif error is not None:
+                print(f"Chat writer dropped a message in room {batch[0].get('room')}: {error}")
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self._stats['rows_written'] += written
+            self._stats['rows_failed'] += len(batch) - written
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = round(elapsed_ms, 3)
+            self._stats['total_flush_ms'] += elapsed_ms
+            self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], round(elapsed_ms, 3))
+
+    def _write(self, rows):
+        """Insert rows and bump unread counters in one transaction; returns the error, or None"""
+        try:
+            db.session.execute(insert(ChatMessage), rows)
+            record_messages(rows)
+            db.session.commit()
+            return None
+        except Exception as e:
+            db.session.rollback()
+            return e
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+
+chat_writer = ChatMessageWriter()
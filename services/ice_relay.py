@@ -0,0 +1,159 @@
+"""
+Bundled trickle-ICE relay for WebRTC call signaling.
+
+Instead of one ``call_event`` per ICE candidate, candidates are buffered per
+(room, sender, target) for ICE_BATCH_WINDOW_MS and delivered as a single
+``{'type': 'ice-candidates', 'candidates': [...]}`` event. A batch goes out
+early once it holds ICE_BATCH_MAX candidates or the sender signals
+end-of-candidates.
+
+Bundles only go to clients that asked for them (``join_call`` with
+``ice_bundle: true``). Older clients keep getting one ``ice-candidate`` event
+per candidate, with no added delay when nobody in the call can take bundles.
+Capabilities are known per worker. With a message queue, sockets on other
+workers are in neither the bundle nor the legacy list, so room broadcasts
+are never bundled there. Only candidates addressed to one local socket that
+asked for bundles are bundled. Set ICE_BATCH_WINDOW_MS=0 to turn bundling off.
+"""
+
+import threading
+import time
+
+
+class IceRelay:
+    def __init__(self, app=None, socketio=None):
+        self.socketio = None
+        self.window = 0.05
+        self.max_batch = 20
+        self.shared = False
+        self._bundle_sids = set()
+        self._pending = {}   # (room, from sid, to sid or None) -> {'from': user id, 'candidates': [...], 'since': t}
+        self._lock = threading.Lock()
+        self._task = None
+        self._stats = {'candidates_in': 0, 'bundles_out': 0, 'singles_out': 0}
+        if app is not None:
+            self.init_app(app, socketio)
+
+    def init_app(self, app, socketio):
+        self.socketio = socketio
+        self.window = max(0, int(app.config.get('ICE_BATCH_WINDOW_MS', 50))) / 1000.0
+        self.max_batch = max(1, int(app.config.get('ICE_BATCH_MAX', 20)))
+        self.shared = bool(app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+
+    def register(self, sid, ice_bundle):
+        with self._lock:
+            if ice_bundle:
+                self._bundle_sids.add(sid)
+            else:
+                self._bundle_sids.discard(sid)
+
+    def forget(self, sid):
+        with self._lock:
+            self._bundle_sids.discard(sid)
+
+    def relay(self, room, sender_sid, sender_id, candidates, to=None):
+        """Queue candidates for bundling, or pass them straight through when no recipient bundles"""
+        with self._lock:
+            self._stats['candidates_in'] += len(candidates)
+        if not self.window or not self._any_bundle_recipient(room, sender_sid, to):
+            self._emit_singles(room, sender_sid, sender_id, candidates, to)
+            return
+        key = (room, sender_sid, to)
+        end_of_candidates = any(_is_end_of_candidates(c) for c in candidates)
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = {'from': sender_id, 'candidates': [], 'since': time.monotonic()}
+            batch['candidates'].extend(candidates)
+            ready = end_of_candidates or len(batch['candidates']) >= self.max_batch
+            if ready:
+                del self._pending[key]
+        if ready:
+            self._deliver(key, batch)
+        else:
+            self._ensure_started()
+
+    def flush(self, force=False):
+        """Deliver batches whose window has passed (all of them when forced)"""
+        now = time.monotonic()
+        with self._lock:
+            due = [key for key, batch in self._pending.items() if force or now - batch['since'] >= self.window]
+            batches = [(key, self._pending.pop(key)) for key in due]
+        for key, batch in batches:
+            self._deliver(key, batch)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['pending_batches'] = len(self._pending)
+            data['bundle_clients'] = len(self._bundle_sids)
+        data['window_ms'] = int(self.window * 1000)
+        return data
+
+    def _any_bundle_recipient(self, room, sender_sid, to):
+        with self._lock:
+            if to:
+                return to in self._bundle_sids
+            if self.shared:
+                # Remote sockets would get the room-wide bundle and every single candidate
+                return False
+            return any(sid in self._bundle_sids for sid in self._participants(room) if sid != sender_sid)
+
+    def _participants(self, room):
+        return [sid for sid, _ in self.socketio.server.manager.get_participants('/', room)]
+
+    def _deliver(self, key, batch):
+        room, sender_sid, to = key
+        candidates = batch['candidates']
+        bundle = {'type': 'ice-candidates', 'from': batch['from'], 'candidates': candidates}
+        if to:
+            if to in self._bundle_sids:
+                self.socketio.emit('call_event', bundle, to=to)
+                self._count('bundles_out', 1)
+            else:
+                self._emit_singles(room, sender_sid, batch['from'], candidates, to)
+            return
+        members = [sid for sid in self._participants(room) if sid != sender_sid]
+        legacy = [sid for sid in members if sid not in self._bundle_sids]
+        bundled = [sid for sid in members if sid in self._bundle_sids]
+        if bundled:
+            self.socketio.emit('call_event', bundle, room=room, skip_sid=[sender_sid] + legacy)
+            self._count('bundles_out', 1)
+        if legacy:
+            self._emit_singles(room, sender_sid, batch['from'], candidates, None, skip=bundled)
+
+    def _emit_singles(self, room, sender_sid, sender_id, candidates, to, skip=()):
+        for candidate in candidates:
+            payload = {'type': 'ice-candidate', 'from': sender_id, 'candidate': candidate}
+            if to:
+                self.socketio.emit('call_event', payload, to=to)
+            else:
+                self.socketio.emit('call_event', payload, room=room, skip_sid=[sender_sid] + list(skip))
+        self._count('singles_out', len(candidates))
+
+    def _count(self, name, n):
+        with self._lock:
+            self._stats[name] += n
+
+    def _ensure_started(self):
+        if self._task is not None:
+            return
+        with self._lock:
+            if self._task is None:
+                self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.window / 2)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"ICE relay flush failed: {e}")
+
+
+def _is_end_of_candidates(candidate):
+    """A null candidate (or one with an empty candidate line) marks end-of-candidates"""
+    return not candidate or (isinstance(candidate, dict) and not candidate.get('candidate'))
+
+
+ice_relay = IceRelay()
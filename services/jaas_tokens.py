@@ -0,0 +1,140 @@
+"""
+Cached JaaS (Jitsi as a Service) JWT signing.
+
+The PEM in JITSI_APP_SECRET is parsed once at startup instead of on every
+call page load. Signed tokens are cached per (user, call, moderator flag)
+and reused until JAAS_TOKEN_REFRESH_SEC before they expire, so reopening or
+refreshing a call page costs a dict lookup instead of an RSA signature. A
+cached token is re-signed when the user's display name, email or avatar
+changed. Hit, miss and signing-time counters are in ``stats()``.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+
+FEATURES = {
+    'livestreaming': False,
+    'recording': False,
+    'transcription': False,
+    'outbound-call': False,
+    'sip-inbound-call': False,
+    'sip-outbound-call': False,
+    'whiteboard': True,
+    'jaas-subscription': True,
+    'outbound-call-v2': True,
+    'room-lock': True,
+    'lobby': False,
+    'moderation': True,
+    'virtual-background': True,
+    'video-sharing': True,
+    'tile-view': True
+}
+
+
+class JaasTokenSigner:
+    def __init__(self, app=None):
+        self.app_id = None
+        self.key_id = None
+        self.key = None
+        self.ttl = 7200
+        self.refresh_margin = 600
+        self.max_entries = 1000
+        self._cache = OrderedDict()  # (user id, call room id, moderator) -> (identity, token, exp)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'signed': 0, 'errors': 0, 'sign_ms_total': 0.0, 'sign_ms_last': 0.0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app_id = app.config.get('JITSI_APP_ID')
+        self.key_id = app.config.get('JITSI_KEY_ID')
+        self.ttl = max(300, int(app.config.get('JAAS_TOKEN_TTL_SEC', 7200)))
+        self.refresh_margin = min(self.ttl // 2, max(0, int(app.config.get('JAAS_TOKEN_REFRESH_SEC', 600))))
+        self.max_entries = max(1, int(app.config.get('JAAS_TOKEN_CACHE_SIZE', 1000)))
+        self.key = None
+        secret = app.config.get('JITSI_APP_SECRET')
+        if not (self.app_id and self.key_id and secret) or self.app_id == 'your-jaas-app-id-here':
+            return
+        try:
+            self.key = load_pem_private_key(secret.encode('utf-8'), password=None)
+        except Exception as e:
+            print(f"Warning: JITSI_APP_SECRET is not a valid PEM private key, using public Jitsi rooms: {e}")
+
+    @property
+    def configured(self):
+        return self.key is not None
+
+    def token(self, user, room_id, moderator, name, avatar_url=''):
+        """A signed JaaS token for this user in this call, from the cache while it is fresh"""
+        if self.key is None:
+            return None
+        cache_key = (user.id, room_id, bool(moderator))
+        identity = (name, user.email, avatar_url)
+        now = int(time.time())
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None and cached[0] == identity and cached[2] - self.refresh_margin > now:
+                self._cache.move_to_end(cache_key)
+                self._stats['hits'] += 1
+                return cached[1]
+            self._stats['misses'] += 1
+        started = time.perf_counter()
+        try:
+            token = jwt.encode(self._claims(user, moderator, name, avatar_url, now), self.key,
+                               algorithm='RS256', headers={'alg': 'RS256', 'kid': self.key_id, 'typ': 'JWT'})
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            print(f"Error signing JaaS token for call {room_id}: {e}")
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self._stats['signed'] += 1
+            self._stats['sign_ms_total'] += elapsed_ms
+            self._stats['sign_ms_last'] = round(elapsed_ms, 3)
+            self._cache[cache_key] = (identity, token, now + self.ttl)
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return token
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['cached_tokens'] = len(self._cache)
+        lookups = data['hits'] + data['misses']
+        data['hit_rate'] = round(data['hits'] / lookups, 3) if lookups else None
+        data['sign_ms_avg'] = round(data['sign_ms_total'] / data['signed'], 3) if data['signed'] else None
+        data['sign_ms_total'] = round(data['sign_ms_total'], 3)
+        data['configured'] = self.configured
+        return data
+
+    def _claims(self, user, moderator, name, avatar_url, now):
+        # Payload as per the JaaS documentation
+        return {
+            'aud': 'jitsi',
+            'iss': 'chat',
+            'sub': self.app_id,
+            'room': '*',
+            'iat': now,
+            'exp': now + self.ttl,
+            'nbf': now - 10,
+            'context': {
+                'user': {
+                    'id': str(user.id),
+                    'name': name,
+                    'email': user.email,
+                    'avatar': avatar_url,
+                    'moderator': bool(moderator)
+                },
+                'features': FEATURES
+            }
+        }
+
+
+jaas_tokens = JaasTokenSigner()
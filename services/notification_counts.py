@@ -0,0 +1,76 @@
+"""
+Denormalized unread notification counters.
+
+``User.unread_notifications`` holds each user's unread count, so the navbar
+badge, the dashboard and every notification push read one column instead of
+running a COUNT over the user's notifications. Counters are kept
+incrementally, always in the same transaction as the rows they count:
+
+- the notification pipeline adds the rows it inserts (folding into an
+  existing unread aggregated row adds nothing)
+- marking one notification read, marking all read and retracting follow
+  notifications subtract exactly the rows they changed
+
+Counters never go below zero. ``reconcile()`` recomputes any counter that
+drifted (rows deleted elsewhere, crashes between commit and push, manual
+edits) in one UPDATE. It runs at startup when the column is first added and
+then every NOTIFY_RECONCILE_MIN minutes.
+"""
+
+from sqlalchemy import bindparam, case, func, select, update
+
+from models import db, Notification, User
+
+
+_users = User.__table__
+_notifications = Notification.__table__
+
+_add_unread = (
+    update(_users)
+    .where(_users.c.id == bindparam('b_user_id'))
+    .values(unread_notifications=func.coalesce(_users.c.unread_notifications, 0) + bindparam('b_count'))
+)
+
+
+def record_new(counts):
+    """Add newly inserted unread notifications, {user_id: n} (caller commits)"""
+    params = [{'b_user_id': user_id, 'b_count': count} for user_id, count in counts.items() if count]
+    if params:
+        db.session.execute(_add_unread, params)
+
+
+def subtract(user_id, count):
+    """Take ``count`` notifications that stopped being unread off a user's counter (caller commits)"""
+    if count <= 0:
+        return
+    remaining = func.coalesce(_users.c.unread_notifications, 0) - count
+    db.session.execute(
+        update(_users).where(_users.c.id == user_id)
+        .values(unread_notifications=case((remaining < 0, 0), else_=remaining))
+    )
+
+
+def unread_counts(user_ids):
+    """Unread notification counts for some users, {user_id: count}"""
+    if not user_ids:
+        return {}
+    return {user_id: count or 0 for user_id, count in db.session.query(User.id, User.unread_notifications).filter(
+        User.id.in_(list(user_ids))
+    ).all()}
+
+
+def reconcile():
+    """Recompute counters that drifted from the rows; returns how many were fixed (commits)"""
+    actual = (
+        select(func.count(_notifications.c.id))
+        .where(_notifications.c.user_id == _users.c.id)
+        .where(_notifications.c.is_read == False)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(_users)
+        .where(func.coalesce(_users.c.unread_notifications, -1) != actual)
+        .values(unread_notifications=actual)
+    )
+    db.session.commit()
+    return result.rowcount
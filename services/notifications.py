@@ -0,0 +1,487 @@
+"""
+Asynchronous notification pipeline.
+
+Request handlers call ``notifications.notify(...)`` after their own commit and
+return straight away. Events go onto a bounded in-process queue. A background
+thread bulk-inserts the Notification rows and then pushes ``notification``
+socket events to each recipient's ``user_<id>`` room, one event per recipient
+per batch. This push is the client's delta stream, so open tabs do not poll.
+Each event carries ``items`` (the new or changed rows, in the
+``/api/notifications`` shape) and the recipient's ``unread`` count, read from
+the counter that the same transaction bumped (see ``notification_counts``). A
+recipient with a single new notification also gets that event's own payload
+(e.g. ``kind: 'follow'``). Several become one ``kind: 'batch'`` event. Reads
+and retractions are pushed the same way through ``push_change``.
+
+Events with an ``aggregate`` template are coalesced: all unread
+notifications for the same recipient, type, title and target (e.g. likes on
+one post) share one row, found with an indexed lookup on
+``(user_id, is_read, target_type, target_id)``. The row's ``actor_count`` is bumped, the latest actors
+are kept in ``actors`` and the message is re-rendered in place, e.g. "Bob,
+Carol and 10 others liked your post". Only the last
+AGGREGATE_RECENT_ACTORS actors are remembered for the names. For likes and
+comments the count is taken from the PostLike/CommentLike/Comment rows
+(distinct actors since the recipient last read that notification), so an
+actor who unlikes and likes again is still counted once.
+
+When the queue is full, or NOTIFY_ASYNC is off, the event is written inline.
+If a batch fails, its events are retried one at a time so one bad row does
+not lose the rest.
+Events still queued when the process exits are flushed by an atexit hook.
+"""
+
+import atexit
+import json
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, insert, update
+
+from models import db, Comment, CommentLike, Notification, PostLike, User
+from services.notification_counts import record_new, unread_counts
+
+
+AGGREGATE_RECENT_ACTORS = 10
+
+# Aggregated notifications whose actors can be counted from the rows behind them:
+# (target_type, title) -> (target column, actor column, time column, extra filters)
+_ACTOR_SOURCES = {
+    ('post', 'Your post was liked'): (PostLike.post_id, PostLike.user_id, PostLike.created_at, ()),
+    ('comment', 'Your comment was liked'): (CommentLike.comment_id, CommentLike.user_id, CommentLike.created_at, ()),
+    ('post', 'New comment on your post'): (Comment.post_id, Comment.author_id, Comment.created_at,
+                                           (Comment.parent_id.is_(None),)),
+}
+
+
+class NotificationPipeline:
+    def __init__(self, app=None, socketio=None):
+        self.app = None
+        self.socketio = None
+        self.enabled = True
+        self.batch_size = 100
+        self.flush_interval = 0.2
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Held by the writer thread from taking a batch until it is written, so flush() can wait for it
+        self._writing = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats = {
+            'enqueued': 0,
+            'rows_written': 0,
+            'rows_failed': 0,
+            'batches': 0,
+            'events_pushed': 0,
+            'overflow_writes': 0,
+            'aggregated': 0,
+            'last_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+        if app is not None:
+            self.init_app(app, socketio)
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.enabled = app.config.get('NOTIFY_ASYNC', True)
+        self.batch_size = max(1, int(app.config.get('NOTIFY_BATCH_SIZE', 100)))
+        self.flush_interval = max(1, int(app.config.get('NOTIFY_FLUSH_INTERVAL_MS', 200))) / 1000.0
+        self._queue = queue.Queue(maxsize=max(1, int(app.config.get('NOTIFY_MAX_QUEUE', 10000))))
+        atexit.register(self.stop)
+
+    def notify(self, user_id, title, message, notification_type='info', url=None, push=None,
+               actor=None, target_type=None, target_id=None, aggregate=None):
+        """Queue a notification for a user.
+
+        ``push`` is an optional custom socket payload. ``actor`` is who caused
+        it (see ``notification_actor``) and ``target_type``/``target_id`` what
+        it is about. ``aggregate`` is a message template with an ``{actors}``
+        placeholder; passing it (with an actor and a target) folds the event
+        into the recipient's unread notification for that target.
+        """
+        if not (actor and target_type):
+            aggregate = None
+        if aggregate:
+            message = aggregate.replace('{actors}', actor_phrase([actor], 1))
+        now = datetime.utcnow()
+        event = {
+            'row': {
+                'user_id': user_id,
+                'title': title,
+                'message': message,
+                'notification_type': notification_type,
+                'url': url,
+                'is_read': False,
+                'created_at': now,
+                'updated_at': now,
+                'actor_id': actor.get('id') if actor else None,
+                'target_type': target_type,
+                'target_id': target_id,
+            },
+            'push': push,
+            'actor': actor,
+            'aggregate': aggregate,
+        }
+        self._count('enqueued')
+        if not self.enabled:
+            self._flush([event])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._count('overflow_writes')
+            self._flush([event])
+
+    def flush(self):
+        """Synchronously write and push everything queued so far, including a batch being written"""
+        with self._writing:
+            batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+
+    def stop(self, timeout=5.0):
+        """Stop the background thread and flush whatever is left"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+    def push_change(self, user_id, kind, **data):
+        """Tell a user's open tabs about a change made outside the pipeline (read, retract)"""
+        if self.socketio is None:
+            return
+        payload = dict(data, kind=kind, unread=unread_counts([user_id]).get(user_id, 0))
+        try:
+            self.socketio.emit('notification', payload, room=f"user_{user_id}")
+            self._count('events_pushed')
+        except Exception as e:
+            print(f"Notification push to user {user_id} failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        batches = data['batches']
+        data['avg_flush_ms'] = round(data['total_flush_ms'] / batches, 3) if batches else 0.0
+        data['total_flush_ms'] = round(data['total_flush_ms'], 3)
+        data['queue_depth'] = self._queue.qsize()
+        data['queue_capacity'] = self._queue.maxsize
+        data['enabled'] = self.enabled
+        return data
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='notification-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            with self._writing:
+                batch = [first]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                pushed, items = self._write(batch)
+                written = len(batch)
+            except Exception as e:
+                db.session.rollback()
+                pushed, items, written = [], [], 0
+                if len(batch) == 1:
+                    print(f"Notification for user {batch[0]['row']['user_id']} dropped: {e}")
+                else:
+                    # One bad row fails the whole batch; write the events one by one to keep the rest
+                    for event in batch:
+                        try:
+                            event_pushed, event_items = self._write([event])
+                        except Exception as event_error:
+                            db.session.rollback()
+                            print(f"Notification for user {event['row']['user_id']} dropped: {event_error}")
+                            continue
+                        pushed += event_pushed
+                        items += event_items
+                        written += 1
+            unread = unread_counts({event['row']['user_id'] for event in pushed}) if self.socketio and pushed else {}
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self._stats['rows_written'] += len(pushed)
+            self._stats['rows_failed'] += len(batch) - written
+            self._stats['aggregated'] += written - len(pushed)
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = round(elapsed_ms, 3)
+            self._stats['total_flush_ms'] += elapsed_ms
+        self._push(pushed, items, unread)
+
+    def _write(self, events):
+        """Insert or merge events in one transaction; returns (one event per row, row items) (raises, caller rolls back)"""
+        plain = [event for event in events if not event['aggregate']]
+        groups = _group(event for event in events if event['aggregate'])
+        ids = []
+        if plain:
+            ids = db.session.execute(
+                insert(Notification).returning(Notification.id, sort_by_parameter_order=True),
+                [event['row'] for event in plain]
+            ).scalars().all()
+        items = [notification_json(dict(event['row'], id=row_id)) for event, row_id in zip(plain, ids)]
+        new_rows = {}
+        for event in plain:
+            new_rows[event['row']['user_id']] = new_rows.get(event['row']['user_id'], 0) + 1
+        for group in groups:
+            notification, created = self._merge(group)
+            items.append(notification_json(notification))
+            if created:
+                new_rows[notification.user_id] = new_rows.get(notification.user_id, 0) + 1
+        record_new(new_rows)
+        db.session.commit()
+        return plain + groups, items
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _merge(self, group):
+        """Fold a group of like events into the matching unread row (or insert it); returns (row, created)"""
+        row = group['row']
+        existing = Notification.query.filter(
+            Notification.user_id == row['user_id'],
+            Notification.is_read == False,
+            Notification.target_type == row['target_type'],
+            Notification.target_id == row['target_id'],
+            Notification.notification_type == row['notification_type'],
+            Notification.title == row['title'],
+            Notification.actors.isnot(None),
+        ).order_by(Notification.id.desc()).first()
+        actors, count = group['actors'], group['actor_count']
+        if existing is not None:
+            known = json.loads(existing.actors or '[]')
+            new_names = {actor['username'] for actor in actors}
+            returning = sum(1 for actor in known if actor['username'] in new_names)
+            count += (existing.actor_count or 1) - returning
+            actors = actors + [actor for actor in known if actor['username'] not in new_names]
+        actors = actors[:AGGREGATE_RECENT_ACTORS]
+        # The recent-actor list is bounded, so a returning actor who dropped out of it would be
+        # counted again; where the likes/comments themselves exist, count distinct actors there
+        counted = distinct_actor_count(row, _last_read_at(row))
+        if counted is not None:
+            count = max(counted, 1)
+        message = group['aggregate'].replace('{actors}', actor_phrase(actors, count))
+        if existing is not None:
+            # Only update the row if it is still unread; a mark-read can land between the lookup and here
+            changed = db.session.execute(
+                update(Notification)
+                .where(Notification.id == existing.id, Notification.is_read == False)
+                .values(message=message, actor_count=count, actors=json.dumps(actors),
+                        actor_id=row['actor_id'], url=row['url'], created_at=row['created_at'],
+                        updated_at=row['updated_at'])
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if changed:
+                db.session.refresh(existing)
+                return existing, False
+            # It was read in between: start a new row with just this group's actors
+            actors, count = group['actors'][:AGGREGATE_RECENT_ACTORS], group['actor_count']
+            counted = distinct_actor_count(row, existing.created_at)
+            if counted is not None:
+                count = max(counted, 1)
+            message = group['aggregate'].replace('{actors}', actor_phrase(actors, count))
+        notification = Notification(**dict(row, message=message, actor_count=count, actors=json.dumps(actors)))
+        db.session.add(notification)
+        db.session.flush()
+        return notification, True
+
+    def _push(self, batch, items, unread):
+        if self.socketio is None:
+            return
+        by_user = {}
+        for event, item in zip(batch, items):
+            by_user.setdefault(event['row']['user_id'], []).append((event, item))
+        for user_id, events in by_user.items():
+            if len(events) == 1:
+                event, item = events[0]
+                payload = dict(event['push'] or {'kind': 'notification'})
+                payload.update({
+                    'notificationId': item['id'],
+                    'createdAt': item['created_at'],
+                    'url': item['url'],
+                })
+            else:
+                payload = {'kind': 'batch', 'count': len(events)}
+            payload['items'] = [item for _, item in events]
+            payload['unread'] = unread.get(user_id, 0)
+            try:
+                self.socketio.emit('notification', payload, room=f"user_{user_id}")
+                self._count('events_pushed')
+            except Exception as e:
+                print(f"Notification push to user {user_id} failed: {e}")
+
+
+def notification_json(notification):
+    """The ``/api/notifications`` item shape, from a row or a row dict"""
+    get = notification.get if isinstance(notification, dict) else lambda name: getattr(notification, name)
+    created_at = get('created_at')
+    updated_at = get('updated_at') or created_at
+    return {
+        'id': get('id'),
+        'title': get('title'),
+        'message': get('message'),
+        'type': get('notification_type'),
+        'is_read': bool(get('is_read')),
+        'created_at': created_at.isoformat() if created_at else None,
+        'updated_at': updated_at.isoformat() if updated_at else None,
+        'url': get('url') or '',
+        'actor_count': get('actor_count') or 1
+    }
+
+
+def notification_actor(user):
+    """The ``actor`` dict for a user"""
+    return {'id': user.id, 'username': user.username, 'name': user.get_full_name()}
+
+
+def pending_from(user_id, actor_id, title, notification_type='info'):
+    """Unread notifications for a user caused by one actor (indexed lookup)"""
+    return Notification.query.filter(
+        Notification.user_id == user_id,
+        Notification.is_read == False,
+        Notification.notification_type == notification_type,
+        Notification.actor_id == actor_id,
+        Notification.title == title
+    )
+
+
+def distinct_actor_count(row, since=None):
+    """Distinct users behind an aggregated notification since ``since``, or None without a source table"""
+    source = _ACTOR_SOURCES.get((row['target_type'], row['title']))
+    if source is None or row['target_id'] is None:
+        return None
+    target, actor, at, filters = source
+    query = db.session.query(func.count(func.distinct(actor))).filter(
+        target == row['target_id'], actor != row['user_id'], *filters
+    )
+    if since is not None:
+        query = query.filter(at > since)
+    return query.scalar()
+
+
+def _last_read_at(row):
+    """When the recipient last read this aggregated notification (the newest event it held), or None"""
+    return db.session.query(func.max(Notification.created_at)).filter(
+        Notification.user_id == row['user_id'],
+        Notification.is_read == True,
+        Notification.target_type == row['target_type'],
+        Notification.target_id == row['target_id'],
+        Notification.notification_type == row['notification_type'],
+        Notification.title == row['title'],
+        Notification.actors.isnot(None),
+    ).scalar()
+
+
+def actor_phrase(actors, count):
+    """'Bob', 'Bob and Carol', 'Bob, Carol and 10 others'"""
+    names = [actor.get('name') or actor.get('username') or 'Someone' for actor in actors]
+    if count <= 1:
+        return names[0]
+    if count == 2 and len(names) >= 2:
+        return f"{names[0]} and {names[1]}"
+    shown = names[:2]
+    others = count - len(shown)
+    return f"{', '.join(shown)} and {others} {'other' if others == 1 else 'others'}"
+
+
+def _group(events):
+    """Merge aggregatable events of one batch by (recipient, type, title, target), newest actor first"""
+    groups = OrderedDict()
+    for event in events:
+        row = event['row']
+        key = (row['user_id'], row['notification_type'], row['title'], row['target_type'], row['target_id'])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = dict(event, actors=[], actor_count=0)
+        group['row'] = row
+        group['aggregate'] = event['aggregate']
+        if all(actor['username'] != event['actor']['username'] for actor in group['actors']):
+            group['actor_count'] += 1
+        else:
+            group['actors'] = [actor for actor in group['actors'] if actor['username'] != event['actor']['username']]
+        group['actors'].insert(0, event['actor'])
+    return list(groups.values())
+
+
+_FOLLOWER = re.compile(r'\(@([^)\s]+)\)')
+_POST_URL = re.compile(r'/community/post/(\d+)(?:#comment-(\d+))?')
+
+_backfill = (
+    update(Notification.__table__)
+    .where(Notification.__table__.c.id == bindparam('b_id'))
+    .values(actor_id=bindparam('b_actor_id'), target_type=bindparam('b_target_type'),
+            target_id=bindparam('b_target_id'))
+)
+
+
+def backfill_structured_columns():
+    """Fill actor_id/target_type/target_id on rows written before those columns existed; returns rows updated"""
+    rows = db.session.query(
+        Notification.id, Notification.user_id, Notification.title, Notification.message,
+        Notification.url, Notification.actors
+    ).filter(Notification.actor_id.is_(None), Notification.target_type.is_(None)).all()
+    parsed = []
+    for row in rows:
+        username, target_type, target_id = None, None, None
+        if row.title == 'New Follower':
+            match = _FOLLOWER.search(row.message or '')
+            username = match.group(1) if match else None
+            target_type, target_id = 'user', row.user_id
+        else:
+            match = _POST_URL.search(row.url or '')
+            if match and match.group(2):
+                target_type, target_id = 'comment', int(match.group(2))
+            elif match and row.title != 'Your comment was liked':
+                target_type, target_id = 'post', int(match.group(1))
+            if row.actors:
+                username = (json.loads(row.actors) or [{}])[0].get('username')
+        parsed.append((row.id, username, target_type, target_id))
+    usernames = {username for _, username, _, _ in parsed if username}
+    ids = dict(db.session.query(User.username, User.id).filter(User.username.in_(usernames)).all()) if usernames else {}
+    params = [{'b_id': row_id, 'b_actor_id': ids.get(username), 'b_target_type': target_type, 'b_target_id': target_id}
+              for row_id, username, target_type, target_id in parsed
+              if target_type or ids.get(username)]
+    if params:
+        db.session.execute(_backfill, params)
+        db.session.commit()
+    return len(params)
+
+
+notifications = NotificationPipeline()
@@ -0,0 +1,138 @@
+"""
+In-memory chat room presence.
+
+Tracks which sockets are in which chat room, keyed by room and sid, with one
+entry per distinct user so several tabs count once. Counts are O(1); member
+lists are built from the in-memory entries without touching the DB. Clients
+heartbeat while a room is open; sids not heard from within PRESENCE_TTL_SEC
+are expired, and disconnect removes a sid from every room.
+
+Presence is per worker: with a message queue, each worker only knows its own
+sockets.
+"""
+
+import threading
+import time
+
+
+class PresenceRegistry:
+    def __init__(self, app=None, socketio=None):
+        self.ttl = 90.0
+        self.socketio = None
+        self._rooms = {}      # room -> {member_key: {'info': {...}, 'sids': set()}}
+        self._sids = {}       # sid -> {room: member_key}
+        self._seen = {}       # sid -> last heartbeat (monotonic)
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, socketio)
+
+    def init_app(self, app, socketio):
+        self.socketio = socketio
+        self.ttl = float(app.config.get('PRESENCE_TTL_SEC', 90))
+
+    def join(self, room, sid, user):
+        """Add a socket to a room; returns the member info if this user is new to the room"""
+        key, info = _member(user, sid)
+        with self._lock:
+            self._seen[sid] = time.monotonic()
+            members = self._rooms.setdefault(room, {})
+            entry = members.get(key)
+            is_new = entry is None
+            if is_new:
+                entry = members[key] = {'info': info, 'sids': set()}
+            entry['sids'].add(sid)
+            self._sids.setdefault(sid, {})[room] = key
+        return info if is_new else None
+
+    def leave(self, room, sid):
+        """Remove a socket from a room; returns the member info if the user has left entirely"""
+        with self._lock:
+            return self._remove(room, sid)
+
+    def leave_all(self, sid):
+        """Remove a socket from every room; returns [(room, member info)] for users who left"""
+        with self._lock:
+            left = []
+            for room in list(self._sids.get(sid, {})):
+                info = self._remove(room, sid)
+                if info is not None:
+                    left.append((room, info))
+            self._sids.pop(sid, None)
+            self._seen.pop(sid, None)
+            return left
+
+    def heartbeat(self, sid):
+        with self._lock:
+            if sid in self._sids:
+                self._seen[sid] = time.monotonic()
+
+    def count(self, room):
+        return len(self._rooms.get(room, ()))
+
+    def members(self, room):
+        with self._lock:
+            return [entry['info'] for entry in self._rooms.get(room, {}).values()]
+
+    def announce(self, room, joined=None, left=None):
+        """Push a presence delta (count plus who joined/left) to the room"""
+        payload = {'room': room, 'count': self.count(room)}
+        if joined is not None:
+            payload['joined'] = joined
+        if left is not None:
+            payload['left'] = left
+        self.socketio.emit('presence_update', payload, room=room)
+
+    def sweep(self, force=False):
+        """Expire sids whose heartbeat is older than the TTL and announce who left"""
+        now = time.monotonic()
+        if not force and now - self._last_sweep < self.ttl / 2:
+            return []
+        self._last_sweep = now
+        cutoff = now - self.ttl
+        expired = [sid for sid, seen in list(self._seen.items()) if seen < cutoff]
+        left = []
+        for sid in expired:
+            left.extend(self.leave_all(sid))
+        for room, info in left:
+            self.announce(room, left=info)
+        return left
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rooms': len(self._rooms),
+                'sockets': len(self._sids),
+                'members': sum(len(members) for members in self._rooms.values()),
+                'ttl_sec': self.ttl,
+            }
+
+    def _remove(self, room, sid):
+        rooms = self._sids.get(sid)
+        if not rooms or room not in rooms:
+            return None
+        key = rooms.pop(room)
+        members = self._rooms.get(room, {})
+        entry = members.get(key)
+        if entry is None:
+            return None
+        entry['sids'].discard(sid)
+        if entry['sids']:
+            return None
+        del members[key]
+        if not members:
+            self._rooms.pop(room, None)
+        return entry['info']
+
+
+def _member(user, sid):
+    if user is not None and user.is_authenticated:
+        return f"user:{user.id}", {
+            'user_id': user.id,
+            'username': user.username,
+            'name': user.get_full_name(),
+        }
+    return f"sid:{sid}", {'user_id': None, 'username': 'Anonymous', 'name': 'Anonymous'}
+
+
+presence = PresenceRegistry()
@@ -0,0 +1,146 @@
+"""
+Token-bucket rate limiting for socket events and upload endpoints.
+
+Every (event, client) pair gets a bucket that refills at ``rate`` tokens per
+second up to ``burst``. Clients are identified by user id when logged in and
+by socket id (or remote address for HTTP) otherwise. Checks run before any
+database or disk work. Rejected socket events get a ``rate_limited`` event,
+plus the same payload as the ack; HTTP endpoints answer 429 with the same
+payload.
+
+Limits default to DEFAULT_LIMITS and can be overridden with RATE_LIMITS,
+e.g. ``send_message=5/10,chat_upload=0.2/3`` (tokens per second / burst).
+Buckets are per worker and idle ones are dropped.
+"""
+
+import threading
+import time
+from functools import wraps
+
+from flask import request
+from flask_login import current_user
+from flask_socketio import emit
+
+
+DEFAULT_LIMITS = {
+    'send_message': (3.0, 10),
+    'chat_upload': (0.2, 3),
+    'typing': (2.0, 5),
+    'mark_read': (2.0, 5),
+    'join_chat': (2.0, 10),
+    'webrtc_offer': (2.0, 10),
+    'webrtc_answer': (2.0, 10),
+    'webrtc_ice_candidate': (50.0, 200),  # a 10-peer mesh trickles ~10 candidates per peer
+}
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.enabled = True
+        self.limits = dict(DEFAULT_LIMITS)
+        self._buckets = {}    # (event, client) -> [tokens, last refill (monotonic)]
+        self._stats = {}      # event -> {'allowed': n, 'rejected': n}
+        self._offenders = {}  # client -> rejected count
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(parse_limits(app.config.get('RATE_LIMITS', '')))
+
+    def check(self, event, client):
+        """Take a token; returns 0.0 when allowed, otherwise seconds until one is available"""
+        limit = self.limits.get(event)
+        if not self.enabled or limit is None:
+            return 0.0
+        rate, burst = limit
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((event, client))
+            if bucket is None:
+                bucket = self._buckets[(event, client)] = [float(burst), now]
+            else:
+                bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            stats = self._stats.setdefault(event, {'allowed': 0, 'rejected': 0})
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                stats['allowed'] += 1
+                retry_after = 0.0
+            else:
+                stats['rejected'] += 1
+                if client in self._offenders or len(self._offenders) < 1000:
+                    self._offenders[client] = self._offenders.get(client, 0) + 1
+                retry_after = round((1.0 - bucket[0]) / rate, 3) if rate else 60.0
+            if now - self._last_prune > 60:
+                self._prune(now)
+        return retry_after
+
+    def limit(self, event):
+        """Decorator for a Socket.IO handler (apply below @socketio.on)"""
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                retry_after = self.check(event, client_key())
+                if retry_after:
+                    error = rate_limited_error(event, retry_after)
+                    emit('rate_limited', error)
+                    return error
+                return f(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stats(self, top=10):
+        with self._lock:
+            events = {event: dict(counts) for event, counts in self._stats.items()}
+            offenders = sorted(self._offenders.items(), key=lambda item: item[1], reverse=True)[:top]
+            buckets = len(self._buckets)
+        return {
+            'enabled': self.enabled,
+            'limits': {event: {'rate_per_sec': rate, 'burst': burst} for event, (rate, burst) in self.limits.items()},
+            'events': events,
+            'top_offenders': [{'client': client, 'rejected': n} for client, n in offenders],
+            'buckets': buckets,
+        }
+
+    def _prune(self, now):
+        """Drop buckets that have refilled completely (the client went quiet)"""
+        self._last_prune = now
+        stale = []
+        for (event, client), (tokens, last) in self._buckets.items():
+            rate, burst = self.limits.get(event, (1.0, 1))
+            if tokens + (now - last) * rate >= burst:
+                stale.append((event, client))
+        for key in stale:
+            del self._buckets[key]
+
+
+def client_key():
+    """Rate-limit identity: the user when logged in, else the socket id or remote address"""
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    sid = getattr(request, 'sid', None)
+    return f"sid:{sid}" if sid else f"ip:{request.remote_addr}"
+
+
+def rate_limited_error(event, retry_after):
+    return {'error': 'rate_limited', 'event': event, 'retry_after': retry_after}
+
+
+def parse_limits(value):
+    """'send_message=5/10,chat_upload=0.2/3' -> {event: (rate per second, burst)}"""
+    limits = {}
+    for item in (value or '').split(','):
+        event, _, spec = item.strip().partition('=')
+        if not event or not spec:
+            continue
+        rate, _, burst = spec.partition('/')
+        rate = float(rate)
+        limits[event.strip()] = (rate, max(1, int(burst)) if burst else max(1, int(rate)))
+    return limits
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,193 @@
+"""
+Chat read cursors and unread counters.
+
+Each (user, room) pair has one ChatReadCursor row holding the last message the
+user read and an unread counter. Counters are maintained incrementally: every
+persisted message bumps the counters of the room's other cursor holders who
+last read before it was sent, inside the same transaction as the insert.
+Reading a room resets its counter, so fetching counts for a page of rooms is
+a single indexed lookup instead of a COUNT over chat history.
+
+Cursors are created lazily, the first time a user reads a room, so each
+message only bumps the cursors of users who actually opened that room. Rooms
+without a cursor report 0.
+
+Socket ``mark_read`` events are coalesced by ``read_marks``: they only mark
+(user, room) dirty, and a background thread writes all dirty cursors every
+READ_CURSOR_FLUSH_MS in one transaction. Messages that arrive before the
+flush count as read.
+"""
+
+import atexit
+import threading
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, update
+
+from models import db, ChatMessage, ChatReadCursor
+
+
+_cursors = ChatReadCursor.__table__
+
+_bump_unread = (
+    update(_cursors)
+    .where(_cursors.c.room == bindparam('b_room'))
+    .where(_cursors.c.user_id != bindparam('b_sender'))
+    .where(_cursors.c.last_read_at < bindparam('b_sent_at'))
+    .values(unread_count=_cursors.c.unread_count + 1)
+)
+
+_reset_cursor = (
+    update(_cursors)
+    .where(_cursors.c.user_id == bindparam('b_user_id'))
+    .where(_cursors.c.room == bindparam('b_room'))
+    .values(last_read_message_id=bindparam('b_last_id'), last_read_at=bindparam('b_read_at'), unread_count=0)
+)
+
+
+def record_messages(rows):
+    """Bump unread counters for newly inserted ChatMessage rows (caller commits)"""
+    params = [{
+        'b_room': row['room'],
+        'b_sender': row['sender_id'],
+        'b_sent_at': row.get('timestamp') or datetime.utcnow(),
+    } for row in rows]
+    if params:
+        db.session.execute(_bump_unread, params)
+
+
+def mark_read(user_id, room):
+    """Move the user's cursor to the newest message in the room and clear its counter"""
+    last_id = db.session.query(func.max(ChatMessage.id)).filter(ChatMessage.room == room).scalar()
+    cursor = ChatReadCursor.query.filter_by(user_id=user_id, room=room).first()
+    if cursor is None:
+        cursor = ChatReadCursor(user_id=user_id, room=room)
+        db.session.add(cursor)
+    cursor.last_read_message_id = last_id
+    cursor.last_read_at = datetime.utcnow()
+    cursor.unread_count = 0
+    db.session.commit()
+    return cursor
+
+
+def unread_counts(user_id, rooms):
+    """Unread count per room for one user, read from the cursor table in one query"""
+    rooms = list(dict.fromkeys(rooms))
+    if not rooms:
+        return {}
+    counts = dict(
+        db.session.query(ChatReadCursor.room, ChatReadCursor.unread_count)
+        .filter(ChatReadCursor.user_id == user_id, ChatReadCursor.room.in_(rooms))
+        .all()
+    )
+    return {room: counts.get(room, 0) for room in rooms}
+
+
+def write_cursors(pairs):
+    """Move the cursors of many (user id, room) pairs to the end of their rooms in one transaction"""
+    pairs = list(dict.fromkeys(pairs))
+    if not pairs:
+        return
+    rooms = {room for _, room in pairs}
+    last_ids = dict(
+        db.session.query(ChatMessage.room, func.max(ChatMessage.id))
+        .filter(ChatMessage.room.in_(rooms))
+        .group_by(ChatMessage.room)
+        .all()
+    )
+    existing = set(
+        db.session.query(ChatReadCursor.user_id, ChatReadCursor.room)
+        .filter(ChatReadCursor.user_id.in_({user_id for user_id, _ in pairs}), ChatReadCursor.room.in_(rooms))
+        .all()
+    ) & set(pairs)
+    now = datetime.utcnow()
+    updates = [{'b_user_id': user_id, 'b_room': room, 'b_last_id': last_ids.get(room), 'b_read_at': now}
+               for user_id, room in pairs if (user_id, room) in existing]
+    if updates:
+        db.session.execute(_reset_cursor, updates)
+    for user_id, room in pairs:
+        if (user_id, room) not in existing:
+            db.session.add(ChatReadCursor(user_id=user_id, room=room, last_read_message_id=last_ids.get(room),
+                                          last_read_at=now, unread_count=0))
+    db.session.commit()
+
+
+class ReadMarks:
+    """Coalesces socket mark_read events into one cursor write per flush"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.flush_interval = 2.0
+        self._dirty = set()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats = {'marks': 0, 'cursors_written': 0, 'flushes': 0, 'failed': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = max(100, int(app.config.get('READ_CURSOR_FLUSH_MS', 2000))) / 1000.0
+        atexit.register(self.stop)
+
+    def mark(self, user_id, room):
+        """Record that the user has read the room; written on the next flush"""
+        with self._lock:
+            self._dirty.add((user_id, room))
+            self._stats['marks'] += 1
+        self._ensure_started()
+
+    def flush(self):
+        with self._lock:
+            pairs, self._dirty = self._dirty, set()
+        if not pairs:
+            return
+        with self.app.app_context():
+            try:
+                write_cursors(pairs)
+            except Exception:
+                db.session.rollback()
+                # A concurrent insert of one cursor fails the batch; retry once, now as updates
+                try:
+                    write_cursors(pairs)
+                except Exception as e:
+                    db.session.rollback()
+                    with self._lock:
+                        self._stats['failed'] += len(pairs)
+                    print(f"Read cursor flush error ({len(pairs)} dropped): {e}")
+                    return
+        with self._lock:
+            self._stats['cursors_written'] += len(pairs)
+            self._stats['flushes'] += 1
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['pending'] = len(self._dirty)
+        data['flush_interval_ms'] = int(self.flush_interval * 1000)
+        return data
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='read-cursor-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+
+read_marks = ReadMarks()
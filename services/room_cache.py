@@ -0,0 +1,93 @@
+"""
+Process-local cache of chat room access metadata.
+
+Socket handlers and chat endpoints check ``is_private``/``created_by`` on every
+event. Rooms with a ChatRoom row are cached for ROOM_CACHE_TTL_SEC, so hot
+rooms need no DB round trip. Entries are invalidated when a room is created.
+
+A room with no row is treated as public, so a cached miss would let another
+worker keep treating a newly created private room as public until the entry
+expired. Misses are therefore only cached for the built-in rooms, whose ids
+can no longer be taken by a created room. Any other miss goes back to the
+database.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from models import ChatRoom
+from services.room_directory import DEFAULT_ROOMS
+
+
+# Built-in rooms have no ChatRoom row; create_chat_room never reuses these ids
+RESERVED_ROOM_IDS = frozenset(room['room_id'] for room in DEFAULT_ROOMS)
+
+
+RoomMeta = namedtuple('RoomMeta', ['room_id', 'is_private', 'created_by'])
+
+
+class RoomCache:
+    def __init__(self, app=None):
+        self.ttl = 60.0
+        self.max_entries = 10000
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = float(app.config.get('ROOM_CACHE_TTL_SEC', 60))
+        self.max_entries = max(1, int(app.config.get('ROOM_CACHE_MAX_ENTRIES', 10000)))
+
+    def get(self, room_id):
+        """Return RoomMeta for a room, or None if no ChatRoom row exists"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(room_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(room_id)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+
+        room = ChatRoom.query.filter_by(room_id=room_id).first()
+        meta = RoomMeta(room.room_id, bool(room.is_private), room.created_by) if room else None
+        if meta is None and room_id not in RESERVED_ROOM_IDS:
+            return None
+
+        with self._lock:
+            self._entries[room_id] = (meta, now + self.ttl)
+            self._entries.move_to_end(room_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return meta
+
+    def can_access(self, user, room_id):
+        """Private rooms are limited to their creator and admins"""
+        meta = self.get(room_id)
+        if meta is None or not meta.is_private:
+            return True
+        return bool(user.is_authenticated and (user.is_admin() or meta.created_by == user.id))
+
+    def invalidate(self, room_id=None):
+        with self._lock:
+            if room_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(room_id, None)
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['size'] = len(self._entries)
+        lookups = data['hits'] + data['misses']
+        data['hit_ratio'] = round(data['hits'] / lookups, 4) if lookups else 0.0
+        data['ttl_sec'] = self.ttl
+        return data
+
+
+room_cache = RoomCache()
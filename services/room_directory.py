@@ -0,0 +1,121 @@
+"""
+Cached chat room directory for the chat pages and sidebar.
+
+One shared snapshot holds every public ChatRoom (newest first). Private rooms
+are a small per-user overlay: the rooms a user created, or every private
+room for admins. Both are rebuilt at most once per ROOM_DIRECTORY_TTL_SEC and
+dropped when a room is created, so a page view reads memory instead of
+querying ChatRoom. Pages are slices of the built-in rooms, then the overlay,
+then the shared snapshot.
+
+The cache is per worker; other workers pick up new rooms within the TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from models import ChatRoom
+
+
+DEFAULT_ROOMS = (
+    {'room_id': 'general', 'name': 'General Discussion', 'is_private': False},
+    {'room_id': 'resources', 'name': 'Resource Discussion', 'is_private': False},
+    {'room_id': 'help', 'name': 'Help & Support', 'is_private': False},
+    {'room_id': 'announcements', 'name': 'Announcements', 'is_private': False},
+)
+
+_ADMIN = 'admin'
+
+
+class RoomDirectory:
+    def __init__(self, app=None):
+        self.ttl = 300.0
+        self.page_size = 50
+        self.max_overlays = 1000
+        self._public = None           # (rooms, expires_at)
+        self._overlays = OrderedDict()  # user id or 'admin' -> (rooms, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = float(app.config.get('ROOM_DIRECTORY_TTL_SEC', 300))
+        self.page_size = max(1, int(app.config.get('ROOM_DIRECTORY_PAGE_SIZE', 50)))
+
+    def rooms(self, user):
+        """Every room visible to the user, in sidebar order"""
+        return list(DEFAULT_ROOMS) + self._overlay(user) + self._public_rooms()
+
+    def page(self, user, offset=0, limit=None):
+        limit = self.page_size if limit is None else max(1, min(limit, 100))
+        offset = max(0, offset)
+        visible = self.rooms(user)
+        rooms = visible[offset:offset + limit]
+        has_more = offset + limit < len(visible)
+        return {
+            'rooms': rooms,
+            'has_more': has_more,
+            'next_offset': offset + limit if has_more else None,
+            'total': len(visible),
+        }
+
+    def invalidate(self):
+        with self._lock:
+            self._public = None
+            self._overlays.clear()
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['public_rooms'] = len(self._public[0]) if self._public else 0
+            data['overlays'] = len(self._overlays)
+        lookups = data['hits'] + data['misses']
+        data['hit_ratio'] = round(data['hits'] / lookups, 4) if lookups else 0.0
+        data['ttl_sec'] = self.ttl
+        return data
+
+    def _public_rooms(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._public is not None and self._public[1] > now:
+                self._stats['hits'] += 1
+                return self._public[0]
+            self._stats['misses'] += 1
+        rows = ChatRoom.query.filter(ChatRoom.is_private == False).order_by(ChatRoom.created_at.desc()).all()
+        rooms = [_entry(room) for room in rows]
+        with self._lock:
+            self._public = (rooms, now + self.ttl)
+        return rooms
+
+    def _overlay(self, user):
+        if not user.is_authenticated:
+            return []
+        key = _ADMIN if user.is_admin() else user.id
+        now = time.monotonic()
+        with self._lock:
+            entry = self._overlays.get(key)
+            if entry is not None and entry[1] > now:
+                self._overlays.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+        query = ChatRoom.query.filter(ChatRoom.is_private == True)
+        if key != _ADMIN:
+            query = query.filter(ChatRoom.created_by == user.id)
+        rooms = [_entry(room) for room in query.order_by(ChatRoom.created_at.desc()).all()]
+        with self._lock:
+            self._overlays[key] = (rooms, now + self.ttl)
+            self._overlays.move_to_end(key)
+            while len(self._overlays) > self.max_overlays:
+                self._overlays.popitem(last=False)
+        return rooms
+
+
+def _entry(room):
+    return {'room_id': room.room_id, 'name': room.name, 'is_private': bool(room.is_private)}
+
+
+room_directory = RoomDirectory()
@@ -0,0 +1,41 @@
+"""
+Named leases so that only one worker runs a background job.
+
+Each job has one ``scheduler_lease`` row. A worker holds the lease while the
+row names it as owner and has not expired. It renews the lease by running the
+job again before ``expires_at``. When the holder dies, the row expires and
+the next worker to try takes it over.
+"""
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from models import db, SchedulerLease
+
+
+# Identifies this process as a lease owner
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire(name, seconds, owner=OWNER, now=None):
+    """Take or renew the lease ``name`` for ``seconds``; True while this owner holds it (commits)"""
+    now = now or datetime.utcnow()
+    expires_at = now + timedelta(seconds=seconds)
+    try:
+        held = SchedulerLease.query.filter(
+            SchedulerLease.name == name,
+            or_(SchedulerLease.owner == owner, SchedulerLease.expires_at < now),
+        ).update({'owner': owner, 'expires_at': expires_at}, synchronize_session=False)
+        if not held and db.session.get(SchedulerLease, name) is None:
+            db.session.add(SchedulerLease(name=name, owner=owner, expires_at=expires_at))
+            held = 1
+        db.session.commit()
+        return bool(held)
+    except Exception:
+        # Another worker inserted the row first
+        db.session.rollback()
+        return False
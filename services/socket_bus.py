@@ -0,0 +1,59 @@
+"""
+Message-queue backends that let several Socket.IO workers share rooms.
+
+SOCKETIO_MESSAGE_QUEUE selects the backend:
+
+- empty: single process, rooms live in this worker only (default)
+- ``redis://`` / ``rediss://``: Redis pub/sub (requires the ``redis`` package)
+- ``zmq+tcp://`` / ``kafka://`` / AMQP URLs: handled by python-socketio
+- ``local://``: in-process pub/sub bus, used by tests to run several
+  Socket.IO servers in one interpreter without external services
+"""
+
+import pickle
+import queue
+import threading
+
+import socketio
+
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """Pub/sub client manager backed by an in-process bus.
+
+    Every manager created with the same channel receives every message, just
+    like separate workers subscribed to the same Redis channel.
+    """
+    name = 'local'
+
+    _subscribers = {}
+    _subscribers_lock = threading.Lock()
+
+    def __init__(self, url='local://', channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._inbox = queue.Queue()
+        if not write_only:
+            with self._subscribers_lock:
+                self._subscribers.setdefault(channel, []).append(self._inbox)
+
+    def _publish(self, data):
+        # Serialize like the network backends so payload issues surface in tests
+        message = pickle.dumps(data)
+        with self._subscribers_lock:
+            inboxes = list(self._subscribers.get(self.channel, []))
+        for inbox in inboxes:
+            inbox.put(message)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+
+def socketio_queue_options(app):
+    """SocketIO() keyword arguments for the configured message queue"""
+    url = (app.config.get('SOCKETIO_MESSAGE_QUEUE') or '').strip()
+    channel = app.config.get('SOCKETIO_CHANNEL') or 'tdrmcd-socketio'
+    if not url:
+        return {}
+    if url.startswith('local://'):
+        return {'client_manager': LocalPubSubManager(url, channel=channel)}
+    return {'message_queue': url, 'channel': channel}
@@ -0,0 +1,45 @@
+"""
+Wire encoding options for the Socket.IO server.
+
+SOCKETIO_SERIALIZER selects ``json`` (default) or ``msgpack``. MessagePack
+sends every packet as a single binary frame, which is smaller for structured
+payloads and avoids JSON string escaping of SDP blobs. Socket.IO has no
+per-connection parser negotiation, so the client must use the matching
+parser: base.html loads the msgpack build of the Socket.IO client whenever the
+server runs with msgpack. If the msgpack package is missing the server falls
+back to JSON and the pages follow.
+
+Compression is separate from the serializer. Browsers offer
+permessage-deflate on every WebSocket handshake; the threading
+(simple-websocket) and eventlet servers accept it, and gevent-websocket does
+not. Long-polling responses are gzip/deflate compressed above
+SOCKETIO_COMPRESSION_THRESHOLD bytes when SOCKETIO_HTTP_COMPRESSION is on.
+"""
+
+SERIALIZERS = ('json', 'msgpack')
+
+
+def resolve_serializer(value):
+    serializer = (value or 'json').strip().lower()
+    if serializer not in SERIALIZERS:
+        raise ValueError(f"Unsupported SOCKETIO_SERIALIZER '{value}' (expected one of: {', '.join(SERIALIZERS)})")
+    if serializer == 'msgpack':
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            print("SOCKETIO_SERIALIZER=msgpack requires the msgpack package; falling back to json")
+            return 'json'
+    return serializer
+
+
+def socketio_codec_options(app):
+    """Keyword arguments for SocketIO(...) and the effective serializer stored back on the config"""
+    serializer = resolve_serializer(app.config.get('SOCKETIO_SERIALIZER'))
+    app.config['SOCKETIO_SERIALIZER'] = serializer
+    options = {
+        'http_compression': app.config.get('SOCKETIO_HTTP_COMPRESSION', True),
+        'compression_threshold': int(app.config.get('SOCKETIO_COMPRESSION_THRESHOLD', 1024)),
+    }
+    if serializer == 'msgpack':
+        options['serializer'] = 'msgpack'
+    return options
@@ -0,0 +1,188 @@
+"""
+Sampled instrumentation for Socket.IO event handlers.
+
+Every event is counted. A sample of events (SOCKET_METRICS_SAMPLE_RATE) also
+records handler latency into a fixed-bucket histogram and the JSON payload
+size. Room broadcasts record per-room fan-out (recipients in this worker).
+Verbose packet logging from python-socketio/engineio and the handlers' own
+debug lines can be switched on and off at runtime.
+"""
+
+import bisect
+import json
+import logging
+import random
+import threading
+import time
+from functools import wraps
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+socket_log = logging.getLogger('tdrmcd.socket')
+
+
+class _EventStats:
+    __slots__ = ('count', 'errors', 'sampled', 'latency_total', 'latency_max',
+                 'buckets', 'payload_total', 'payload_max')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.sampled = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.payload_total = 0
+        self.payload_max = 0
+
+    def percentile(self, fraction):
+        """Upper bucket bound containing the given fraction of sampled events"""
+        if not self.sampled:
+            return 0.0
+        target = fraction * self.sampled
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else round(self.latency_max, 3)
+        return round(self.latency_max, 3)
+
+    def to_dict(self):
+        sampled = self.sampled
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'sampled': sampled,
+            'latency_ms': {
+                'mean': round(self.latency_total / sampled, 3) if sampled else 0.0,
+                'p50': self.percentile(0.50),
+                'p95': self.percentile(0.95),
+                'p99': self.percentile(0.99),
+                'max': round(self.latency_max, 3),
+                'buckets': {
+                    (str(bound) if i < len(LATENCY_BUCKETS_MS) else '+Inf'): n
+                    for i, (bound, n) in enumerate(zip(LATENCY_BUCKETS_MS + (None,), self.buckets))
+                },
+            },
+            'payload_bytes': {
+                'mean': round(self.payload_total / sampled, 1) if sampled else 0.0,
+                'max': self.payload_max,
+            },
+        }
+
+
+class SocketMetrics:
+    def __init__(self, app=None, socketio=None):
+        self.sample_rate = 0.1
+        self.max_rooms = 1000
+        self.verbose = False
+        self.socketio = None
+        self._events = {}
+        self._rooms = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+        if app is not None:
+            self.init_app(app, socketio)
+
+    def init_app(self, app, socketio):
+        self.socketio = socketio
+        self.sample_rate = min(1.0, max(0.0, float(app.config.get('SOCKET_METRICS_SAMPLE_RATE', 0.1))))
+        self.max_rooms = int(app.config.get('SOCKET_METRICS_MAX_ROOMS', 1000))
+        if not socket_log.handlers:
+            socket_log.addHandler(logging.StreamHandler())
+        self.set_verbose(app.config.get('SOCKET_VERBOSE_LOGGING', False))
+
+    def set_verbose(self, verbose):
+        """Switch per-packet Socket.IO/Engine.IO logging and handler debug lines"""
+        self.verbose = bool(verbose)
+        level = logging.INFO if self.verbose else logging.ERROR
+        socket_log.setLevel(logging.DEBUG if self.verbose else logging.WARNING)
+        if self.socketio is not None and self.socketio.server is not None:
+            self.socketio.server.logger.setLevel(level)
+            self.socketio.server.eio.logger.setLevel(level)
+
+    def track(self, event):
+        """Decorator for a Socket.IO handler (apply below @socketio.on)"""
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                if random.random() >= self.sample_rate:
+                    with self._lock:
+                        self._stats(event).count += 1
+                    try:
+                        return f(*args, **kwargs)
+                    except Exception:
+                        with self._lock:
+                            self._stats(event).errors += 1
+                        raise
+                size = _payload_size(args[0]) if args else 0
+                started = time.perf_counter()
+                failed = False
+                try:
+                    return f(*args, **kwargs)
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    elapsed_ms = (time.perf_counter() - started) * 1000.0
+                    with self._lock:
+                        stats = self._stats(event)
+                        stats.count += 1
+                        stats.errors += failed
+                        stats.sampled += 1
+                        stats.latency_total += elapsed_ms
+                        stats.latency_max = max(stats.latency_max, elapsed_ms)
+                        stats.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+                        stats.payload_total += size
+                        stats.payload_max = max(stats.payload_max, size)
+            return wrapper
+        return decorator
+
+    def record_fanout(self, room):
+        """Count a broadcast to a room and how many local sockets it reached"""
+        recipients = self.room_size(room)
+        with self._lock:
+            entry = self._rooms.get(room)
+            if entry is None:
+                if len(self._rooms) >= self.max_rooms:
+                    room = '_other'
+                    entry = self._rooms.get(room)
+                if entry is None:
+                    entry = self._rooms[room] = [0, 0]
+            entry[0] += 1
+            entry[1] += recipients
+
+    def room_size(self, room, namespace='/'):
+        if self.socketio is None or self.socketio.server is None:
+            return 0
+        return len(self.socketio.server.manager.rooms.get(namespace, {}).get(room, ()))
+
+    def snapshot(self, top_rooms=20):
+        with self._lock:
+            events = {name: stats.to_dict() for name, stats in self._events.items()}
+            rooms = sorted(self._rooms.items(), key=lambda item: item[1][1], reverse=True)[:top_rooms]
+        return {
+            'uptime_sec': round(time.time() - self._started, 1),
+            'sample_rate': self.sample_rate,
+            'verbose_logging': self.verbose,
+            'events': events,
+            'fanout': {room: {'emits': emits, 'recipients': recipients} for room, (emits, recipients) in rooms},
+        }
+
+    def _stats(self, event):
+        stats = self._events.get(event)
+        if stats is None:
+            stats = self._events[event] = _EventStats()
+        return stats
+
+
+def _payload_size(data):
+    try:
+        return len(json.dumps(data, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+socket_metrics = SocketMetrics()
@@ -0,0 +1,120 @@
+"""
+Coalesced typing indicators for chat rooms.
+
+Clients send a ``typing`` event while the user types (and ``typing`` with
+``typing: false`` when they stop or send). The server only records the state;
+a single background task emits at most one aggregated ``typing_update``
+(everyone currently typing in the room) per room every
+TYPING_FLUSH_INTERVAL_MS, and only when the set of typists changed. Entries
+expire after TYPING_TTL_MS without a refresh, so a closed tab never leaves a
+stale indicator behind.
+"""
+
+import threading
+import time
+
+
+class TypingCoalescer:
+    def __init__(self, app=None, socketio=None):
+        self.socketio = None
+        self.ttl = 3.0
+        self.flush_interval = 0.3
+        self._rooms = {}      # room -> {user key: (display info, expires_at)}
+        self._sids = {}       # sid -> {room: user key}
+        self._dirty = set()
+        self._last_sent = {}  # room -> tuple of user keys last emitted
+        self._stats = {'events': 0, 'updates_emitted': 0}
+        self._lock = threading.Lock()
+        self._task = None
+        if app is not None:
+            self.init_app(app, socketio)
+
+    def init_app(self, app, socketio):
+        self.socketio = socketio
+        self.ttl = max(1, int(app.config.get('TYPING_TTL_MS', 3000))) / 1000.0
+        self.flush_interval = max(50, int(app.config.get('TYPING_FLUSH_INTERVAL_MS', 300))) / 1000.0
+
+    def update(self, room, sid, user, is_typing=True):
+        """Record that a user started (or stopped) typing; emitting happens on the next tick"""
+        key, info = _typist(user, sid)
+        with self._lock:
+            self._stats['events'] += 1
+            members = self._rooms.setdefault(room, {})
+            if is_typing:
+                members[key] = (info, time.monotonic() + self.ttl)
+                self._sids.setdefault(sid, {})[room] = key
+            else:
+                members.pop(key, None)
+                self._sids.get(sid, {}).pop(room, None)
+            self._dirty.add(room)
+        if is_typing:
+            self._ensure_started()
+
+    def forget(self, sid):
+        """Drop whatever a disconnecting socket was typing"""
+        with self._lock:
+            for room, key in self._sids.pop(sid, {}).items():
+                self._rooms.get(room, {}).pop(key, None)
+                self._dirty.add(room)
+
+    def typists(self, room):
+        with self._lock:
+            return [info for info, _ in self._rooms.get(room, {}).values()]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats,
+                        rooms=len(self._rooms),
+                        typists=sum(len(m) for m in self._rooms.values()),
+                        flush_interval_ms=int(self.flush_interval * 1000))
+
+    def tick(self):
+        """Expire stale entries and emit one update per room whose typists changed"""
+        now = time.monotonic()
+        updates = []
+        with self._lock:
+            for room, members in list(self._rooms.items()):
+                expired = [key for key, (_, expires_at) in members.items() if expires_at <= now]
+                for key in expired:
+                    del members[key]
+                if expired:
+                    self._dirty.add(room)
+            for room in self._dirty:
+                members = self._rooms.get(room, {})
+                keys = tuple(sorted(members))
+                if keys != self._last_sent.get(room, ()):
+                    updates.append((room, [members[k][0] for k in keys]))
+                if keys:
+                    self._last_sent[room] = keys
+                else:
+                    self._last_sent.pop(room, None)
+                    self._rooms.pop(room, None)
+            self._dirty.clear()
+            self._stats['updates_emitted'] += len(updates)
+        for room, users in updates:
+            self.socketio.emit('typing_update', {'room': room, 'users': users}, room=room)
+        return updates
+
+    def _ensure_started(self):
+        if self._task is not None:
+            return
+        with self._lock:
+            if self._task is None:
+                self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.flush_interval)
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Typing indicator flush failed: {e}")
+
+
+def _typist(user, sid):
+    if user is not None and user.is_authenticated:
+        return f"user:{user.id}", {'username': user.username, 'name': user.get_full_name()}
+    return f"sid:{sid}", {'username': 'Anonymous', 'name': 'Anonymous'}
+
+
+typing_indicators = TypingCoalescer()
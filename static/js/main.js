@@ -89,63 +89,43 @@ function initializeApp() {
 
 function initializeNotificationSocket() {
     if (!socket) return;
+    // Pushes carry new/changed items and the unread count, so open tabs never poll
     socket.on('notification', function(payload) {
         try {
             if (!payload) return;
-            // Handle structured follow events for instant UI update
-            if (payload.kind === 'follow') {
-                prependFollowNotification(payload);
-                return;
-            }
-            if (payload.kind === 'follow_retract') {
-                // Fallback: just reload list to remove pending item(s)
-                loadNotifications();
-                return;
-            }
-            // Default fallback
-            loadNotifications();
+            applyNotificationDelta(payload);
         } catch (_) {}
     });
+    // Catch up on anything missed while disconnected (304 when nothing changed)
+    let connectedBefore = socket.connected;
+    socket.on('connect', function() {
+        if (connectedBefore) loadNotifications();
+        connectedBefore = true;
+    });
 }
 
-function prependFollowNotification(data) {
-    const notificationsList = document.getElementById('notifications-list');
-    const notificationCount = document.getElementById('notification-count');
-    if (!notificationsList || !notificationCount) return;
-
-    // Build item HTML
-    const href = data.url || '/';
-    const title = 'New Follower';
-    const message = `${escapeHtml(data.followerFullName)} (@${escapeHtml(data.followerUsername)}) started following you.`;
-    const createdAt = data.createdAt || new Date().toISOString();
-    const id = data.notificationId || `temp_${Date.now()}`;
-
-    const itemHtml = `
-        <a class="dropdown-item notification-item fw-bold unread-notification" href="${href}" data-notification-id="${id}">
-            <div class="d-flex">
-                <div class="flex-shrink-0 me-2">
-                    <i class="fas fa-${getNotificationIcon('info')} text-${getNotificationColor('info')}"></i>
-                </div>
-                <div class="flex-grow-1">
-                    <div class="fw-bold">${title}</div>
-                    <div class="small text-muted">${message}</div>
-                    <div class="small text-muted">${formatDate(createdAt)}</div>
-                </div>
-            </div>
-        </a>`;
-
-    // Remove "No notifications" placeholder if present
-    if (notificationsList.children.length === 1 && notificationsList.querySelector('.dropdown-item.text-muted')) {
-        notificationsList.innerHTML = '';
+function applyNotificationDelta(payload) {
+    if (payload.items) {
+        payload.items.forEach(item => {
+            notifications = notifications.filter(n => n.id !== item.id);
+            notifications.push(item);
+        });
+        notifications.sort((a, b) => (b.created_at || '').localeCompare(a.created_at || ''));
+        notifications = notifications.slice(0, 10);
+    } else if (payload.kind === 'read') {
+        notifications.forEach(n => {
+            if (payload.all || (payload.ids || []).includes(n.id)) n.is_read = true;
+        });
+    } else if (payload.kind === 'follow_retract') {
+        notifications = notifications.filter(n => !(payload.removed || []).includes(n.id));
+    } else {
+        // Unknown event: fetch whatever was created or changed since our cursor
+        loadNotifications(notificationsCursor);
+        return;
     }
-    notificationsList.insertAdjacentHTML('afterbegin', itemHtml);
-
-    // Increment badge
-    const curr = parseInt(notificationCount.textContent || '0', 10) || 0;
-    const next = curr + 1;
-    notificationCount.textContent = String(next);
-    notificationCount.style.display = 'inline';
+    updateNotificationUI(notifications, payload.unread);
 }
+
 function initializeFollowToggles() {
     document.addEventListener('click', async function(e) {
         const btn = e.target.closest('.js-follow-toggle');
@@ -187,8 +167,6 @@ function initializeFollowToggles() {
 // Notification system
 function initializeNotifications() {
     loadNotifications();
-    // Poll every 30s for new notifications
-    setInterval(loadNotifications, 30000);
     
     // Mark notification as read
     document.addEventListener('click', function(e) {
@@ -219,9 +197,17 @@ function initializeNotifications() {
     }
 }
 
-function loadNotifications() {
-    fetch('/api/notifications')
+let notificationsEtag = null;
+let notificationsCursor = null;
+
+function loadNotifications(since) {
+    const url = since ? `/api/notifications?since=${encodeURIComponent(since)}` : '/api/notifications';
+    const headers = !since && notificationsEtag ? { 'If-None-Match': notificationsEtag } : {};
+    fetch(url, { headers: headers })
         .then(async response => {
+            if (response.status === 304) {
+                return null;
+            }
             if (!response.ok) {
                 // 404 or other errors: skip without throwing JSON parse error
                 throw new Error(`HTTP ${response.status}`);
@@ -230,12 +216,17 @@ function loadNotifications() {
             if (!contentType.includes('application/json')) {
                 throw new Error('Non-JSON response');
             }
+            if (!since) notificationsEtag = response.headers.get('ETag');
             return response.json();
         })
         .then(data => {
-            console.log('Notifications loaded:', data);
-            if (data && data.notifications) {
-                updateNotificationUI(data.notifications);
+            if (!data || !data.notifications) return;
+            if (data.cursor) notificationsCursor = data.cursor;
+            if (since) {
+                applyNotificationDelta({ items: data.notifications, unread: data.unread });
+            } else {
+                notifications = data.notifications;
+                updateNotificationUI(notifications, data.unread);
             }
         })
         .catch(error => {
@@ -243,8 +234,7 @@ function loadNotifications() {
         });
 }
 
-function updateNotificationUI(notifications) {
-    console.log('Updating notification UI with:', notifications);
+function updateNotificationUI(notifications, unread) {
     const notificationsList = document.getElementById('notifications-list');
     const notificationCount = document.getElementById('notification-count');
     
@@ -253,7 +243,7 @@ function updateNotificationUI(notifications) {
         return;
     }
 
-    const unreadCount = notifications.filter(n => !n.is_read).length;
+    const unreadCount = typeof unread === 'number' ? unread : notifications.filter(n => !n.is_read).length;
     if (unreadCount > 0) {
         if (notificationCount.textContent !== String(unreadCount)) {
             notificationCount.textContent = unreadCount;
@@ -295,7 +285,8 @@ function markNotificationRead(notificationId) {
     })
     .then(response => response.json())
     .then(data => {
-        if (data.status === 'success') {
+        // Connected tabs get the change pushed; otherwise refetch
+        if (data.status === 'success' && !(socket && socket.connected)) {
             loadNotifications();
         }
     })
@@ -311,7 +302,8 @@ function markAllNotificationsRead() {
     })
     .then(response => response.json())
     .then(data => {
-        if (data.status === 'success') {
+        // Connected tabs get the change pushed; otherwise refetch
+        if (data.status === 'success' && !(socket && socket.connected)) {
             loadNotifications();
         }
     })
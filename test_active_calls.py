@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Active Call State Test for TDRMCD
+Chat rooms are told about a call when they join, when it starts and when it
+ends, and the HTTP check answers a repeated poll with 304.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import uuid
+
+
+def states(client):
+    return [p['args'][0] for p in client.get_received() if p['name'] == 'video_call_state']
+
+
+def test_call_state_is_pushed_to_the_chat_room(flask_app, make_user, logged_in):
+    from app import socketio
+    chat_room = f"calls-{uuid.uuid4().hex[:8]}"
+    with flask_app.app_context():
+        host_http = logged_in(make_user('host'))
+        member_http = logged_in(make_user('member'))
+    member = socketio.test_client(flask_app, flask_test_client=member_http)
+    try:
+        member.emit('join_chat', {'room': chat_room})
+        assert states(member) == [{'room': chat_room, 'exists': False}]
+
+        room_id = host_http.post('/community/video_call/create',
+                                 json={'title': 'Planting', 'chat_room': chat_room}).get_json()['room_id']
+        [started] = states(member)
+        assert (started['exists'], started['room_id'], started['title']) == (True, room_id, 'Planting')
+
+        check = member_http.get(f'/community/video_call/check/{chat_room}')
+        assert check.get_json()['room_id'] == room_id
+        again = member_http.get(f'/community/video_call/check/{chat_room}',
+                                headers={'If-None-Match': check.headers['ETag']})
+        assert again.status_code == 304
+
+        assert host_http.post(f'/community/video_call/{room_id}/end').get_json()['success']
+        assert states(member) == [{'room': chat_room, 'exists': False}]
+        ended = member_http.get(f'/community/video_call/check/{chat_room}',
+                                headers={'If-None-Match': check.headers['ETag']})
+        assert ended.status_code == 200 and ended.get_json()['exists'] is False
+    finally:
+        member.disconnect()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Call Expiry Test for TDRMCD
+An idle call ends at its deadline, activity pushes the deadline back, and a
+call another worker saw more recently is rescheduled instead of ended.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, VideoCall
+from services.call_expiry import CallExpiryScheduler
+
+
+@pytest.fixture
+def scheduler(flask_app):
+    from app import socketio
+    with flask_app.app_context():
+        # A private leader, so nothing here depends on the process-wide lease
+        scheduler = CallExpiryScheduler(flask_app, socketio)
+        scheduler.is_leader = True
+        scheduler.write_interval = 0
+        yield scheduler
+
+
+@pytest.fixture
+def call(scheduler, make_user):
+    started = datetime.utcnow() - timedelta(hours=1)
+    call = VideoCall(room_id=f"expiry-{uuid.uuid4().hex}", title='Idle', host_id=make_user('host').id,
+                     created_at=started, last_activity_at=started)
+    db.session.add(call)
+    db.session.commit()
+    return call
+
+
+def is_active(call):
+    db.session.expire_all()
+    return db.session.get(VideoCall, call.id).is_active
+
+
+def test_activity_pushes_the_deadline_back(scheduler, call):
+    start = datetime.utcnow()
+    scheduler.touch(call.room_id, now=start)
+    scheduler.touch(call.room_id, now=start + timedelta(minutes=10))
+    # The first deadline has passed, but the call was active since
+    assert scheduler.run_due(now=start + scheduler.idle + timedelta(seconds=1)) == 0
+    assert is_active(call)
+    assert scheduler.stats()['heap_size'] == 1
+
+    assert scheduler.run_due(now=start + timedelta(minutes=10) + scheduler.idle + timedelta(seconds=1)) == 1
+    assert not is_active(call)
+    assert scheduler.stats()['scheduled_calls'] == 0
+
+
+def test_activity_seen_by_another_worker_keeps_the_call(scheduler, call):
+    start = datetime.utcnow()
+    scheduler.touch(call.room_id, now=start)
+    # Another worker recorded activity without telling this scheduler
+    seen = start + timedelta(minutes=5)
+    VideoCall.query.filter_by(id=call.id).update({'last_activity_at': seen})
+    db.session.commit()
+
+    assert scheduler.run_due(now=start + scheduler.idle + timedelta(seconds=1)) == 0
+    assert is_active(call)
+    assert scheduler.stats()['rescheduled'] == 1
+    assert scheduler.run_due(now=seen + scheduler.idle + timedelta(seconds=1)) == 1
+    assert not is_active(call)
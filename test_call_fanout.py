@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Video Call Fan-out Test for TDRMCD
+Ending a call must reach the chat room, the call's participants and pages
+watching the call (once each), and no other connected client.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import uuid
+
+from models import db, User, VideoCall
+
+
+def ended_events(client):
+    return [p for p in client.get_received() if p['name'] == 'video_call_ended']
+
+
+def test_call_end_reaches_only_subscribers(flask_app, make_user, logged_in):
+    from app import socketio
+    app = flask_app
+    room_id = f"fanout-{uuid.uuid4().hex}"
+    chat_room = f"fanout-chat-{uuid.uuid4().hex[:8]}"
+    with app.app_context():
+        host = make_user('host')
+        guest = make_user('guest')
+        db.session.add(VideoCall(room_id=room_id, title='Fan-out', host_id=host.id, chat_room=chat_room))
+        db.session.commit()
+        host_id, guest_id = host.id, guest.id
+
+    host_http = logged_in(host_id)
+    guest_http = logged_in(guest_id)
+    chat_member = socketio.test_client(app, flask_test_client=guest_http)
+    participant = socketio.test_client(app, flask_test_client=host_http)
+    watcher = socketio.test_client(app, flask_test_client=guest_http)
+    both = socketio.test_client(app, flask_test_client=guest_http)
+    bystanders = [socketio.test_client(app) for _ in range(5)]
+    clients = [chat_member, participant, watcher, both] + bystanders
+    try:
+        chat_member.emit('join_chat', {'room': chat_room})
+        participant.emit('join_call', {'room_id': room_id})
+        watcher.emit('watch_calls', {'room_ids': [room_id]})
+        # In the chat room and in the call: still one event
+        both.emit('join_chat', {'room': chat_room})
+        both.emit('join_call', {'room_id': room_id})
+        for client in clients:
+            client.get_received()
+
+        emits = 0
+        original_emit = socketio.server.emit
+
+        def counting_emit(event, *args, **kwargs):
+            nonlocal emits
+            if event == 'video_call_ended':
+                emits += 1
+            return original_emit(event, *args, **kwargs)
+
+        socketio.server.emit = counting_emit
+        try:
+            response = host_http.post(f'/community/video_call/{room_id}/end')
+        finally:
+            socketio.server.emit = original_emit
+        assert response.get_json()['success']
+
+        assert emits == 1
+        delivered = {name: len(ended_events(client)) for name, client in
+                     [('chat_member', chat_member), ('participant', participant), ('watcher', watcher), ('both', both)]}
+        assert delivered == {'chat_member': 1, 'participant': 1, 'watcher': 1, 'both': 1}
+        assert sum(len(ended_events(client)) for client in bystanders) == 0
+    finally:
+        for client in clients:
+            if client.is_connected():
+                client.disconnect()
+        with app.app_context():
+            VideoCall.query.filter_by(room_id=room_id).delete()
+            User.query.filter(User.id.in_([host_id, guest_id])).delete(synchronize_session=False)
+            db.session.commit()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Call Capacity Test for TDRMCD
+A call refuses joins past max_participants, a user with several tabs counts
+once, and the batched stats flush records the call's peak.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import uuid
+
+from models import db, VideoCall
+from services.call_participants import call_participants
+
+
+def test_full_call_refuses_new_users(flask_app, make_user, logged_in):
+    from app import socketio
+    room_id = f"capacity-{uuid.uuid4().hex}"
+    with flask_app.app_context():
+        host, guest, late = make_user('host'), make_user('guest'), make_user('late')
+        db.session.add(VideoCall(room_id=room_id, title='Small', host_id=host.id, max_participants=2))
+        db.session.commit()
+        ids = host.id, guest.id, late.id
+
+    host_tab, host_other_tab, guest_tab, late_tab = clients = [
+        socketio.test_client(flask_app, flask_test_client=logged_in(user_id))
+        for user_id in (ids[0], ids[0], ids[1], ids[2])]
+    try:
+        for client in (host_tab, host_other_tab, guest_tab):
+            assert not client.emit('join_call', {'room_id': room_id}, callback=True)
+        assert call_participants.count(room_id) == 2
+
+        ack = late_tab.emit('join_call', {'room_id': room_id}, callback=True)
+        assert ack == {'error': 'call_full', 'room_id': room_id, 'max_participants': 2}
+        assert [p['args'][0] for p in late_tab.get_received() if p['name'] == 'call_full'] == [ack]
+        assert call_participants.count(room_id) == 2
+
+        # Closing one of the host's tabs does not free a seat; the guest leaving does
+        host_other_tab.disconnect()
+        assert late_tab.emit('join_call', {'room_id': room_id}, callback=True) == ack
+        guest_tab.emit('leave_call', {'room_id': room_id})
+        assert not late_tab.emit('join_call', {'room_id': room_id}, callback=True)
+        assert call_participants.count(room_id) == 2
+
+        with flask_app.app_context():
+            assert call_participants.flush() >= 1
+            assert VideoCall.query.filter_by(room_id=room_id).one().peak_participants == 2
+    finally:
+        for client in clients:
+            if client.is_connected():
+                client.disconnect()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Chat Archive Test for TDRMCD
+Paging through a room's history must return every message exactly once and
+in order, whether the page comes from the live table, the archive, or both.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from models import db, ChatMessage
+from services.chat_archive import chat_archive, message_timestamp
+
+MESSAGES = 100
+LIVE = 20
+
+
+@pytest.fixture
+def archived_room(flask_app, make_user, logged_in):
+    """A room with MESSAGES messages over many months, all but the newest LIVE archived"""
+    room = f"archive-{uuid.uuid4().hex[:8]}"
+    policies, batch_size = chat_archive.room_policies, chat_archive.batch_size
+    with flask_app.app_context():
+        user = make_user('archive')
+        base = datetime(2025, 1, 1)
+        # Five messages a month, so the archive spans more segments than one page (SEGMENT_PAGE)
+        db.session.execute(insert(ChatMessage), [{
+            'content': f"message {i}", 'room': room, 'sender_id': user.id, 'message_type': 'text',
+            'timestamp': base + timedelta(days=31 * (i // 5), seconds=i),
+        } for i in range(MESSAGES)])
+        db.session.commit()
+        ids = [row.id for row in ChatMessage.query.filter_by(room=room)
+               .order_by(ChatMessage.timestamp, ChatMessage.id)]
+        chat_archive.room_policies = {room: (0, LIVE)}
+        chat_archive.batch_size = 7
+        try:
+            assert chat_archive.archive_room(room) == MESSAGES - LIVE
+        finally:
+            chat_archive.room_policies, chat_archive.batch_size = policies, batch_size
+        user_id = user.id
+    yield flask_app, room, ids, logged_in(user_id)
+
+
+def test_paging_back_crosses_into_the_archive(archived_room):
+    app, room, ids, client = archived_room
+    page = client.get(f"/community/chat/{room}/messages?limit=7").get_json()
+    seen = [m['id'] for m in page['messages']]
+    while page['has_more']:
+        page = client.get(f"/community/chat/{room}/messages?limit=7&before={page['next_before']}").get_json()
+        seen = [m['id'] for m in page['messages']] + seen
+    assert seen == ids
+
+
+def test_paging_forward_crosses_out_of_the_archive(archived_room):
+    app, room, ids, client = archived_room
+    seen = [ids[0]]
+    page = {'has_more': True, 'next_after': ids[0]}
+    while page['has_more']:
+        page = client.get(f"/community/chat/{room}/messages?limit=7&after={page['next_after']}").get_json()
+        seen += [m['id'] for m in page['messages']]
+    assert seen == ids
+
+
+def test_archive_reads_at_the_boundary(archived_room):
+    app, room, ids, client = archived_room
+    with app.app_context():
+        oldest_live = db.session.get(ChatMessage, ids[-LIVE])
+        older = chat_archive.older(room, oldest_live.timestamp, oldest_live.id, 5)
+        assert [m['id'] for m in older] == ids[-LIVE - 5:-LIVE][::-1]
+
+        newest_archived = chat_archive.find(room, ids[-LIVE - 3])
+        newer = chat_archive.newer(room, message_timestamp(newest_archived), newest_archived['id'], 5)
+        # Only the archived tail; the live table holds the rest
+        assert [m['id'] for m in newer] == ids[-LIVE - 2:-LIVE]
+
+        assert chat_archive.find(room, ids[-LIVE]) is None
+        assert [m['id'] for m in chat_archive.older(room, None, None, 3)] == ids[-LIVE - 3:-LIVE][::-1]
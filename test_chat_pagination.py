@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Chat Pagination Test for TDRMCD
+Keyset paging over (timestamp, id) with ``before``/``after`` returns each
+message once and in order, even when messages share a timestamp, and
+rejects cursors from another room.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from models import db, ChatMessage
+
+
+@pytest.fixture
+def paged_room(flask_app, make_user, logged_in):
+    room = f"pages-{uuid.uuid4().hex[:8]}"
+    with flask_app.app_context():
+        user = make_user('pager')
+        # Three messages per second, so the id has to break the ties
+        db.session.execute(insert(ChatMessage), [{
+            'content': f"message {i}", 'room': room, 'sender_id': user.id, 'message_type': 'text',
+            'timestamp': datetime(2026, 3, 1, 12, 0, i // 3),
+        } for i in range(12)])
+        db.session.add(ChatMessage(content='elsewhere', room=f"{room}-other", sender_id=user.id))
+        db.session.commit()
+        ids = [row.id for row in ChatMessage.query.filter_by(room=room)
+               .order_by(ChatMessage.timestamp, ChatMessage.id)]
+        other_id = ChatMessage.query.filter_by(room=f"{room}-other").one().id
+        user_id = user.id
+    return room, ids, other_id, logged_in(user_id)
+
+
+def page(client, room, **args):
+    return client.get(f"/community/chat/{room}/messages", query_string=args).get_json()
+
+
+def test_before_and_after_walk_the_room_once(paged_room):
+    room, ids, _, client = paged_room
+    newest = page(client, room, limit=5)
+    assert [m['id'] for m in newest['messages']] == ids[-5:]
+    assert newest['has_more']
+
+    seen, current = [m['id'] for m in newest['messages']], newest
+    while current['has_more']:
+        current = page(client, room, limit=5, before=current['next_before'])
+        seen = [m['id'] for m in current['messages']] + seen
+    assert seen == ids
+
+    forward = page(client, room, limit=4, after=ids[3])
+    assert [m['id'] for m in forward['messages']] == ids[4:8]
+    assert forward['has_more']
+    last = page(client, room, limit=4, after=ids[-1])
+    assert (last['messages'], last['has_more'], last['next_after']) == ([], False, ids[-1])
+
+
+def test_cursor_from_another_room_is_rejected(paged_room):
+    room, _, other_id, client = paged_room
+    response = client.get(f"/community/chat/{room}/messages", query_string={'before': other_id})
+    assert response.status_code == 400
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Chat Search Test for TDRMCD
+Full-text search only returns the searched room's messages, and paging with
+the returned cursor yields every match exactly once.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from models import db, ChatMessage
+from services.chat_search import chat_search, room_key
+
+
+@pytest.fixture
+def rooms(flask_app, make_user):
+    if not chat_search.available:
+        pytest.skip('FTS5 not available')
+    with flask_app.app_context():
+        user = make_user('search')
+        # Room ids that share a prefix must not match each other
+        room = f"search-{uuid.uuid4().hex[:8]}"
+        other = f"{room}-2"
+        ids = []
+        for i in range(23):
+            message = ChatMessage(content=f"irrigation note {i}", room=room, sender_id=user.id)
+            db.session.add(message)
+            db.session.flush()
+            ids.append(message.id)
+        db.session.add(ChatMessage(content='lunch?', room=room, sender_id=user.id))
+        db.session.add_all([ChatMessage(content=f"irrigation elsewhere {i}", room=other, sender_id=user.id)
+                            for i in range(5)])
+        db.session.commit()
+        yield room, other, ids
+
+
+def test_search_is_scoped_to_the_room(rooms):
+    room, other, ids = rooms
+    page = chat_search.search(room, 'irrig', limit=50)
+    assert sorted(r['id'] for r in page['results']) == ids
+    assert not page['has_more']
+    assert len(chat_search.search(other, 'irrigation', limit=50)['results']) == 5
+    assert chat_search.search(room, 'elsewhere')['results'] == []
+    # The room is matched inside the index, not filtered after ranking
+    matched = db.session.execute(text("SELECT count(*) FROM chat_message_fts WHERE chat_message_fts MATCH :q"),
+                                 {'q': f'room_key : "{room_key(room)}" AND content : "irrigation"'}).scalar()
+    assert matched == len(ids)
+
+
+def test_cursor_pages_through_every_match_once(rooms):
+    room, _, ids = rooms
+    seen, cursor = [], None
+    while True:
+        page = chat_search.search(room, 'irrigation', limit=5, cursor=cursor)
+        seen += [r['id'] for r in page['results']]
+        if not page['has_more']:
+            break
+        cursor = page['next_cursor']
+    assert sorted(seen) == ids
+    assert len(seen) == len(set(seen))
+    assert page['next_cursor'] is None
+    with pytest.raises(ValueError):
+        chat_search.search(room, 'irrigation', cursor='not-a-cursor')
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+ICE Relay Test for TDRMCD
+Clients that joined a call with ice_bundle get trickled candidates as one
+bundle, older clients get one event per candidate, and an event carrying
+more than ICE_BATCH_MAX candidates is rejected outright.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import uuid
+
+import pytest
+
+from services.ice_relay import ice_relay
+
+
+def ice_events(client):
+    return [p['args'][0] for p in client.get_received()
+            if p['name'] == 'call_event' and p['args'][0]['type'].startswith('ice-')]
+
+
+def candidate(i):
+    return {'candidate': f"candidate:{i} 1 udp 2122260223 10.0.0.{i} 5000{i} typ host", 'sdpMid': '0'}
+
+
+@pytest.fixture
+def call(flask_app, monkeypatch):
+    from app import socketio
+    # Long enough that only end-of-candidates (or a forced flush) sends a batch
+    monkeypatch.setattr(ice_relay, 'window', 60.0)
+    room_id = f"ice-{uuid.uuid4().hex}"
+    sender, bundled, legacy = clients = [socketio.test_client(flask_app) for _ in range(3)]
+    sender.emit('join_call', {'room_id': room_id})
+    bundled.emit('join_call', {'room_id': room_id, 'ice_bundle': True})
+    legacy.emit('join_call', {'room_id': room_id})
+    for client in clients:
+        client.get_received()
+    yield room_id, sender, bundled, legacy
+    for client in clients:
+        if client.is_connected():
+            client.disconnect()
+
+
+def test_candidates_are_bundled_only_for_clients_that_asked(call):
+    room_id, sender, bundled, legacy = call
+    sender.emit('webrtc_ice_candidate', {'room_id': room_id, 'candidates': [candidate(1), candidate(2)]})
+    sender.emit('webrtc_ice_candidate', {'room_id': room_id, 'candidates': [candidate(3)]})
+    assert ice_events(bundled) == [] and ice_events(legacy) == []
+
+    # End-of-candidates sends the batch without waiting for the window
+    sender.emit('webrtc_ice_candidate', {'room_id': room_id, 'candidates': [None]})
+    sent = [candidate(1), candidate(2), candidate(3), None]
+    [bundle] = ice_events(bundled)
+    assert (bundle['type'], bundle['candidates']) == ('ice-candidates', sent)
+    singles = ice_events(legacy)
+    assert {e['type'] for e in singles} == {'ice-candidate'}
+    assert [e['candidate'] for e in singles] == sent
+    assert ice_events(sender) == []
+
+
+def test_no_batching_without_a_bundle_client(call):
+    room_id, sender, bundled, legacy = call
+    bundled.disconnect()
+    sender.emit('webrtc_ice_candidate', {'room_id': room_id, 'candidates': [candidate(1), candidate(2)]})
+    # Nobody left can take bundles, so nothing waits for the window
+    assert [e['candidate'] for e in ice_events(legacy)] == [candidate(1), candidate(2)]
+
+
+def test_too_many_candidates_are_rejected(call):
+    room_id, sender, bundled, legacy = call
+    before = ice_relay.stats()['candidates_in']
+    ack = sender.emit('webrtc_ice_candidate', {
+        'room_id': room_id, 'candidates': [candidate(i) for i in range(ice_relay.max_batch + 1)]
+    }, callback=True)
+    assert ack == {'error': 'too_many_candidates', 'max': ice_relay.max_batch}
+    ice_relay.flush(force=True)
+    assert ice_events(bundled) == [] and ice_events(legacy) == []
+    assert ice_relay.stats()['candidates_in'] == before
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+JaaS Token Cache Test for TDRMCD
+A call page reopened by the same user reuses the signed token until it is
+close to expiry, and a changed display name gets a fresh signature.
+"""
+
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from services import jaas_tokens as jaas_module
+from services.jaas_tokens import JaasTokenSigner
+
+
+@pytest.fixture
+def signer(monkeypatch):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    now = [1_700_000_000]
+    monkeypatch.setattr(jaas_module.time, 'time', lambda: now[0])
+    signer = JaasTokenSigner(SimpleNamespace(config={
+        'JITSI_APP_ID': 'app-1', 'JITSI_KEY_ID': 'app-1/kid', 'JITSI_APP_SECRET': pem,
+        'JAAS_TOKEN_TTL_SEC': 3600, 'JAAS_TOKEN_REFRESH_SEC': 600,
+    }))
+    signer.now, signer.public_key = now, key.public_key()
+    return signer
+
+
+def test_token_is_reused_until_the_refresh_margin(signer):
+    user = SimpleNamespace(id=7, email='ada@tdrmcd.test')
+    token = signer.token(user, 'call-1', True, 'Ada')
+    claims = jwt.decode(token, signer.public_key, algorithms=['RS256'], audience='jitsi',
+                        options={'verify_exp': False, 'verify_iat': False, 'verify_nbf': False})
+    assert claims['context']['user']['name'] == 'Ada' and claims['context']['user']['moderator'] is True
+    assert jwt.get_unverified_header(token)['kid'] == 'app-1/kid'
+
+    signer.now[0] += 2999
+    assert signer.token(user, 'call-1', True, 'Ada') == token
+    # Another call, or the same call without moderator rights, is its own token
+    assert signer.token(user, 'call-2', True, 'Ada') != token
+    assert signer.token(user, 'call-1', False, 'Ada') != token
+    # Within the refresh margin of expiry: signed again
+    signer.now[0] += 1
+    assert signer.token(user, 'call-1', True, 'Ada') != token
+    stats = signer.stats()
+    assert (stats['hits'], stats['signed']) == (1, 4)
+
+
+def test_changed_identity_is_signed_again(signer):
+    user = SimpleNamespace(id=8, email='bo@tdrmcd.test')
+    token = signer.token(user, 'call-1', False, 'Bo')
+    assert signer.token(user, 'call-1', False, 'Bo Renamed') != token
+    assert signer.stats()['signed'] == 2
+
+
+def test_unconfigured_signer_returns_no_token():
+    signer = JaasTokenSigner(SimpleNamespace(config={'JITSI_APP_ID': 'your-jaas-app-id-here'}))
+    assert not signer.configured
+    assert signer.token(SimpleNamespace(id=1, email='x@tdrmcd.test'), 'call-1', False, 'X') is None
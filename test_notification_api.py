@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Notification API Test for TDRMCD
+/api/notifications answers an unchanged list with 304, and polling with the
+``since`` cursor returns rows changed in place (read, aggregated), not only
+new ones.
+Runs against the temporary database set up in conftest.py.
+"""
+
+from datetime import datetime
+
+from models import Notification
+from services.notifications import notifications
+
+
+def test_since_cursor_and_etag(flask_app, make_user, logged_in, monkeypatch):
+    monkeypatch.setattr(notifications, 'enabled', False)
+    with flask_app.app_context():
+        user = make_user('reader')
+        notifications.notify(user.id, 'Older', 'first')
+        notifications.notify(user.id, 'Newer', 'second')
+        older_id = Notification.query.filter_by(user_id=user.id, title='Older').one().id
+    client = logged_in(user)
+
+    first = client.get('/api/notifications')
+    body = first.get_json()
+    assert [n['title'] for n in body['notifications']] == ['Newer', 'Older']
+    assert body['unread'] == 2
+    assert client.get('/api/notifications', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # Marking an older row read adds no row, but it changes the list and the cursor picks it up
+    client.post(f'/api/notifications/mark_read/{older_id}')
+    assert client.get('/api/notifications', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+    delta = client.get('/api/notifications', query_string={'since': body['cursor']}).get_json()
+    changed = {n['id']: n for n in delta['notifications']}
+    assert changed[older_id]['is_read'] is True
+    assert delta['unread'] == 1
+    assert datetime.fromisoformat(delta['cursor']) > datetime.fromisoformat(body['cursor'])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Unread Notification Counter Test for TDRMCD
+The denormalized unread counter never goes negative, reconcile() repairs
+drift, and a notification read while it was being merged into is left alone.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import pytest
+
+from models import db, User, Notification, CommunityPost, PostLike
+from services import notification_counts
+from services.notifications import notifications, notification_actor
+
+
+def unread(user):
+    db.session.expire_all()
+    return db.session.get(User, user.id).unread_notifications
+
+
+@pytest.fixture
+def app_context(flask_app):
+    with flask_app.app_context():
+        yield
+
+
+def test_subtract_never_goes_below_zero(app_context, make_user):
+    user = make_user('sub')
+    notification_counts.record_new({user.id: 2})
+    db.session.commit()
+    notification_counts.subtract(user.id, 5)
+    db.session.commit()
+    assert unread(user) == 0
+    notification_counts.subtract(user.id, 1)
+    db.session.commit()
+    assert unread(user) == 0
+
+
+def test_reconcile_fixes_drift(app_context, make_user):
+    user = make_user('drift')
+    db.session.add_all([Notification(user_id=user.id, title='t', message='m', notification_type='info')
+                        for _ in range(3)])
+    user.unread_notifications = 7
+    db.session.commit()
+    assert notification_counts.reconcile() >= 1
+    assert unread(user) == 3
+
+
+def test_merge_into_a_row_read_meanwhile_starts_a_new_one(app_context, make_user, monkeypatch):
+    owner, bob, carol = make_user('owner'), make_user('bob'), make_user('carol')
+    monkeypatch.setattr(notifications, 'enabled', False)
+
+    post = CommunityPost(title='Harvest', content='x', author_id=owner.id, category='general')
+    db.session.add(post)
+    db.session.commit()
+
+    def like(actor):
+        db.session.add(PostLike(user_id=actor.id, post_id=post.id))
+        db.session.commit()
+        notifications.notify(owner.id, 'Your post was liked', 'liked', notification_type='success',
+                             actor=notification_actor(actor), target_type='post', target_id=post.id,
+                             aggregate="{actors} liked your post")
+
+    like(bob)
+    # Mark the row read between _merge's lookup and its update
+    execute = db.session.execute
+
+    def read_first(statement, *args, **kwargs):
+        if getattr(statement, 'is_update', False) and statement.table.name == 'notification':
+            db.session.connection().exec_driver_sql(
+                f"UPDATE notification SET is_read = 1 WHERE user_id = {owner.id}")
+        return execute(statement, *args, **kwargs)
+
+    monkeypatch.setattr(db.session, 'execute', read_first)
+    like(carol)
+    monkeypatch.undo()
+
+    db.session.expire_all()
+    first, second = Notification.query.filter_by(user_id=owner.id).order_by(Notification.id).all()
+    assert (first.is_read, first.actor_count, first.message) == (True, 1, "Bob Test liked your post")
+    assert (second.is_read, second.actor_count, second.message) == (False, 1, "Carol Test liked your post")
+    assert unread(owner) == 2
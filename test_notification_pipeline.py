@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Notification Pipeline Test for TDRMCD
+A bad row in a batch only loses itself, and a follow undone before the
+writer got to it leaves no notification behind.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import pytest
+
+from models import db, User, Notification
+from services.notifications import notifications
+
+
+def unread(user_id):
+    db.session.expire_all()
+    return db.session.get(User, user_id).unread_notifications
+
+
+@pytest.fixture
+def app_context(flask_app, monkeypatch):
+    monkeypatch.setattr(notifications, 'enabled', True)
+    with flask_app.app_context():
+        yield
+
+
+def test_failed_batch_keeps_the_good_rows(app_context, make_user):
+    user = make_user('batch')
+    failed = notifications.stats()['rows_failed']
+    notifications.notify(user.id, 'First', 'ok')
+    notifications.notify(user.id, None, 'no title')
+    notifications.notify(user.id, 'Second', 'ok')
+    notifications.flush()
+
+    db.session.expire_all()
+    titles = [n.title for n in Notification.query.filter_by(user_id=user.id).order_by(Notification.id)]
+    assert titles == ['First', 'Second']
+    assert notifications.stats()['rows_failed'] == failed + 1
+    assert unread(user.id) == 2
+
+
+def test_quick_unfollow_retracts_the_queued_follow(app_context, make_user, logged_in):
+    fan, star = make_user('fan'), make_user('star')
+    client = logged_in(fan)
+    assert client.post(f'/auth/follow/{star.id}', headers={'Accept': 'application/json'}).get_json()['following']
+    # The writer has not run yet: the follow notification is still queued
+    assert client.post(f'/auth/unfollow/{star.id}', headers={'Accept': 'application/json'}).get_json()['success']
+    notifications.flush()
+
+    db.session.expire_all()
+    assert Notification.query.filter_by(user_id=star.id, title='New Follower').count() == 0
+    assert unread(star.id) == 0
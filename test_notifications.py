@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Notification Aggregation Test for TDRMCD
+Likes on one target fold into a single unread notification that counts each
+actor once, however often they come back.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import pytest
+
+from models import db, User, Notification, CommunityPost, PostLike
+from services.notifications import notifications, notification_actor, _group, AGGREGATE_RECENT_ACTORS
+
+
+def like(post, actor):
+    """What like_post does: (re)record the like, then notify the author"""
+    PostLike.query.filter_by(user_id=actor.id, post_id=post.id).delete()
+    db.session.add(PostLike(user_id=actor.id, post_id=post.id))
+    db.session.commit()
+    notifications.notify(
+        post.author_id, 'Your post was liked', f"{actor.get_full_name()} liked your post",
+        notification_type='success', actor=notification_actor(actor),
+        target_type='post', target_id=post.id, aggregate="{actors} liked your post"
+    )
+
+
+def rows(post):
+    # The pipeline writes through its own session
+    db.session.expire_all()
+    return (Notification.query.filter_by(user_id=post.author_id, target_type='post', target_id=post.id)
+            .order_by(Notification.id).all())
+
+
+@pytest.fixture
+def people(flask_app, make_user, monkeypatch):
+    # Write inline so each notify() is its own flush, as under separate requests
+    monkeypatch.setattr(notifications, 'enabled', False)
+    with flask_app.app_context():
+        yield [make_user(name) for name in ('owner', 'bob', 'carol', 'dave')]
+
+
+@pytest.fixture
+def post(people):
+    post = CommunityPost(title='Harvest', content='x', author_id=people[0].id, category='general')
+    db.session.add(post)
+    db.session.commit()
+    return post
+
+
+def test_group_counts_a_returning_actor_once(people):
+    owner, bob, carol, _ = people
+    events = [{
+        'row': {'user_id': owner.id, 'notification_type': 'success', 'title': 'Your post was liked',
+                'target_type': 'post', 'target_id': 1},
+        'actor': notification_actor(actor),
+        'aggregate': "{actors} liked your post",
+    } for actor in (bob, carol, bob)]
+    groups = _group(events)
+    assert len(groups) == 1
+    assert groups[0]['actor_count'] == 2
+    assert [a['id'] for a in groups[0]['actors']] == [bob.id, carol.id]
+
+
+def test_merge_counts_a_returning_actor_once(people, post):
+    owner, bob, carol, dave = people
+    like(post, bob)
+    like(post, carol)
+    like(post, bob)
+    [row] = rows(post)
+    assert row.actor_count == 2
+    assert row.message == "Bob Test and Carol Test liked your post"
+    like(post, dave)
+    [row] = rows(post)
+    assert row.actor_count == 3
+    assert row.message == "Dave Test, Bob Test and 1 other liked your post"
+    assert db.session.get(User, owner.id).unread_notifications == 1
+
+
+def test_actor_outside_the_recent_list_is_not_counted_twice(people, post, make_user):
+    likers = [make_user(f"fan{i}") for i in range(AGGREGATE_RECENT_ACTORS + 2)]
+    for liker in likers:
+        like(post, liker)
+    # The first liker has dropped out of the recent-actor list; unlike and like again
+    like(post, likers[0])
+    [row] = rows(post)
+    assert row.actor_count == len(likers)
+
+
+def test_read_notification_is_not_merged_into(people, post):
+    owner, bob, carol, _ = people
+    like(post, bob)
+    Notification.query.filter_by(user_id=owner.id).update({'is_read': True})
+    db.session.commit()
+    like(post, carol)
+    first, second = rows(post)
+    assert (first.is_read, first.actor_count) == (True, 1)
+    # Bob's like was already seen, so the new row only counts Carol
+    assert (second.is_read, second.actor_count, second.message) == (False, 1, "Carol Test liked your post")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Rate Limit Test for TDRMCD
+Token buckets allow a burst, refill at their rate, and rejected socket events
+get a rate_limited event before the handler runs.
+Runs against the temporary database set up in conftest.py.
+"""
+
+from services import rate_limit
+from services.rate_limit import RateLimiter, parse_limits
+
+
+def test_bucket_allows_a_burst_then_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: now[0])
+    limiter = RateLimiter()
+    limiter.limits = {'send_message': (2.0, 3)}
+    assert [limiter.check('send_message', 'user:1') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.check('send_message', 'user:1') == 0.5
+    # Other clients and unlimited events have their own (or no) bucket
+    assert limiter.check('send_message', 'user:2') == 0.0
+    assert limiter.check('unlimited', 'user:1') == 0.0
+    now[0] += 0.5
+    assert limiter.check('send_message', 'user:1') == 0.0
+    assert limiter.stats()['events']['send_message'] == {'allowed': 5, 'rejected': 1}
+
+
+def test_parse_limits():
+    assert parse_limits('send_message=5/10, chat_upload=0.2/3,typing=4,bad') == {
+        'send_message': (5.0, 10), 'chat_upload': (0.2, 3), 'typing': (4.0, 4)
+    }
+
+
+def test_rejected_socket_event_gets_rate_limited(flask_app, make_user, logged_in):
+    from app import socketio
+    with flask_app.app_context():
+        user_id = make_user('typist').id
+    client = socketio.test_client(flask_app, flask_test_client=logged_in(user_id))
+    try:
+        client.get_received()
+        burst = rate_limit.rate_limiter.limits['typing'][1]
+        for _ in range(burst + 1):
+            client.emit('typing', {'room': 'general', 'typing': True})
+        limited = [p['args'][0] for p in client.get_received() if p['name'] == 'rate_limited']
+        assert len(limited) == 1
+        assert limited[0]['event'] == 'typing' and limited[0]['retry_after'] > 0
+    finally:
+        client.disconnect()
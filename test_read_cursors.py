@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Chat Read Cursor Test for TDRMCD
+Unread counters are kept per (user, room) cursor, cursors only exist for
+rooms a user has opened, and socket mark_read events are coalesced.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, ChatMessage, ChatReadCursor
+from services.read_cursors import read_marks, record_messages, unread_counts, write_cursors
+
+
+def post(room, sender, content='hi'):
+    """Persist a message the way the chat writer does: insert and bump counters together"""
+    row = {'room': room, 'sender_id': sender.id, 'content': content,
+           'timestamp': datetime.utcnow() + timedelta(seconds=1)}
+    message = ChatMessage(**row)
+    db.session.add(message)
+    record_messages([row])
+    db.session.commit()
+    return message
+
+
+def cursor(user, room):
+    db.session.expire_all()
+    return ChatReadCursor.query.filter_by(user_id=user.id, room=room).first()
+
+
+@pytest.fixture
+def room(flask_app):
+    with flask_app.app_context():
+        yield f"cursor-{uuid.uuid4().hex[:8]}"
+
+
+def test_cursors_are_created_when_a_room_is_first_read(room, make_user):
+    alice, bob = make_user('alice'), make_user('bob')
+    post(room, alice)
+    assert unread_counts(bob.id, [room]) == {room: 0}
+    assert cursor(bob, room) is None
+
+    write_cursors([(bob.id, room)])
+    post(room, alice)
+    post(room, alice)
+    assert unread_counts(bob.id, [room, 'cursor-never-opened']) == {room: 2, 'cursor-never-opened': 0}
+    # Only users who opened the room get a cursor (the sender never did)
+    assert cursor(alice, room) is None
+
+
+def test_write_cursors_updates_and_inserts_in_one_batch(room, make_user):
+    alice, bob, carol = make_user('alice'), make_user('bob'), make_user('carol')
+    write_cursors([(bob.id, room)])
+    last = post(room, alice)
+    write_cursors([(bob.id, room), (carol.id, room), (bob.id, room)])
+    for user in (bob, carol):
+        assert (cursor(user, room).last_read_message_id, cursor(user, room).unread_count) == (last.id, 0)
+    assert ChatReadCursor.query.filter_by(room=room).count() == 2
+
+
+def test_mark_read_events_are_coalesced(room, make_user):
+    alice, bob = make_user('alice'), make_user('bob')
+    last = post(room, alice)
+    before = read_marks.stats()
+    for _ in range(5):
+        read_marks.mark(bob.id, room)
+    read_marks.mark(alice.id, room)
+    read_marks.flush()
+    after = read_marks.stats()
+    # Six marks, two (user, room) pairs: two cursor writes (the thread waits READ_CURSOR_FLUSH_MS first)
+    assert after['marks'] - before['marks'] == 6
+    assert after['cursors_written'] - before['cursors_written'] == 2
+    assert cursor(bob, room).last_read_message_id == last.id
+    assert cursor(alice, room).last_read_message_id == last.id
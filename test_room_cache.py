@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Room Cache Test for TDRMCD
+Private rooms are limited to their creator and admins, and a room that did
+not exist yet is looked up again rather than cached as public.
+Runs against the temporary database set up in conftest.py.
+"""
+
+import uuid
+
+import pytest
+from flask_login import AnonymousUserMixin
+
+from models import db, ChatRoom
+from services.room_cache import RoomCache
+
+
+@pytest.fixture
+def cache(flask_app):
+    with flask_app.app_context():
+        yield RoomCache(flask_app)
+
+
+def test_missing_room_is_not_cached_as_public(cache, make_user):
+    owner, stranger = make_user('owner'), make_user('stranger')
+    room_id = f"secret-{uuid.uuid4().hex[:8]}"
+    assert cache.can_access(stranger, room_id)
+    # Built-in rooms never get a row, so their misses can be cached
+    assert cache.get('general') is None
+    assert cache.stats()['size'] == 1
+
+    # Created on another worker: this cache was never invalidated
+    db.session.add(ChatRoom(room_id=room_id, name='Secret', is_private=True, created_by=owner.id))
+    db.session.commit()
+    assert not cache.can_access(stranger, room_id)
+    assert cache.can_access(owner, room_id)
+    assert cache.stats()['hits'] == 1
+
+
+def test_private_room_access(cache, make_user):
+    owner, stranger, admin = make_user('owner'), make_user('stranger'), make_user('admin')
+    admin.role = 'admin'
+    room_id = f"private-{uuid.uuid4().hex[:8]}"
+    public_id = f"public-{uuid.uuid4().hex[:8]}"
+    db.session.add_all([ChatRoom(room_id=room_id, name='Private', is_private=True, created_by=owner.id),
+                        ChatRoom(room_id=public_id, name='Public', is_private=False, created_by=owner.id)])
+    db.session.commit()
+    assert [cache.can_access(user, room_id) for user in (owner, admin, stranger, AnonymousUserMixin())] == \
+        [True, True, False, False]
+    assert cache.can_access(stranger, public_id) and cache.can_access(AnonymousUserMixin(), public_id)
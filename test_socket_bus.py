@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Message Queue Test Script for TDRMCD
+Checks that two Socket.IO servers sharing a local:// message queue deliver
+room emits to each other's clients, the way separate workers do with Redis.
+"""
+
+import time
+import socketio
+from services.socket_bus import LocalPubSubManager
+
+
+def make_worker(channel):
+    """Create a Socket.IO server ('worker') attached to the shared bus and record what it sends"""
+    server = socketio.Server(async_mode='threading', client_manager=LocalPubSubManager(channel=channel))
+    server.sent = []
+    server._send_eio_packet = lambda eio_sid, pkt: server.sent.append((eio_sid, pkt.data))
+    server.manager_initialized = True
+    server.manager.initialize()
+    return server
+
+
+def join(server, eio_sid, room):
+    sid = server.manager.connect(eio_sid, '/')
+    server.manager.enter_room(sid, '/', room, eio_sid=eio_sid)
+
+
+def wait_for(server, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not server.sent:
+        time.sleep(0.02)
+    return server.sent
+
+
+def test_room_emit_reaches_other_worker():
+    worker_a = make_worker('test-bus-rooms')
+    worker_b = make_worker('test-bus-rooms')
+    join(worker_b, 'eio-b', 'general')
+
+    # Emit from worker A (e.g. a blueprint or the cleanup thread) to a room joined on worker B
+    worker_a.emit('receive_message', {'message': 'hello'}, room='general')
+
+    sent = wait_for(worker_b)
+    assert len(sent) == 1
+    assert sent[0][0] == 'eio-b' and 'hello' in sent[0][1]
+    assert worker_a.sent == []
+
+
+def test_channels_are_isolated():
+    worker_a = make_worker('test-bus-one')
+    worker_b = make_worker('test-bus-two')
+    join(worker_b, 'eio-b', 'general')
+
+    worker_a.emit('receive_message', {'message': 'hello'}, room='general')
+
+    assert wait_for(worker_b, timeout=0.3) == []
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+TDRMCD - Production Entry Point
+
+Serves the application with the async mode chosen by SOCKETIO_ASYNC_MODE,
+without the debugger or the Werkzeug development server:
+
+    SOCKETIO_ASYNC_MODE=eventlet python wsgi.py
+    gunicorn --worker-class eventlet -w 1 --bind 0.0.0.0:5000 wsgi:app
+
+Green modes monkey-patch the standard library here, before the app (and with
+it Flask, SQLAlchemy and the database driver) is imported. To run more than
+one worker, set SOCKETIO_MESSAGE_QUEUE so they share Socket.IO rooms.
+"""
+
+from config import Config
+from services.async_mode import resolve_async_mode, monkey_patch
+
+async_mode = resolve_async_mode(Config.SOCKETIO_ASYNC_MODE)
+monkey_patch(async_mode)
+
+import os
+from app import app, socketio, start_cleanup_scheduler
+
+# Background schedulers (run.py and `python app.py` start them the same way)
+start_cleanup_scheduler()
+
+if __name__ == '__main__':
+    if async_mode == 'threading':
+        raise SystemExit('SOCKETIO_ASYNC_MODE=threading only runs on the development server. '
+                         'Use `python run.py` for development or set SOCKETIO_ASYNC_MODE=eventlet/gevent.')
+    host = os.environ.get('HOST', '0.0.0.0')
+    port = int(os.environ.get('PORT', 5000))
+    print(f"Serving TDRMCD on http://{host}:{port} (async mode: {async_mode})")
+    socketio.run(app, host=host, port=port)